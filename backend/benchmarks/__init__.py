@@ -0,0 +1,3 @@
+"""
+Benchmark and load-testing tools (not imported by the application)
+"""
@@ -0,0 +1,187 @@
+"""
+Local fake SMS provider speaking Twilio's Messages REST API
+
+Usage (from backend/):
+    python -m benchmarks.fake_sms_provider --port 8099 --latency-ms 20 --error-rate 0.01 --rate-limit 2000
+
+Point the app at it with SMS_TRANSPORT=http, SMS_API_BASE_URL=http://127.0.0.1:8099
+and any non-empty TWILIO_ACCOUNT_SID / TWILIO_AUTH_TOKEN / TWILIO_PHONE_NUMBER.
+
+Each message waits a simulated provider latency (normal, clipped at 0),
+fails with HTTP 500 at --error-rate, and is rejected with 429 + Retry-After
+once more than --rate-limit messages per second arrive (0 = no limit).
+GET /stats returns the counters.
+"""
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.datasets import BACKEND_DIR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_ms: float = 20.0
+    jitter_ms: float = 5.0
+    error_rate: float = 0.0
+    rate_limit: float = 0.0  # messages per second, 0 = unlimited
+    seed: Optional[int] = None
+
+
+class _TokenBucket:
+    def __init__(self, per_second: float):
+        self.rate = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def create_app(config: FakeProviderConfig) -> Starlette:
+    rng = random.Random(config.seed)
+    bucket = _TokenBucket(config.rate_limit) if config.rate_limit > 0 else None
+    stats: Dict[str, int] = {"accepted": 0, "errors": 0, "rate_limited": 0, "invalid": 0}
+
+    def twilio_error(status: int, code: int, message: str, headers: Optional[Dict] = None) -> JSONResponse:
+        return JSONResponse(
+            {"code": code, "message": message, "status": status},
+            status_code=status,
+            headers=headers,
+        )
+
+    async def create_message(request: Request):
+        # Handlers run on one event loop, so the counters need no locking
+        if bucket is not None and not bucket.take():
+            stats["rate_limited"] += 1
+            return twilio_error(429, 20429, "Too Many Requests", {"Retry-After": "1"})
+
+        form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+        if not all(form.get(field) for field in ("To", "From", "Body")):
+            stats["invalid"] += 1
+            return twilio_error(400, 21604, "A 'To', 'From' and 'Body' parameter is required")
+
+        latency = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        if latency:
+            await asyncio.sleep(latency)
+
+        if rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return twilio_error(500, 20500, "Internal Server Error")
+
+        stats["accepted"] += 1
+        return JSONResponse(
+            {
+                "sid": "SM" + uuid.uuid4().hex,
+                "account_sid": request.path_params["sid"],
+                "to": form["To"],
+                "from": form["From"],
+                "body": form["Body"],
+                "status": "queued",
+            },
+            status_code=201,
+        )
+
+    async def fetch_account(request: Request):
+        return JSONResponse({"sid": request.path_params["sid"], "status": "active"})
+
+    async def get_stats(request: Request):
+        return JSONResponse({**stats, "config": asdict(config)})
+
+    return Starlette(routes=[
+        Route("/2010-04-01/Accounts/{sid}/Messages.json", create_message, methods=["POST"]),
+        Route("/2010-04-01/Accounts/{sid}.json", fetch_account, methods=["GET"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+
+
+# -----------------------------
+# Process lifecycle (for load tests)
+# -----------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_provider(config: FakeProviderConfig) -> Tuple[subprocess.Popen, str]:
+    """
+    Run the provider in its own process so it does not share the sender's GIL
+    """
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.fake_sms_provider",
+        "--port", str(port),
+        "--latency-ms", str(config.latency_ms),
+        "--jitter-ms", str(config.jitter_ms),
+        "--error-rate", str(config.error_rate),
+        "--rate-limit", str(config.rate_limit),
+    ]
+    if config.seed is not None:
+        command += ["--seed", str(config.seed)]
+
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("fake SMS provider exited during startup")
+        try:
+            if requests.get(base_url + "/stats", timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError("fake SMS provider did not start within 30s")
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local fake Twilio-compatible SMS provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean simulated provider latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of messages answered with HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Messages/s before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = FakeProviderConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+End-to-end HTTP load test replaying frontend page loads
+
+Usage (from backend/):
+    python -m benchmarks.load_test --size medium --concurrency 20 --duration 30
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 50
+
+Without --url the harness generates (or reuses) a benchmark dataset, starts
+uvicorn against it with Twilio and Hugging Face credentials blanked, so SMS
+and AI calls take their local fallback paths and nothing leaves the machine.
+
+Each virtual user repeatedly picks a page (weighted) and issues that page's
+API calls in parallel, exactly like the React pages do with Promise.all.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.datasets import BACKEND_DIR, SIZES, app_environment, ensure_dataset
+
+logger = logging.getLogger(__name__)
+
+# (page, weight, calls) – mirrors frontend/src/pages/*.jsx
+PAGES: List[Tuple[str, int, List[str]]] = [
+    ("Dashboard", 5, [
+        "/api/analytics/overview?sections=campaign_status,churn_distribution",
+    ]),
+    ("Analytics", 3, [
+        "/api/analytics/overview?sections=dashboard,revenue_trends,customer_segments",
+    ]),
+    # Customers.jsx calls /api/customers?limit=100; the router is currently
+    # mounted with a doubled prefix, so target the path that actually serves it.
+    ("Customers", 2, [
+        "/api/customers/api/customers/?limit=100",
+    ]),
+]
+
+
+class LoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_kinds: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, error: Optional[str]):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if error:
+                self.errors[route] += 1
+                self.error_kinds[error] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        routes = {}
+        total = 0
+        for route, values in sorted(self.latencies.items()):
+            arr = np.asarray(values) * 1000
+            total += len(arr)
+            routes[route] = {
+                "requests": len(arr),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(arr) / elapsed, 2),
+                "p50_ms": round(float(np.percentile(arr, 50)), 2),
+                "p95_ms": round(float(np.percentile(arr, 95)), 2),
+                "p99_ms": round(float(np.percentile(arr, 99)), 2),
+                "max_ms": round(float(arr.max()), 2),
+            }
+        return {
+            "duration_s": round(elapsed, 2),
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "error_kinds": dict(self.error_kinds),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+            "routes": routes,
+        }
+
+
+def _virtual_user(base_url: str, stop_at: float, stats: LoadStats, think_time: float, seed: int):
+    rng = random.Random(seed)
+    local = threading.local()
+    weights = [weight for _, weight, _ in PAGES]
+    max_calls = max(len(calls) for _, _, calls in PAGES)
+
+    def call(path: str):
+        # One keep-alive session per pool thread, like a browser connection
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        start = time.perf_counter()
+        error = None
+        try:
+            status = session.get(base_url + path, timeout=60).status_code
+            # 4xx too: a mistyped or removed route must not pass as a fast page load
+            if status >= 400:
+                error = f"HTTP {status}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        stats.record(path.split("?")[0], time.perf_counter() - start, error)
+
+    with ThreadPoolExecutor(max_workers=max_calls) as pool:
+        while time.time() < stop_at:
+            _, _, calls = rng.choices(PAGES, weights=weights)[0]
+            list(pool.map(call, calls))
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+
+
+def run_load(base_url: str, concurrency: int, duration: float, think_time: float, warmup: float) -> Dict:
+    if warmup:
+        _virtual_user(base_url, time.time() + warmup, LoadStats(), 0, seed=-1)
+
+    stats = LoadStats()
+    stop_at = time.time() + duration
+    start = time.perf_counter()
+
+    threads = [
+        threading.Thread(
+            target=_virtual_user,
+            args=(base_url, stop_at, stats, think_time, i),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return stats.report(time.perf_counter() - start)
+
+
+# -----------------------------
+# Server lifecycle
+# -----------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(directory: Path, workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", str(BACKEND_DIR),
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers),
+            "--log-level", "warning",
+        ],
+        cwd=directory,
+        env=app_environment(directory),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if requests.get(base_url + "/health", timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.25)
+
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 60s")
+
+
+def print_report(report: Dict):
+    header = f"{'route':<44} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, r in report["routes"].items():
+        print(
+            f"{route:<44} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}"
+        )
+    print("-" * len(header))
+    print(
+        f"total {report['total_requests']} requests, {report['total_errors']} errors, "
+        f"{report['throughput_rps']} req/s over {report['duration_s']}s"
+    )
+    if report["error_kinds"]:
+        print(f"errors: {report['error_kinds']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FreshMart HTTP load test")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--size", default="small", choices=list(SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between page loads (s)")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    process: Optional[subprocess.Popen] = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            directory = ensure_dataset(args.size, args.seed)
+            process, base_url = start_server(directory, args.workers)
+            logger.info(f"Server started at {base_url} on '{args.size}' dataset")
+
+        logger.info(f"Running {args.concurrency} virtual users for {args.duration}s")
+        report = run_load(base_url, args.concurrency, args.duration, args.think_time, args.warmup)
+        report["config"] = {
+            "size": None if args.url else args.size,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "think_time": args.think_time,
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
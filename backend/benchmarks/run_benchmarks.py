@@ -0,0 +1,292 @@
+"""
+In-process micro-benchmarks for API handlers and core functions
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks --sizes small,medium
+    python -m benchmarks.run_benchmarks --sizes small --update-baseline
+    python -m benchmarks.run_benchmarks --sizes small --threshold 0.2
+
+Each dataset size runs in its own subprocess pointed at a generated dataset
+(see benchmarks/datasets.py), so peak memory is isolated per size. Timings
+and tracemalloc peaks are compared with the JSON baseline; the command exits
+with status 1 when any case regresses beyond the threshold.
+"""
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.datasets import BACKEND_DIR, SIZES, app_environment, ensure_dataset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = BACKEND_DIR / "benchmarks" / "baseline.json"
+
+# Differences below these floors are treated as noise
+MIN_TIME_DELTA_S = 0.002
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+# -----------------------------
+# Worker (runs inside the per-size subprocess)
+# -----------------------------
+def _resolve_defaults(handler: Callable, kwargs: Dict) -> Dict:
+    """
+    Fill FastAPI Query(...) defaults so handlers can be called directly
+    """
+    resolved = dict(kwargs)
+    for name, param in inspect.signature(handler).parameters.items():
+        if name in resolved or param.default is inspect.Parameter.empty:
+            continue
+        resolved[name] = getattr(param.default, "default", param.default)
+    return resolved
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    import pandas as pd
+
+    from src.api import analytics, campaigns, customers, predictions
+    from src.core.data_processing.data_loader import DataLoader
+    from src.core.data_processing.feature_engineering import FeatureEngineer
+    from src.services.affinity_service import AffinityProvider
+    from src.services.campaign_service import CampaignService
+    from src.services.data_snapshots import data_snapshots
+
+    loop = asyncio.new_event_loop()
+
+    def handler(func, **kwargs):
+        resolved = _resolve_defaults(func, kwargs)
+        return lambda: loop.run_until_complete(func(**resolved))
+
+    loader = DataLoader()
+    customers_df = loader.load_customers()
+    transactions_df = loader.load_transactions()
+    rfm_df = FeatureEngineer.calculate_rfm_features(transactions_df)
+    features_df = FeatureEngineer.create_churn_features(customers_df, rfm_df)
+    campaign_service = CampaignService()
+
+    customer_id = str(customers_df["customer_id"].iloc[0])
+
+    return {
+        # Core
+        "core.load_customers": loader.load_customers,
+        "core.load_transactions": loader.load_transactions,
+        "core.load_transactions_90d": lambda: loader.load_transactions(
+            start=pd.Timestamp.now().floor("D") - pd.Timedelta(days=90)
+        ),
+        "core.load_transactions_projected": lambda: loader.load_transactions(
+            columns=["customer_id", "date", "amount"]
+        ),
+        "core.rfm": lambda: FeatureEngineer.calculate_rfm_features(transactions_df),
+        "core.churn_features": lambda: FeatureEngineer.create_churn_features(customers_df, rfm_df),
+        "core.risk_scoring": lambda: FeatureEngineer.predict_churn_risk(features_df),
+        "core.affinity_build": lambda: AffinityProvider().get(data_snapshots.current()),
+        "core.campaign_preparation": lambda: campaign_service.prepare_campaign(customer_limit=100),
+        # Whole audience: partitioned across processes above CAMPAIGN_PARTITION_MIN_CUSTOMERS
+        "core.campaign_preparation_all": lambda: campaign_service.prepare_campaign(
+            customer_limit=10_000_000, churn_risk=""
+        ),
+        "core.history_aggregation": handler(campaigns.get_campaign_history),
+        # API handlers
+        "api.analytics.dashboard": handler(analytics.get_dashboard_metrics),
+        "api.analytics.revenue_trends": handler(analytics.get_revenue_trends),
+        "api.analytics.customer_segments": handler(analytics.get_customer_segments),
+        "api.analytics.overview": handler(analytics.get_overview),
+        "api.customers.list": handler(customers.get_customers),
+        "api.customers.search": handler(customers.get_customers, search="smith"),
+        "api.customers.summary": handler(customers.get_customers_summary),
+        "api.customers.detail": handler(customers.get_customer, customer_id=customer_id),
+        "api.customers.transactions": handler(customers.get_customer_transactions, customer_id=customer_id),
+        "api.customers.affinity": handler(customers.get_customer_affinity, customer_id=customer_id),
+        "api.predictions.churn": handler(predictions.get_churn_predictions),
+        "api.predictions.distribution": handler(predictions.get_churn_distribution),
+        "api.predictions.high_risk": handler(predictions.get_high_risk_customers),
+        "api.predictions.threshold_scenarios": handler(predictions.get_threshold_scenarios, grid_step=0.05),
+        "api.campaigns.status": handler(campaigns.get_campaign_status),
+    }
+
+
+def measure(func: Callable, repeat: int) -> Dict:
+    func()  # warm-up
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        # Slow cases get fewer repetitions
+        if sum(timings) > 10 and len(timings) >= 3:
+            break
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "runs": len(timings),
+        "peak_mb": round(peak / 1024 / 1024, 3),
+    }
+
+
+def run_worker(repeat: int, only: List[str]) -> Dict:
+    logging.disable(logging.WARNING)
+    results = {}
+    for name, func in build_cases().items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        try:
+            results[name] = measure(func, repeat)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def run_size(size: str, seed: int, repeat: int, only: List[str]) -> Dict:
+    directory = ensure_dataset(size, seed)
+    command = [sys.executable, "-m", "benchmarks.run_benchmarks", "--worker", "--repeat", str(repeat)]
+    if only:
+        command += ["--only", ",".join(only)]
+
+    completed = subprocess.run(
+        command,
+        cwd=directory,
+        env=app_environment(directory),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark worker for '{size}' failed:\n{completed.stderr}")
+
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    regressions = []
+    for size, cases in current.items():
+        for name, result in cases.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous or "error" in result or "error" in previous:
+                continue
+
+            time_ratio = result["median_s"] / previous["median_s"] if previous["median_s"] else 1.0
+            if (
+                time_ratio > 1 + threshold
+                and result["median_s"] - previous["median_s"] > MIN_TIME_DELTA_S
+            ):
+                regressions.append({
+                    "size": size, "case": name, "metric": "median_s",
+                    "baseline": previous["median_s"], "current": result["median_s"],
+                    "ratio": round(time_ratio, 3),
+                })
+
+            memory_ratio = result["peak_mb"] / previous["peak_mb"] if previous["peak_mb"] else 1.0
+            if (
+                memory_ratio > 1 + threshold
+                and result["peak_mb"] - previous["peak_mb"] > MIN_MEMORY_DELTA_MB
+            ):
+                regressions.append({
+                    "size": size, "case": name, "metric": "peak_mb",
+                    "baseline": previous["peak_mb"], "current": result["peak_mb"],
+                    "ratio": round(memory_ratio, 3),
+                })
+    return regressions
+
+
+def print_report(current: Dict, baseline: Dict):
+    header = f"{'size':<8} {'case':<36} {'median ms':>10} {'base ms':>10} {'peak MB':>9} {'base MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for size, cases in current.items():
+        for name, result in cases.items():
+            if "error" in result:
+                print(f"{size:<8} {name:<36} ERROR {result['error']}")
+                continue
+            previous = baseline.get(size, {}).get(name, {})
+            base_ms = f"{previous['median_s'] * 1000:10.2f}" if "median_s" in previous else f"{'-':>10}"
+            base_mb = f"{previous['peak_mb']:9.2f}" if "peak_mb" in previous else f"{'-':>9}"
+            print(
+                f"{size:<8} {name:<36} {result['median_s'] * 1000:10.2f} {base_ms} "
+                f"{result['peak_mb']:9.2f} {base_mb}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FreshMart micro-benchmarks")
+    parser.add_argument("--sizes", default="small", help=f"Comma-separated subset of {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", default="", help="Comma-separated case name prefixes")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown ratio (0.25 = +25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="Also write this run's results here")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    only = [prefix for prefix in args.only.split(",") if prefix]
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat, only)))
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    current = {
+        size: run_size(size, args.seed, args.repeat, only)
+        for size in args.sizes.split(",")
+    }
+
+    baseline_doc = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline = baseline_doc.get("results", {})
+
+    print_report(current, baseline)
+
+    document = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": args.seed,
+        },
+        "results": current,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2))
+
+    if args.update_baseline:
+        merged = {**baseline, **current}
+        args.baseline.write_text(json.dumps({**document, "results": merged}, indent=2))
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  [{r['size']}] {r['case']} {r['metric']}: {r['baseline']} -> {r['current']} (x{r['ratio']})")
+        sys.exit(1)
+
+    if baseline:
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
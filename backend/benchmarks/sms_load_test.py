@@ -0,0 +1,153 @@
+"""
+Offline SMS dispatch throughput test
+
+Usage (from backend/):
+    python -m benchmarks.sms_load_test --messages 20000 --concurrency 64
+    python -m benchmarks.sms_load_test --messages 5000 --error-rate 0.02 --provider-rate-limit 1500
+    python -m benchmarks.sms_load_test --url http://127.0.0.1:8099 --messages 10000
+
+Starts the local fake provider (unless --url is given) and drives
+SMSService.send_batch_sms through the pooled HTTP transport, exactly as a
+campaign does, without credentials or real sends. Reports throughput,
+per-message latency percentiles and outcomes.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import json
+import logging
+import subprocess
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.fake_sms_provider import FakeProviderConfig, start_fake_provider
+from src.core.communication.sms_service import SMSService
+from src.core.communication.transports import HTTPTransport
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedTransport(HTTPTransport):
+    """
+    HTTPTransport that records each round-trip time
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def send(self, to_number: str, body: str, from_number: str, timeout: Optional[float] = None) -> Dict:
+        start = time.perf_counter()
+        try:
+            return super().send(to_number, body, from_number, timeout)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.latencies.append(elapsed)
+
+
+def _campaign(messages: int) -> List[Dict]:
+    return [
+        {
+            "customer_id": f"CUST{100000 + i}",
+            "name": f"Customer {i}",
+            "phone": f"+1555{i:07d}",
+            "message": f"Hi Customer {i}, we miss you! Enjoy 20% off with code FRESH{i % 10000:04d}.",
+        }
+        for i in range(messages)
+    ]
+
+
+def run_dispatch(base_url: str, messages: int, concurrency: int, pool_size: int, send_rate: float) -> Dict:
+    transport = _TimedTransport("ACfake000000000000000000000000000", "token", base_url=base_url, pool_size=pool_size)
+    service = SMSService(
+        transport=transport,
+        from_number="+15550001111",
+        concurrency=concurrency,
+        rate_limit_per_second=send_rate,
+    )
+
+    start = time.perf_counter()
+    results = service.send_batch_sms(_campaign(messages))
+    elapsed = time.perf_counter() - start
+    transport.close()
+
+    outcomes = Counter(
+        "sent" if r.get("success") else (r.get("error") or "error").split(":")[0]
+        for r in results
+    )
+    latencies = np.array(transport.latencies) * 1000 if transport.latencies else np.zeros(1)
+
+    return {
+        "messages": messages,
+        "concurrency": concurrency,
+        "pool_size": pool_size,
+        "duration_s": round(elapsed, 3),
+        "throughput_per_s": round(messages / elapsed, 1),
+        "outcomes": dict(outcomes),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "p99": round(float(np.percentile(latencies, 99)), 2),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline SMS dispatch throughput test")
+    parser.add_argument("--url", help="Use an already running fake provider")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=64, help="Messages in flight")
+    parser.add_argument("--pool-size", type=int, help="HTTP connections kept alive (default: concurrency)")
+    parser.add_argument("--send-rate", type=float, default=0.0, help="Client-side pacing in msg/s (0 = unlimited)")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--provider-rate-limit", type=float, default=0.0, help="Provider 429 threshold in msg/s")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+
+    process: Optional[subprocess.Popen] = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            process, base_url = start_fake_provider(FakeProviderConfig(
+                latency_ms=args.latency_ms,
+                jitter_ms=args.jitter_ms,
+                error_rate=args.error_rate,
+                rate_limit=args.provider_rate_limit,
+                seed=42,
+            ))
+
+        report = run_dispatch(
+            base_url,
+            args.messages,
+            args.concurrency,
+            args.pool_size or args.concurrency,
+            args.send_rate,
+        )
+        report["provider"] = requests.get(base_url + "/stats", timeout=5).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(
+        f"{report['messages']} messages in {report['duration_s']}s -> "
+        f"{report['throughput_per_s']} msg/s (concurrency {report['concurrency']}, pool {report['pool_size']})"
+    )
+    print(f"latency ms: {report['latency_ms']}")
+    print(f"outcomes: {report['outcomes']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,23 @@ Main entry point
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 
 # Core settings
 from src.utils.config import settings
+from src.utils.concurrency import shutdown_executors
+from src.services.data_snapshots import SnapshotMiddleware
+from src.services.prediction_refresher import prediction_refresher
+from src.utils.metrics import PrometheusMiddleware, render_latest
+from src.utils.profiling import ProfilingMiddleware
 
 # API routers
 from src.api.customers import router as customers_router
 from src.api.predictions import router as predictions_router
 from src.api.campaigns import router as campaigns_router
 from src.api.analytics import router as analytics_router
+from src.api.admin import router as admin_router
 
 # -------------------------
 # FastAPI App
@@ -38,6 +45,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# One consistent data snapshot per request
+app.add_middleware(SnapshotMiddleware)
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+
 # -------------------------
 # Routers (PREFIX ONLY HERE)
 # -------------------------
@@ -45,6 +61,20 @@ app.include_router(customers_router, prefix="/api/customers", tags=["Customers"]
 app.include_router(predictions_router, prefix="/api/predictions", tags=["Predictions"])
 app.include_router(campaigns_router, prefix="/api/campaigns", tags=["Campaigns"])
 app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
+
+# -------------------------
+# Lifecycle
+# -------------------------
+@app.on_event("startup")
+async def on_startup():
+    if settings.PREDICTION_REFRESH_ENABLED:
+        prediction_refresher.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await prediction_refresher.stop()
+    shutdown_executors()
 
 # -------------------------
 # Health & Root
@@ -64,3 +94,13 @@ async def health():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
     }
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus scrape endpoint (per worker process)
+    """
+    return PlainTextResponse(
+        render_latest(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,111 @@
+"""
+Admin / diagnostics API endpoints
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Optional
+import hmac
+import logging
+
+from src.services.data_snapshots import data_snapshots
+from src.services.result_cache import result_cache
+from src.utils.concurrency import run_blocking
+from src.utils.config import settings
+from src.utils.profiling import get_profile_path, list_profiles
+from src.utils.resilience import breaker_states
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def require_admin_token(x_profile_token: Optional[str] = Header(None)):
+    """
+    Admin-only routes need PROFILING_TOKEN in the X-Profile-Token header
+    (403 when the token is not configured or does not match)
+    """
+    token = settings.PROFILING_TOKEN
+    supplied = x_profile_token or ""
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# -------------------------------------------------
+# REQUEST PROFILES
+# -------------------------------------------------
+@router.get("/profiles", dependencies=[Depends(require_admin_token)])
+async def get_profiles(
+    limit: int = Query(20, ge=1, le=200, description="Number of recent profiles")
+):
+    """
+    List recent request profiles (newest first)
+    """
+    profiles = list_profiles(limit)
+    return {
+        "profiling_enabled": settings.PROFILING_ENABLED,
+        "count": len(profiles),
+        "profiles": profiles,
+    }
+
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_admin_token)])
+async def download_profile(name: str):
+    """
+    Download a profile in folded-stack format
+    """
+    path = get_profile_path(name)
+
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+# -------------------------------------------------
+# INTEGRATION CIRCUIT BREAKERS
+# -------------------------------------------------
+@router.get("/breakers")
+async def get_breakers():
+    """
+    State and recent error rate of each integration circuit breaker
+    """
+    return {"breakers": breaker_states()}
+
+
+# -------------------------------------------------
+# DATA SNAPSHOTS
+# -------------------------------------------------
+@router.get("/snapshots")
+async def get_snapshots():
+    """
+    Published data snapshot version and readers still pinning older ones
+    """
+    return data_snapshots.stats()
+
+
+@router.post("/snapshots/reload", dependencies=[Depends(require_admin_token)])
+async def reload_snapshot():
+    """
+    Rebuild the data snapshot now if any source file changed
+    """
+    snapshot = await run_blocking(data_snapshots.refresh)
+    return {"version": snapshot.version, "built_at": snapshot.built_at}
+
+
+# -------------------------------------------------
+# QUERY-RESULT CACHE
+# -------------------------------------------------
+@router.get("/result-cache")
+async def get_result_cache():
+    """
+    Cached endpoint answers: size, bound and entries per route
+    """
+    return result_cache.stats()
+
+
+@router.delete("/result-cache", dependencies=[Depends(require_admin_token)])
+async def clear_result_cache():
+    """
+    Drop every cached endpoint answer
+    """
+    result_cache.invalidate()
+    return result_cache.stats()
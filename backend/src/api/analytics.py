@@ -2,52 +2,219 @@
 Analytics API endpoints
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
+import threading
 
-from src.core.data_processing.data_loader import DataLoader
+from src.api import campaigns, predictions
+from src.core.data_processing.bitmap_index import parse_csv_values
+from src.core.data_processing.distinct_counter import DailyDistinctCounter
+from src.services.cohort_service import cohort_matrices
+from src.services.data_snapshots import DataSnapshot, current_snapshot
+from src.services.prediction_refresher import PublishedPredictions
+from src.services.result_cache import result_cache
+from src.utils.config import settings
+from src.utils.concurrency import SingleFlight, ThreadSingleFlight
+from src.utils.metrics import record_cache_lookup
 
 router = APIRouter()
-data_loader = DataLoader()
+single_flight = SingleFlight("analytics")
 logger = logging.getLogger(__name__)
 
+# Transaction columns the analytics sections read
+ANALYTICS_COLUMNS = ["customer_id", "date", "amount"]
+
+# Distinct counters are rebuilt once per transactions.csv version
+_counter_flight = ThreadSingleFlight("distinct_counter")
+_counter_lock = threading.Lock()
+_counter: Optional[Tuple[str, DailyDistinctCounter]] = None
+
+
+def _distinct_counter(
+    snapshot: DataSnapshot, window: Optional[pd.DataFrame] = None, exact: bool = False
+) -> DailyDistinctCounter:
+    """
+    Per-day distinct-customer counter over the snapshot's full history, or an
+    uncached exact counter over the ``window`` transactions when exact=True
+    (validation)
+    """
+    if exact:
+        return DailyDistinctCounter(window["customer_id"], window["date"], mode="exact")
+
+    version = snapshot.version_of(("transactions.csv",))
+    with _counter_lock:
+        if _counter is not None and _counter[0] == version:
+            record_cache_lookup("distinct_counter", True)
+            return _counter[1]
+
+    record_cache_lookup("distinct_counter", False)
+
+    def build():
+        global _counter
+        store = snapshot.columns
+        if store is not None:
+            # Customer codes stand in for ids: distinct counts are the same
+            customer_ids, dates = pd.Series(store["customer_code"]), pd.Series(store.dates)
+        else:
+            transactions = snapshot.transactions
+            customer_ids, dates = transactions["customer_id"], transactions["date"]
+
+        counter = DailyDistinctCounter(
+            customer_ids,
+            dates,
+            mode=settings.DISTINCT_COUNT_MODE,
+            precision=settings.DISTINCT_COUNT_PRECISION,
+            exact_max_rows=settings.DISTINCT_EXACT_MAX_ROWS,
+        )
+        with _counter_lock:
+            _counter = (version, counter)
+        return counter
+
+    return _counter_flight.do(version, build)
+
+
+def _window_start(days: int) -> pd.Timestamp:
+    """
+    Start of "the last ``days`` days"; distinct counts are day-granular, so
+    the window covers the whole starting day
+    """
+    return (pd.Timestamp.now() - pd.Timedelta(days=days)).floor("D")
+
+
+def _basket_totals(snapshot: DataSnapshot) -> Optional[Tuple[float, int]]:
+    """
+    (total amount, number of transactions) over the whole history, from the
+    partition metadata when available
+    """
+    partitions = snapshot.partitions
+    if partitions and all(p.get("transactions") is not None for p in partitions):
+        return sum(p["amount"] for p in partitions), sum(p["transactions"] for p in partitions)
+
+    store = snapshot.columns
+    if store is not None:
+        transactions = store.frame(columns=["transaction_id", "amount"])
+    else:
+        transactions = snapshot.transactions
+    if transactions.empty:
+        return None
+    baskets = transactions.groupby("transaction_id")["amount"].sum()
+    return float(baskets.sum()), len(baskets)
+
+
+def _distinct_info(counter: DailyDistinctCounter) -> Dict:
+    return {"mode": counter.mode, "relative_error": round(counter.relative_error, 4)}
+
+
+class _AnalyticsPass:
+    """
+    Work shared by the analytics sections of one request. They all read one
+    pinned snapshot, and the transactions of the widest window any of them
+    needs are scanned once: revenue per day is aggregated in a single pass
+    (column store arrays, else the window's rows), and the raw rows are
+    only materialized without a column store or for exact counts.
+    """
+
+    def __init__(self, snapshot: DataSnapshot, earliest: pd.Timestamp):
+        self.snapshot = snapshot
+        self.earliest = earliest
+        self._rows: Optional[pd.DataFrame] = None
+        self._daily: Optional[pd.Series] = None
+
+    # Every ``start`` below must not be before ``earliest``
+    def transactions_since(self, start: pd.Timestamp) -> pd.DataFrame:
+        if self._rows is None:
+            self._rows = self.snapshot.transactions_between(
+                start=self.earliest, columns=ANALYTICS_COLUMNS
+            )
+        rows = self._rows
+        if start > self.earliest and "date" in rows.columns:
+            rows = rows[rows["date"] >= start]
+        return rows
+
+    def revenue_by_day(self, start: pd.Timestamp) -> pd.Series:
+        """
+        Revenue per day (days with transactions only) from ``start`` on
+        """
+        if self._daily is None:
+            self._daily = self._scan_daily()
+        return self._daily[self._daily.index >= start]
+
+    def revenue_by_month(self, start: pd.Timestamp) -> pd.Series:
+        daily = self.revenue_by_day(start)
+        return daily.groupby(daily.index.to_period("M")).sum()
+
+    def _scan_daily(self) -> pd.Series:
+        store = self.snapshot.columns
+        if store is not None:
+            dates = store["date"]
+            mask = dates >= self.earliest.value
+            days, amounts = dates[mask].view("datetime64[ns]"), store["amount"][mask]
+        else:
+            rows = self.transactions_since(self.earliest)
+            if "date" not in rows.columns:
+                return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+            rows = rows[rows["date"].notna()]
+            days, amounts = rows["date"].to_numpy(dtype="datetime64[ns]"), rows["amount"].to_numpy(dtype=np.float64)
+
+        days = days.astype("datetime64[D]").astype(np.int64)
+        if len(days) == 0:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+        first = int(days.min())
+        totals = np.bincount(days - first, weights=amounts)
+        seen = np.bincount(days - first) > 0
+        index = pd.DatetimeIndex((np.arange(len(totals)) + first).astype("datetime64[D]"))
+        return pd.Series(totals, index=index)[seen]
+
 # -------------------------
 # DASHBOARD METRICS
 # -------------------------
 @router.get("/dashboard")
-async def get_dashboard_metrics():
+async def get_dashboard_metrics(
+    exact: bool = Query(False, description="Count distinct customers exactly (validation)")
+):
+    # Windows are relative to today: cached answers also expire with time
+    return await result_cache.get_or_compute(
+        "dashboard", {"exact": exact}, single_flight, _compute_dashboard_metrics, exact,
+        ttl=settings.RESULT_CACHE_RELATIVE_TTL_SECONDS,
+    )
+
+
+def _compute_dashboard_metrics(exact: bool = False, data: Optional[_AnalyticsPass] = None):
     try:
-        data = data_loader.load_all_data()
-        customers = data.get("customers", pd.DataFrame())
-        transactions = data.get("transactions", pd.DataFrame())
+        # Revenue comes from the memory-mapped column store when available;
+        # otherwise only the last 180 days are scanned. Whole-history figures
+        # come from per-partition metadata and the cached distinct counter.
+        six_months = _window_start(180)
+        data = data or _AnalyticsPass(current_snapshot(), six_months)
+        snapshot = data.snapshot
+        customers = snapshot.customers
+        store = snapshot.columns
+        recent_tx = data.transactions_since(six_months) if store is None or exact else None
 
         total_customers = len(customers)
 
         # Retention (90 days)
         retention_rate = 35.0
-        if not transactions.empty and "date" in transactions.columns:
-            transactions["date"] = pd.to_datetime(transactions["date"])
-            recent = transactions[
-                transactions["date"] >= pd.Timestamp.now() - pd.Timedelta(days=90)
-            ]["customer_id"].nunique()
-            retention_rate = (recent / total_customers * 100) if total_customers else 0
+        active_customers = None
+        distinct = None
+        if recent_tx is None or "date" in recent_tx.columns:
+            counter = _distinct_counter(snapshot, recent_tx, exact)
+            active_customers = counter.count(_window_start(90))
+            distinct = _distinct_info(counter)
+            retention_rate = (active_customers / total_customers * 100) if total_customers else 0
 
         # Avg basket
-        avg_basket = (
-            transactions.groupby("transaction_id")["amount"].sum().mean()
-            if not transactions.empty
-            else 45.0
-        )
+        totals = _basket_totals(snapshot)
+        avg_basket = totals[0] / totals[1] if totals and totals[1] else 45.0
 
         # Monthly revenue (last 6 months avg)
         monthly_revenue = 50000.0
-        if not transactions.empty and "date" in transactions.columns:
-            six_months = pd.Timestamp.now() - pd.Timedelta(days=180)
-            recent_tx = transactions[transactions["date"] >= six_months]
-            if not recent_tx.empty:
-                monthly_revenue = recent_tx["amount"].sum() / 6
+        if store is not None or not recent_tx.empty:
+            monthly_revenue = float(data.revenue_by_day(six_months).sum()) / 6
 
         high_risk_customers = int(total_customers * 0.35)
 
@@ -58,6 +225,8 @@ async def get_dashboard_metrics():
             "avg_basket_size": round(avg_basket, 2),
             "high_risk_customers": high_risk_customers,
             "monthly_revenue": round(monthly_revenue, 2),
+            "active_customers": active_customers,
+            "distinct_count": distinct,
             "campaigns_sent": 1250,
             "campaign_success_rate": 85.5,
             "last_updated": datetime.now().isoformat(),
@@ -81,32 +250,58 @@ async def get_dashboard_metrics():
 # REVENUE TRENDS
 # -------------------------
 @router.get("/revenue-trends")
-async def get_revenue_trends(months: int = 6):
+async def get_revenue_trends(
+    months: int = 6,
+    exact: bool = Query(False, description="Count distinct customers exactly (validation)"),
+):
+    return await result_cache.get_or_compute(
+        "revenue-trends", {"months": months, "exact": exact}, single_flight,
+        _compute_revenue_trends, months, exact,
+        ttl=settings.RESULT_CACHE_RELATIVE_TTL_SECONDS,
+    )
+
+
+def _compute_revenue_trends(months: int, exact: bool = False, data: Optional[_AnalyticsPass] = None):
     try:
-        data = data_loader.load_all_data()
-        tx = data.get("transactions", pd.DataFrame())
+        start = _window_start(months * 30)
+        data = data or _AnalyticsPass(current_snapshot(), start)
+        snapshot = data.snapshot
 
-        if tx.empty or "date" not in tx.columns:
+        tx = None if snapshot.columns is not None else data.transactions_since(start)
+        revenue = data.revenue_by_month(start)
+
+        if revenue.empty:
             return {
                 "labels": ["Jan", "Feb", "Mar", "Apr", "May", "Jun"],
                 "revenue": [45000, 52000, 48000, 61000, 58000, 65000],
                 "customers": [45000, 46000, 45500, 47000, 46500, 47500],
             }
 
-        tx["date"] = pd.to_datetime(tx["date"])
-        start = pd.Timestamp.now() - pd.Timedelta(days=months * 30)
-        tx = tx[tx["date"] >= start]
-        tx["month"] = tx["date"].dt.to_period("M")
+        if exact and tx is None:
+            tx = data.transactions_since(start)
+        counter = _distinct_counter(snapshot, tx, exact)
 
-        grouped = tx.groupby("month").agg(
-            revenue=("amount", "sum"),
-            customers=("customer_id", "nunique"),
-        ).reset_index()
+        # Distinct customers per month (and carried over from the previous
+        # month) come from merged per-day sketches, not per-row hash sets
+        customers, retention = [], []
+        previous = None
+        for month in revenue.index:
+            window = (max(month.start_time, start), month.end_time)
+            if previous is None:
+                customers.append(counter.count(*window))
+                retention.append(None)
+            else:
+                prior, current, retained = counter.overlap(previous, window)
+                customers.append(current)
+                retention.append(round(retained / prior * 100, 1) if prior else None)
+            previous = window
 
         return {
-            "labels": grouped["month"].astype(str).tolist(),
-            "revenue": grouped["revenue"].round(2).tolist(),
-            "customers": grouped["customers"].tolist(),
+            "labels": revenue.index.astype(str).tolist(),
+            "revenue": revenue.round(2).tolist(),
+            "customers": customers,
+            "retention": retention,
+            "distinct_count": _distinct_info(counter),
         }
 
     except Exception as e:
@@ -117,13 +312,56 @@ async def get_revenue_trends(months: int = 6):
             "customers": [],
         }
 
+# -------------------------
+# COHORT RETENTION
+# -------------------------
+@router.get("/cohorts")
+async def get_cohort_retention(
+    cohorts: int = Query(12, ge=1, le=120, description="Most recent first-purchase months to include"),
+    max_months: Optional[int] = Query(None, ge=0, le=120, description="Last months-since-first-purchase column"),
+):
+    """
+    First-purchase month x months since: active customers, retention % and revenue
+    """
+    return await result_cache.get_or_compute(
+        "cohorts", {"cohorts": cohorts, "max_months": max_months}, single_flight,
+        _compute_cohort_retention, cohorts, max_months,
+    )
+
+
+def _compute_cohort_retention(cohorts: int, max_months: Optional[int] = None):
+    try:
+        published = cohort_matrices.get()
+        return {
+            **published.matrix.table(cohorts, max_months),
+            "version": published.version,
+            "update": published.update,
+        }
+
+    except Exception as e:
+        logger.error(f"Cohort retention error: {e}")
+        return {
+            "cohorts": [],
+            "sizes": [],
+            "months_since": [],
+            "customers": [],
+            "retention": [],
+            "revenue": [],
+        }
+
 # -------------------------
 # CUSTOMER SEGMENTS
 # -------------------------
 @router.get("/customer-segments")
 async def get_customer_segments():
+    return await result_cache.get_or_compute(
+        "customer-segments", {}, single_flight, _compute_customer_segments
+    )
+
+
+def _compute_customer_segments(data: Optional[_AnalyticsPass] = None):
     try:
-        customers = data_loader.load_customers()
+        customers = (data.snapshot if data is not None else current_snapshot()).customers
 
         loyalty = (
             customers["loyalty_tier"].value_counts().to_dict()
@@ -172,3 +410,111 @@ async def get_customer_segments():
             "city_segments": {},
             "total_segments": 0,
         }
+
+# -------------------------
+# OVERVIEW (COMPOSITE)
+# -------------------------
+OVERVIEW_SECTIONS = (
+    "dashboard",
+    "revenue_trends",
+    "customer_segments",
+    "campaign_status",
+    "churn_distribution",
+)
+
+
+def _parse_sections(sections: Optional[str]) -> List[str]:
+    selected = parse_csv_values(sections) or list(OVERVIEW_SECTIONS)
+    unknown = sorted(set(selected) - set(OVERVIEW_SECTIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sections {unknown}. Expected any of {list(OVERVIEW_SECTIONS)}",
+        )
+    return [name for name in OVERVIEW_SECTIONS if name in selected]
+
+
+@router.get("/overview")
+async def get_overview(
+    sections: Optional[str] = Query(
+        None, description=f"Comma-separated subset of {', '.join(OVERVIEW_SECTIONS)} (default: all)"
+    ),
+    months: int = Query(6, ge=1, le=120, description="Revenue trend months"),
+    exact: bool = Query(False, description="Count distinct customers exactly (validation)"),
+    buckets: int = Query(0, ge=0, le=100, description="Churn probability histogram buckets (0 = none)"),
+):
+    """
+    Dashboard widgets in one response: every data section is computed from
+    the same pinned snapshot in one fused pass. A failing section is
+    reported under "errors" instead of failing the whole response.
+    """
+    selected = _parse_sections(sections)
+    errors: Dict[str, str] = {}
+
+    published = None
+    if "churn_distribution" in selected:
+        try:
+            published = await predictions._published_predictions()
+        except HTTPException as e:
+            errors["churn_distribution"] = e.detail
+
+    # Campaign status reflects live service health, not data: never cached
+    data_sections = [
+        name for name in selected if name != "campaign_status" and name not in errors
+    ]
+    overview: Dict = {}
+    if data_sections:
+        computed = await result_cache.get_or_compute(
+            "overview",
+            {"sections": data_sections, "months": months, "exact": exact, "buckets": buckets},
+            single_flight,
+            _compute_overview, tuple(data_sections), months, exact, buckets, published,
+            ttl=settings.RESULT_CACHE_RELATIVE_TTL_SECONDS,
+            predictions=published,
+        )
+        overview.update(computed["sections"])
+        errors.update(computed["errors"])
+
+    if "campaign_status" in selected:
+        try:
+            overview["campaign_status"] = await single_flight.do(
+                "overview-status", campaigns._compute_campaign_status
+            )
+        except HTTPException as e:
+            errors["campaign_status"] = e.detail
+
+    return {
+        **{name: overview[name] for name in selected if name in overview},
+        "errors": errors,
+    }
+
+
+def _compute_overview(
+    sections: Tuple[str, ...],
+    months: int,
+    exact: bool,
+    buckets: int,
+    published: Optional[PublishedPredictions],
+) -> Dict:
+    windows = []
+    if "dashboard" in sections:
+        windows.append(_window_start(180))
+    if "revenue_trends" in sections:
+        windows.append(_window_start(months * 30))
+    data = _AnalyticsPass(current_snapshot(), min(windows) if windows else _window_start(0))
+
+    builders: Dict[str, Callable[[], Dict]] = {
+        "dashboard": lambda: _compute_dashboard_metrics(exact, data),
+        "revenue_trends": lambda: _compute_revenue_trends(months, exact, data),
+        "customer_segments": lambda: _compute_customer_segments(data),
+        "churn_distribution": lambda: predictions._compute_churn_distribution(published, buckets),
+    }
+
+    computed: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+    for name in sections:
+        try:
+            computed[name] = builders[name]()
+        except HTTPException as e:
+            errors[name] = e.detail
+    return {"sections": computed, "errors": errors}
@@ -1,21 +1,31 @@
 """
 Campaigns API endpoints
 """
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
 import logging
 from pathlib import Path
 import pandas as pd
 
+from src.services.campaign_progress import STREAM_LISTENERS, CampaignProgress, campaign_progress
 from src.services.campaign_service import CampaignService
+from src.services.data_snapshots import current_snapshot
 from src.core.communication.sms_service import sms_service
-from src.core.data_processing.data_loader import DataLoader
+from src.core.data_processing.bitmap_index import SegmentQuery, parse_csv_values
+from src.utils.concurrency import SingleFlight, run_blocking
+from src.utils.config import settings
 
 router = APIRouter()
 campaign_service = CampaignService()
-data_loader = DataLoader()
+single_flight = SingleFlight("campaigns")
 logger = logging.getLogger(__name__)
 
+# Strong references to campaigns running in the background
+_background_campaigns = set()
+
 
 # -------------------------------------------------
 # LAUNCH RETENTION CAMPAIGN
@@ -24,37 +34,76 @@ logger = logging.getLogger(__name__)
 async def launch_retention_campaign(
     customer_limit: int = 10,
     churn_risk: str = "High",
+    loyalty_tier: Optional[str] = None,
+    city: Optional[str] = None,
+    favorite_category: Optional[str] = None,
+    min_recency: Optional[int] = None,
+    max_recency: Optional[int] = None,
+    min_monetary: Optional[float] = None,
+    max_monetary: Optional[float] = None,
+    contact_cap_days: Optional[int] = Query(
+        None, ge=0, description="Skip customers texted in the last N days (default CONTACT_CAP_DAYS, 0 = off)"
+    ),
+    background: bool = False,
 ):
     """
-    Launch SMS retention campaign for customers
+    Launch SMS retention campaign for customers.
+    loyalty_tier / city / favorite_category take comma-separated values; all filters are ANDed.
+    With background=true it returns at once; follow progress on the events stream.
     """
-    try:
-        logger.info(
-            f"Launching retention campaign: limit={customer_limit}, risk={churn_risk}"
+    segment = SegmentQuery(
+        churn_risk=parse_csv_values(churn_risk),
+        loyalty_tier=parse_csv_values(loyalty_tier),
+        city=parse_csv_values(city),
+        favorite_category=parse_csv_values(favorite_category),
+        min_recency=min_recency,
+        max_recency=max_recency,
+        min_monetary=min_monetary,
+        max_monetary=max_monetary,
+    )
+    logger.info(
+        f"Launching retention campaign: limit={customer_limit}, risk={churn_risk}, segment={segment}"
+    )
+    progress = campaign_progress.create()
+
+    if background:
+        task = asyncio.create_task(
+            _run_campaign(progress, customer_limit, churn_risk, segment, contact_cap_days)
         )
+        _background_campaigns.add(task)
+        task.add_done_callback(_background_campaigns.discard)
 
-        campaign_data = campaign_service.prepare_campaign(
-            customer_limit=customer_limit,
-            churn_risk=churn_risk,
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Retention campaign started",
+                "campaign_id": progress.campaign_id,
+                "progress_url": f"/api/campaigns/live/{progress.campaign_id}",
+                "events_url": f"/api/campaigns/live/{progress.campaign_id}/events",
+            },
         )
 
-        if not campaign_data:
+    try:
+        campaign_results, sample_messages = await _run_campaign(
+            progress, customer_limit, churn_risk, segment, contact_cap_days
+        )
+
+        if not campaign_results["total"]:
             raise HTTPException(
                 status_code=404,
                 detail="No customers found for campaign",
             )
 
-        campaign_results = campaign_service.execute_campaign(campaign_data)
-
         return {
             "message": "Retention campaign completed",
+            "campaign_id": progress.campaign_id,
             "campaign_details": {
-                "targeted_customers": len(campaign_data),
+                "targeted_customers": campaign_results["total"],
                 "churn_risk_level": churn_risk,
                 "customer_limit": customer_limit,
             },
             "campaign_results": campaign_results,
-            "sample_messages": campaign_data[:3],
+            "sample_messages": sample_messages,
         }
 
     except Exception as e:
@@ -62,6 +111,90 @@ async def launch_retention_campaign(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _run_campaign(
+    progress: CampaignProgress,
+    customer_limit: int,
+    churn_risk: str,
+    segment: SegmentQuery,
+    contact_cap_days: Optional[int] = None,
+) -> Tuple[Dict, List[Dict]]:
+    # Selection, generation and sending block for seconds: keep them off the
+    # event loop, on the dedicated campaign pool. The pipeline finishes
+    # ``progress`` itself, also on failure.
+    return await run_blocking(
+        campaign_service.run_campaign,
+        customer_limit=customer_limit,
+        churn_risk=churn_risk,
+        segment=segment,
+        progress=progress,
+        contact_cap_days=contact_cap_days,
+        pool="campaign",
+    )
+
+
+# -------------------------------------------------
+# LIVE CAMPAIGN PROGRESS
+# -------------------------------------------------
+@router.get("/live")
+async def list_live_campaigns():
+    """
+    Active and recently finished campaigns with running counts
+    """
+    return {"campaigns": campaign_progress.list()}
+
+
+def _get_progress(campaign_id: str) -> CampaignProgress:
+    progress = campaign_progress.get(campaign_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return progress
+
+
+@router.get("/live/{campaign_id}")
+async def get_live_campaign(campaign_id: str):
+    """
+    Current counts and throughput of one campaign
+    """
+    return _get_progress(campaign_id).snapshot()
+
+
+@router.get("/live/{campaign_id}/events")
+async def stream_campaign_events(
+    campaign_id: str,
+    request: Request,
+    cursor: int = Query(0, ge=0, description="Skip this many already-received results"),
+):
+    """
+    Server-Sent Events stream of per-message results, running counts and
+    throughput. Results are batched per flush interval; reconnecting clients
+    resume from Last-Event-ID.
+    """
+    progress = _get_progress(campaign_id)
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    async def stream():
+        STREAM_LISTENERS.inc()
+        try:
+            yield "retry: 2000\n\n"
+            async for event in progress.events(cursor):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                name = "done" if event["final"] else "progress"
+                yield f"id: {event['cursor']}\nevent: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            STREAM_LISTENERS.dec()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # -------------------------------------------------
 # TEST SMS ENDPOINT
 # -------------------------------------------------
@@ -77,9 +210,11 @@ async def test_sms_campaign(phone_number: Optional[str] = None):
                 "note": "Provide phone_number query parameter to send a test SMS",
             }
 
-        result = sms_service.send_sms(
+        result = await run_blocking(
+            sms_service.send_sms,
             to_number=phone_number,
             message="Test message from FreshMart AI Retention System.",
+            pool="campaign",
         )
 
         return {
@@ -92,6 +227,22 @@ async def test_sms_campaign(phone_number: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -------------------------------------------------
+# FREQUENCY CAPPING
+# -------------------------------------------------
+@router.get("/frequency-cap")
+async def get_frequency_cap(
+    days: Optional[int] = Query(None, ge=1, le=365, description="Window (default CONTACT_CAP_DAYS)"),
+):
+    """
+    Contact history size and how many customers are inside the capping window
+    """
+    return await run_blocking(
+        campaign_service.contact_history.stats,
+        days or settings.CONTACT_CAP_DAYS,
+    )
+
+
 # -------------------------------------------------
 # CAMPAIGN SERVICE STATUS
 # -------------------------------------------------
@@ -100,9 +251,13 @@ async def get_campaign_status():
     """
     Get campaign system health/status
     """
+    return await single_flight.do("status", _compute_campaign_status)
+
+
+def _compute_campaign_status():
     try:
         status = campaign_service.get_campaign_status()
-        customers_df = data_loader.load_customers()
+        customers_df = current_snapshot().customers
 
         status.update(
             {
@@ -130,6 +285,10 @@ async def get_campaign_history():
     """
     Get campaign execution history
     """
+    return await single_flight.do("history", _compute_campaign_history)
+
+
+def _compute_campaign_history():
     try:
         outputs_dir = Path("outputs")
         results_file = outputs_dir / "campaign_results.csv"
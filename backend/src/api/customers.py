@@ -5,14 +5,21 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 import logging
 
-from src.core.data_processing.data_loader import DataLoader  # ✅ FIXED IMPORT
+import pandas as pd
+
+from src.core.data_processing.bitmap_index import SegmentQuery, parse_csv_values
+from src.services.affinity_service import customer_affinities
+from src.services.data_snapshots import current_snapshot
+from src.services.result_cache import result_cache
+from src.services.segment_service import segment_indexes
+from src.utils.concurrency import SingleFlight
 
 router = APIRouter(
     prefix="/api/customers",
     tags=["Customers"]
 )
 
-data_loader = DataLoader()
+single_flight = SingleFlight("customers")
 logger = logging.getLogger(__name__)
 
 
@@ -20,19 +27,53 @@ logger = logging.getLogger(__name__)
 async def get_customers(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=1000, description="Items per page"),
-    churn_risk: Optional[str] = Query(None, description="Filter by churn risk"),
+    churn_risk: Optional[str] = Query(None, description="Filter by churn risk (comma-separated for any of)"),
     search: Optional[str] = Query(None, description="Search by name or email"),
+    loyalty_tier: Optional[str] = Query(None, description="Loyalty tiers, comma-separated"),
+    city: Optional[str] = Query(None, description="Cities, comma-separated"),
+    favorite_category: Optional[str] = Query(None, description="Favorite product categories, comma-separated"),
+    has_phone: Optional[bool] = Query(None, description="Only customers with (or without) a phone"),
+    min_recency: Optional[int] = Query(None, ge=0, description="Minimum days since last purchase"),
+    max_recency: Optional[int] = Query(None, ge=0, description="Maximum days since last purchase"),
+    min_monetary: Optional[float] = Query(None, ge=0, description="Minimum total spend"),
+    max_monetary: Optional[float] = Query(None, ge=0, description="Maximum total spend"),
 ):
     """
-    Get paginated list of customers
+    Get paginated list of customers.
+    Segment filters are ANDed; comma-separated values within one filter are ORed.
     """
+    segment = SegmentQuery(
+        churn_risk=parse_csv_values(churn_risk),
+        loyalty_tier=parse_csv_values(loyalty_tier),
+        city=parse_csv_values(city),
+        favorite_category=parse_csv_values(favorite_category),
+        has_phone=has_phone,
+        min_recency=min_recency,
+        max_recency=max_recency,
+        min_monetary=min_monetary,
+        max_monetary=max_monetary,
+    )
+    return await result_cache.get_or_compute(
+        "customers",
+        {"page": page, "limit": limit, "segment": segment, "search": search},
+        single_flight,
+        _list_customers, page, limit, segment, search,
+    )
+
+
+def _list_customers(page: int, limit: int, segment: SegmentQuery, search: Optional[str]):
     try:
-        customers_df = data_loader.load_customers()
+        start = (page - 1) * limit
+        end = start + limit
 
-        if churn_risk and "churn_risk" in customers_df.columns:
-            customers_df = customers_df[
-                customers_df["churn_risk"] == churn_risk
-            ]
+        if segment.is_empty():
+            customers_df = current_snapshot().customers
+        else:
+            index = segment_indexes.get()
+            rows = index.evaluate(segment).rows()
+            if not search:
+                return _customers_page(index.customers.iloc[rows[start:end]], len(rows), page, limit)
+            customers_df = index.customers.iloc[rows]
 
         if search:
             s = search.lower()
@@ -42,39 +83,43 @@ async def get_customers(
                 | customers_df["email"].str.lower().str.contains(s, na=False)
             ]
 
-        total = len(customers_df)
-        total_pages = (total + limit - 1) // limit
-
-        start = (page - 1) * limit
-        end = start + limit
-
-        page_data = customers_df.iloc[start:end]
-
-        return {
-            "data": page_data.to_dict(orient="records"),
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1,
-            },
-        }
+        return _customers_page(customers_df.iloc[start:end], len(customers_df), page, limit)
 
     except Exception as e:
         logger.error(f"Error getting customers: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch customers")
 
 
+def _customers_page(page_data, total: int, page: int, limit: int):
+    total_pages = (total + limit - 1) // limit
+
+    return {
+        "data": page_data.to_dict(orient="records"),
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_previous": page > 1,
+        },
+    }
+
+
 # ✅ STATIC ROUTES FIRST
 @router.get("/stats/summary")
 async def get_customers_summary():
     """
     Get customers summary statistics
     """
+    return await result_cache.get_or_compute(
+        "customers-summary", {}, single_flight, _compute_customers_summary
+    )
+
+
+def _compute_customers_summary():
     try:
-        customers_df = data_loader.load_customers()
+        customers_df = current_snapshot().customers
 
         return {
             "total_customers": len(customers_df),
@@ -97,12 +142,65 @@ async def get_customers_summary():
         raise HTTPException(status_code=500, detail="Failed to fetch summary")
 
 
+@router.get("/stats/segment")
+async def get_segment_summary(
+    churn_risk: Optional[str] = Query(None, description="Churn risk tiers, comma-separated"),
+    loyalty_tier: Optional[str] = Query(None, description="Loyalty tiers, comma-separated"),
+    city: Optional[str] = Query(None, description="Cities, comma-separated"),
+    favorite_category: Optional[str] = Query(None, description="Favorite product categories, comma-separated"),
+    has_phone: Optional[bool] = Query(None, description="Only customers with (or without) a phone"),
+    min_recency: Optional[int] = Query(None, ge=0, description="Minimum days since last purchase"),
+    max_recency: Optional[int] = Query(None, ge=0, description="Maximum days since last purchase"),
+    min_monetary: Optional[float] = Query(None, ge=0, description="Minimum total spend"),
+    max_monetary: Optional[float] = Query(None, ge=0, description="Maximum total spend"),
+):
+    """
+    Size of a customer segment with its risk / loyalty breakdown
+    """
+    segment = SegmentQuery(
+        churn_risk=parse_csv_values(churn_risk),
+        loyalty_tier=parse_csv_values(loyalty_tier),
+        city=parse_csv_values(city),
+        favorite_category=parse_csv_values(favorite_category),
+        has_phone=has_phone,
+        min_recency=min_recency,
+        max_recency=max_recency,
+        min_monetary=min_monetary,
+        max_monetary=max_monetary,
+    )
+    return await result_cache.get_or_compute(
+        "customers-segment", {"segment": segment}, single_flight, _compute_segment_summary, segment
+    )
+
+
+def _compute_segment_summary(segment: SegmentQuery):
+    try:
+        index = segment_indexes.get()
+        bitmap = index.evaluate(segment)
+
+        return {
+            "matching": bitmap.count(),
+            "total_customers": index.size,
+            "breakdown": index.breakdown(bitmap),
+        }
+
+    except Exception as e:
+        logger.error(f"Error computing segment summary: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute segment")
+
+
 @router.get("/{customer_id}")
 async def get_customer(customer_id: str):
     """
     Get customer by ID
     """
-    customers_df = data_loader.load_customers()
+    return await result_cache.get_or_compute(
+        "customer", {"customer_id": customer_id}, single_flight, _lookup_customer, customer_id
+    )
+
+
+def _lookup_customer(customer_id: str):
+    customers_df = current_snapshot().customers
     customer = customers_df[
         customers_df["customer_id"] == customer_id
     ]
@@ -113,18 +211,54 @@ async def get_customer(customer_id: str):
     return customer.iloc[0].to_dict()
 
 
+@router.get("/{customer_id}/affinity")
+async def get_customer_affinity(
+    customer_id: str,
+    top: int = Query(3, ge=1, le=50, description="Number of top products"),
+):
+    """
+    Spend share per product category, favorite category and top products
+    """
+    return await result_cache.get_or_compute(
+        "customer-affinity", {"customer_id": customer_id, "top": top}, single_flight,
+        _customer_affinity, customer_id, top,
+    )
+
+
+def _customer_affinity(customer_id: str, top: int):
+    profile = customer_affinities.get().affinity.profile(customer_id, top_products=top)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No purchases found for customer")
+    return profile
+
+
 @router.get("/{customer_id}/transactions")
 async def get_customer_transactions(customer_id: str):
     """
     Get customer transaction history
     """
-    transactions_df = data_loader.load_transactions()
-    cust_txn = transactions_df[
-        transactions_df["customer_id"] == customer_id
-    ]
+    return await result_cache.get_or_compute(
+        "customer-transactions", {"customer_id": customer_id}, single_flight,
+        _customer_transactions, customer_id,
+    )
+
+
+def _customer_transactions(customer_id: str):
+    # Memory-mapped store: the customer's rows are one contiguous slice
+    snapshot = current_snapshot()
+    store = snapshot.columns
+    if store is not None:
+        cust_txn = store.history(customer_id)
+        if cust_txn is None:
+            cust_txn = pd.DataFrame(columns=["transaction_id", "customer_id", "product_id", "quantity", "amount", "date"])
+    else:
+        transactions_df = snapshot.transactions
+        cust_txn = transactions_df[
+            transactions_df["customer_id"] == customer_id
+        ]
 
-    if not cust_txn.empty and "date" in cust_txn.columns:
-        cust_txn = cust_txn.sort_values("date", ascending=False)
+        if not cust_txn.empty and "date" in cust_txn.columns:
+            cust_txn = cust_txn.sort_values("date", ascending=False)
 
     return {
         "customer_id": customer_id,
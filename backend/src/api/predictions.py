@@ -2,65 +2,106 @@
 Churn predictions API endpoints
 """
 from fastapi import APIRouter, HTTPException, Query
-import pandas as pd
-from typing import Dict
+from typing import List, Optional, Tuple
 import logging
 
-from src.core.data_processing.data_loader import DataLoader
-from src.core.data_processing.feature_engineering import FeatureEngineer
+import numpy as np
+
+from src.core.data_processing.churn_index import DEFAULT_RISK_THRESHOLDS, RISK_TIERS
+from src.services.prediction_refresher import PublishedPredictions, prediction_refresher
+from src.services.result_cache import result_cache
+from src.utils.concurrency import SingleFlight
+from src.utils.metrics import record_cache_lookup
 
 router = APIRouter()
-data_loader = DataLoader()
-feature_engineer = FeatureEngineer()
+single_flight = SingleFlight("predictions")
 logger = logging.getLogger(__name__)
 
 
+async def _published_predictions() -> PublishedPredictions:
+    """
+    Predictions published by the background refresher (always precomputed)
+    """
+    record_cache_lookup("churn_predictions", prediction_refresher.current() is not None)
+    published = await prediction_refresher.get()
+
+    if published is None or published.predictions.empty:
+        raise HTTPException(status_code=404, detail="No churn data available")
+
+    return published
+
+
+def _validate_tier(tier: Optional[str]):
+    if tier is not None and tier not in RISK_TIERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid tier '{tier}'. Expected one of {list(RISK_TIERS)}",
+        )
+
+
+def _validate_range(min_probability: Optional[float], max_probability: Optional[float]):
+    if min_probability is not None and max_probability is not None and min_probability > max_probability:
+        raise HTTPException(status_code=400, detail="min_probability must not exceed max_probability")
+
+
 # -------------------------------------------------
 # MAIN CHURN ENDPOINT (FAST)
 # -------------------------------------------------
 @router.get("/churn")
 async def get_churn_predictions(
-    limit: int = Query(100, ge=1, le=1000, description="Number of records to return")
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    offset: int = Query(0, ge=0, description="Records to skip (ranked queries)"),
+    tier: Optional[str] = Query(None, description="Only this risk tier (Low/Medium/High)"),
+    min_probability: Optional[float] = Query(None, ge=0, le=1, description="Minimum churn probability"),
+    max_probability: Optional[float] = Query(None, ge=0, le=1, description="Maximum churn probability"),
 ):
     """
-    Get churn predictions (precomputed preferred)
+    Get churn predictions (precomputed by the background refresher).
+    With tier / probability filters, results are ranked by churn probability.
     """
-    try:
-        # ✅ 1. Load precomputed predictions (FAST PATH)
-        churn_df = data_loader.load_churn_predictions()
-
-        if churn_df is not None:
-            logger.info("Using precomputed churn predictions")
-
-            return {
-                "source": "precomputed",
-                "total_customers": len(churn_df),
-                "high_risk": int((churn_df["churn_risk"] == "High").sum()),
-                "medium_risk": int((churn_df["churn_risk"] == "Medium").sum()),
-                "low_risk": int((churn_df["churn_risk"] == "Low").sum()),
-                "data": churn_df.head(limit).to_dict(orient="records"),
-            }
+    _validate_tier(tier)
+    _validate_range(min_probability, max_probability)
+
+    published = await _published_predictions()
+    return await result_cache.get_or_compute(
+        "churn",
+        {"limit": limit, "offset": offset, "tier": tier,
+         "min_probability": min_probability, "max_probability": max_probability},
+        single_flight,
+        _compute_churn_predictions,
+        published, limit, offset, tier, min_probability, max_probability,
+        predictions=published,
+    )
 
-        # -------------------------------------------------
-        # 🔁 DEV FALLBACK (ONLY IF CSV IS MISSING)
-        # -------------------------------------------------
-        logger.warning("Precomputed churn predictions not found. Calculating on the fly.")
 
-        data = data_loader.load_all_data()
-        customers_df = data["customers"]
-        transactions_df = data["transactions"]
+def _compute_churn_predictions(
+    published: PublishedPredictions,
+    limit: int,
+    offset: int = 0,
+    tier: Optional[str] = None,
+    min_probability: Optional[float] = None,
+    max_probability: Optional[float] = None,
+):
+    try:
+        churn_df = published.predictions
+        index = published.index
 
-        rfm_df = feature_engineer.calculate_rfm_features(transactions_df)
-        features_df = feature_engineer.create_churn_features(customers_df, rfm_df)
-        churn_df = feature_engineer.predict_churn_risk(features_df)
+        ranked = tier is not None or min_probability is not None or max_probability is not None
+        if ranked:
+            matches, page = index.query(tier, min_probability, max_probability, limit, offset)
+        else:
+            matches, page = len(churn_df), churn_df.iloc[offset:offset + limit]
 
         return {
-            "source": "calculated",
-            "total_customers": len(churn_df),
-            "high_risk": int((churn_df["churn_risk"] == "High").sum()),
-            "medium_risk": int((churn_df["churn_risk"] == "Medium").sum()),
-            "low_risk": int((churn_df["churn_risk"] == "Low").sum()),
-            "data": churn_df.head(limit).to_dict(orient="records"),
+            "source": "precomputed",
+            "version": published.version,
+            "computed_at": published.computed_at,
+            "total_customers": index.size,
+            "high_risk": index.tier_counts["High"],
+            "medium_risk": index.tier_counts["Medium"],
+            "low_risk": index.tier_counts["Low"],
+            "matching": matches,
+            "data": page.to_dict(orient="records"),
         }
 
     except Exception as e:
@@ -76,21 +117,20 @@ async def get_customer_churn_prediction(customer_id: str):
     """
     Get churn prediction for a specific customer
     """
-    try:
-        churn_df = data_loader.load_churn_predictions()
+    published = await _published_predictions()
+    return await single_flight.do(
+        ("churn", published.version, customer_id), _lookup_customer_churn, published, customer_id
+    )
 
-        if churn_df is None:
-            raise HTTPException(
-                status_code=404,
-                detail="Precomputed churn predictions not available"
-            )
 
-        customer = churn_df[churn_df["customer_id"] == customer_id]
+def _lookup_customer_churn(published: PublishedPredictions, customer_id: str):
+    try:
+        customer = published.index.customer(customer_id)
 
-        if customer.empty:
+        if customer is None:
             raise HTTPException(status_code=404, detail="Customer not found")
 
-        return customer.iloc[0].to_dict()
+        return customer
 
     except HTTPException:
         raise
@@ -103,33 +143,42 @@ async def get_customer_churn_prediction(customer_id: str):
 # CHURN DISTRIBUTION (FAST)
 # -------------------------------------------------
 @router.get("/stats/distribution")
-async def get_churn_distribution():
+async def get_churn_distribution(
+    buckets: int = Query(0, ge=0, le=100, description="Probability histogram buckets (0 = none)")
+):
     """
     Get churn risk distribution
     """
-    try:
-        churn_df = data_loader.load_churn_predictions()
+    published = await _published_predictions()
+    return await result_cache.get_or_compute(
+        "churn-distribution", {"buckets": buckets}, single_flight,
+        _compute_churn_distribution, published, buckets,
+        predictions=published,
+    )
 
-        if churn_df is None or churn_df.empty:
-            raise HTTPException(status_code=404, detail="No churn data available")
 
-        distribution = churn_df["churn_risk"].value_counts().to_dict()
+def _compute_churn_distribution(published: PublishedPredictions, buckets: int = 0):
+    try:
+        index = published.index
+        total = index.size
 
-        return {
+        distribution = {tier: count for tier, count in index.tier_counts.items() if count}
+
+        result = {
             "distribution": distribution,
             "statistics": {
-                "total_customers": len(churn_df),
-                "high_risk_percentage": round((distribution.get("High", 0) / len(churn_df)) * 100, 2),
-                "medium_risk_percentage": round((distribution.get("Medium", 0) / len(churn_df)) * 100, 2),
-                "low_risk_percentage": round((distribution.get("Low", 0) / len(churn_df)) * 100, 2),
-                "avg_churn_probability": float(churn_df["churn_probability"].mean()),
-                "min_churn_probability": float(churn_df["churn_probability"].min()),
-                "max_churn_probability": float(churn_df["churn_probability"].max()),
+                "total_customers": total,
+                "high_risk_percentage": round((distribution.get("High", 0) / total) * 100, 2),
+                "medium_risk_percentage": round((distribution.get("Medium", 0) / total) * 100, 2),
+                "low_risk_percentage": round((distribution.get("Low", 0) / total) * 100, 2),
+                **index.stats,
             },
         }
+        if buckets:
+            result["histogram"] = index.histogram(buckets)
+
+        return result
 
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Churn distribution failed: {e}")
         raise HTTPException(status_code=500, detail="Churn distribution failed")
@@ -140,28 +189,150 @@ async def get_churn_distribution():
 # -------------------------------------------------
 @router.get("/high-risk")
 async def get_high_risk_customers(
-    limit: int = Query(100, ge=1, le=500, description="Max high-risk customers")
+    limit: int = Query(100, ge=1, le=500, description="Max high-risk customers"),
+    offset: int = Query(0, ge=0, description="Records to skip"),
+    tier: str = Query("High", description="Risk tier to rank (Low/Medium/High)"),
+    min_probability: Optional[float] = Query(None, ge=0, le=1, description="Minimum churn probability"),
+    max_probability: Optional[float] = Query(None, ge=0, le=1, description="Maximum churn probability"),
 ):
     """
-    Get top high-risk customers
+    Get top high-risk customers (top-K of any tier, highest probability first)
     """
-    try:
-        churn_df = data_loader.load_churn_predictions()
+    _validate_tier(tier)
+    _validate_range(min_probability, max_probability)
+
+    published = await _published_predictions()
+    return await result_cache.get_or_compute(
+        "high-risk",
+        {"limit": limit, "offset": offset, "tier": tier,
+         "min_probability": min_probability, "max_probability": max_probability},
+        single_flight,
+        _compute_high_risk_customers,
+        published, limit, offset, tier, min_probability, max_probability,
+        predictions=published,
+    )
 
-        if churn_df is None or churn_df.empty:
-            raise HTTPException(status_code=404, detail="No churn data available")
 
-        high_risk_df = churn_df[churn_df["churn_risk"] == "High"] \
-            .sort_values("churn_probability", ascending=False) \
-            .head(limit)
+def _compute_high_risk_customers(
+    published: PublishedPredictions,
+    limit: int,
+    offset: int = 0,
+    tier: str = "High",
+    min_probability: Optional[float] = None,
+    max_probability: Optional[float] = None,
+):
+    try:
+        matches, high_risk_df = published.index.query(
+            tier, min_probability, max_probability, limit, offset
+        )
 
         return {
             "count": len(high_risk_df),
+            "total": matches,
             "data": high_risk_df.to_dict(orient="records"),
         }
 
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"High-risk lookup failed: {e}")
         raise HTTPException(status_code=500, detail="High-risk lookup failed")
+
+
+# -------------------------------------------------
+# RISK THRESHOLD WHAT-IF (FAST)
+# -------------------------------------------------
+MAX_THRESHOLD_SCENARIOS = 5000
+
+
+def _parse_threshold_pairs(thresholds: Optional[str], grid_step: Optional[float]) -> List[Tuple[float, float]]:
+    """
+    '0.3:0.7,0.25:0.6' (+ every low <= high pair of a [0, 1] grid) -> pairs
+    """
+    pairs: List[Tuple[float, float]] = []
+    for part in (thresholds or "").split(","):
+        if not part.strip():
+            continue
+        try:
+            low, high = (float(value) for value in part.split(":"))
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid threshold pair '{part.strip()}'. Expected low:high"
+            ) from None
+        if not 0 <= low <= high <= 1:
+            raise HTTPException(
+                status_code=400, detail=f"Threshold pair '{part.strip()}' must satisfy 0 <= low <= high <= 1"
+            )
+        pairs.append((low, high))
+
+    if grid_step is not None:
+        grid = np.round(np.arange(0, 1 + grid_step / 2, grid_step), 6)
+        pairs.extend((float(low), float(high)) for i, low in enumerate(grid) for high in grid[i:])
+
+    if not pairs:
+        pairs.append(DEFAULT_RISK_THRESHOLDS)
+    if len(pairs) > MAX_THRESHOLD_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(pairs)} scenarios requested; at most {MAX_THRESHOLD_SCENARIOS} per call",
+        )
+    return pairs
+
+
+@router.get("/what-if/thresholds")
+async def get_threshold_scenarios(
+    thresholds: Optional[str] = Query(
+        None, description="low:high risk thresholds, comma-separated pairs (e.g. 0.3:0.7,0.25:0.6)"
+    ),
+    grid_step: Optional[float] = Query(
+        None, ge=0.02, le=0.5, description="Also try every low <= high pair on this grid over [0, 1]"
+    ),
+):
+    """
+    Risk tier sizes and revenue (monetary value) per tier for other
+    Low/Medium/High thresholds, answered from the published scores without
+    re-running feature engineering: Low <= low < Medium <= high < High
+    """
+    pairs = _parse_threshold_pairs(thresholds, grid_step)
+    published = await _published_predictions()
+    # Raw string as key: scenarios are returned in request order
+    return await result_cache.get_or_compute(
+        "threshold-scenarios", {"thresholds": thresholds, "grid_step": grid_step}, single_flight,
+        _compute_threshold_scenarios, published, pairs,
+        predictions=published,
+    )
+
+
+def _compute_threshold_scenarios(published: PublishedPredictions, pairs: List[Tuple[float, float]]):
+    try:
+        index = published.index
+        low, high = np.array(pairs, dtype=float).T
+        result = index.threshold_scenarios(low, high)
+        counts, monetary = result["counts"], result["monetary"]
+        # Every scenario splits the same total
+        total_value = float(sum(monetary[tier][0] for tier in RISK_TIERS))
+
+        scenarios = [
+            {
+                "low_threshold": float(low[i]),
+                "high_threshold": float(high[i]),
+                "counts": {tier: int(counts[tier][i]) for tier in RISK_TIERS},
+                "revenue": {tier: round(float(monetary[tier][i]), 2) for tier in RISK_TIERS},
+                "high_risk_percentage": round(counts["High"][i] / index.size * 100, 2) if index.size else 0.0,
+                "revenue_at_risk": round(float(monetary["High"][i]), 2),
+                "revenue_at_risk_percentage": (
+                    round(float(monetary["High"][i]) / total_value * 100, 2) if total_value else 0.0
+                ),
+            }
+            for i in range(len(pairs))
+        ]
+
+        return {
+            "version": published.version,
+            "total_customers": index.size,
+            "total_revenue": round(total_value, 2),
+            "current_thresholds": list(DEFAULT_RISK_THRESHOLDS),
+            "scenarios": scenarios,
+        }
+
+    except Exception as e:
+        logger.error(f"Threshold what-if failed: {e}")
+        raise HTTPException(status_code=500, detail="Threshold what-if failed")
@@ -5,12 +5,34 @@ AI message generator using Hugging Face
 import requests
 from typing import Optional, Dict
 import logging
+import time
 
 from src.utils.config import settings   # ✅ FIXED IMPORT
+from src.utils.metrics import AI_REQUEST_DURATION, AI_REQUESTS
+from src.utils.resilience import (
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceeded,
+    RetryBudget,
+    call_with_retries,
+    get_breaker,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class InferenceError(Exception):
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"Hugging Face API error: {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _is_service_failure(error: Exception) -> bool:
+    status = getattr(error, "status", None)
+    return status is None or status >= 500 or status == 429
+
+
 class AIMessageGenerator:
     def __init__(self):
         self.api_token = settings.HUGGINGFACE_TOKEN
@@ -20,36 +42,87 @@ class AIMessageGenerator:
             if self.api_token
             else {}
         )
-
-    def generate_retention_message(self, customer_data: Dict) -> Optional[str]:
+        self.breaker = get_breaker("huggingface")
+
+    def generate_retention_message(
+        self,
+        customer_data: Dict,
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[str]:
         """
         Generate a personalized SMS retention message using AI.
         Returns None if AI fails (fallback will be used).
+
+        Returns None at once while the breaker is open or the campaign
+        ``deadline`` has passed; otherwise retries transient errors within
+        ``retry_budget`` and AI_CALL_DEADLINE_SECONDS.
         """
         if not self.api_token:
+            AI_REQUESTS.labels("not_configured").inc()
             logger.warning("Hugging Face token not configured")
             return None
 
         prompt = self._create_prompt(customer_data)
 
-        try:
-            response = requests.post(
-                f"https://api-inference.huggingface.co/models/{self.model}",
-                headers=self.headers,
-                json={"inputs": prompt},
-                timeout=20,
-            )
+        call_seconds = settings.AI_CALL_DEADLINE_SECONDS
+        if deadline is not None:
+            if deadline.expired:
+                AI_REQUESTS.labels("deadline").inc()
+                return None
+            call_seconds = min(call_seconds, deadline.remaining())
+
+        def attempt(timeout: float):
+            start = time.perf_counter()
+            try:
+                response = requests.post(
+                    f"https://api-inference.huggingface.co/models/{self.model}",
+                    headers=self.headers,
+                    json={"inputs": prompt},
+                    timeout=timeout,
+                )
+            finally:
+                AI_REQUEST_DURATION.observe(time.perf_counter() - start)
 
             if response.status_code != 200:
-                logger.warning(f"Hugging Face API error: {response.status_code}")
-                return None
+                retry_after = response.headers.get("Retry-After")
+                raise InferenceError(
+                    response.status_code,
+                    float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+            return response.json()
 
-            result = response.json()
+        try:
+            result = call_with_retries(
+                "huggingface",
+                attempt,
+                timeout=settings.AI_REQUEST_TIMEOUT_SECONDS,
+                breaker=self.breaker,
+                budget=retry_budget,
+                deadline=Deadline(call_seconds),
+                is_failure=_is_service_failure,
+                retry_after=lambda e: getattr(e, "retry_after", None),
+            )
             message = self._extract_message(result)
 
+            AI_REQUESTS.labels("success" if message else "unusable").inc()
             return message
 
+        except CircuitOpenError:
+            AI_REQUESTS.labels("circuit_open").inc()
+            return None
+
+        except DeadlineExceeded:
+            AI_REQUESTS.labels("deadline").inc()
+            return None
+
+        except InferenceError as e:
+            AI_REQUESTS.labels("http_error").inc()
+            logger.warning(str(e))
+            return None
+
         except Exception as e:
+            AI_REQUESTS.labels("error").inc()
             logger.error(f"AI message generation failed: {e}")
             return None
 
@@ -59,11 +132,13 @@ class AIMessageGenerator:
         """
         name = customer_data.get("name", "Customer")
         days_since = customer_data.get("days_since", 30)
+        category = customer_data.get("favorite_category", "items you love")
 
         return (
             "Write a friendly retail SMS under 160 characters.\n"
             f"Customer name: {name}\n"
             f"Last visit: {days_since} days ago\n"
+            f"Favorite category: {category}\n"
             "Offer: 20% discount\n"
             "Tone: warm, simple, professional\n"
             "Do not use emojis.\n"
@@ -96,6 +171,7 @@ class AIMessageGenerator:
         """
         name = customer_data.get("name", "Customer")
         days = customer_data.get("days_since", 30)
+        category = customer_data.get("favorite_category", "items you love")
 
         if days > 60:
             offer = "25%"
@@ -109,6 +185,6 @@ class AIMessageGenerator:
 
         return (
             f"Hi {name}, {line} "
-            f"Enjoy {offer} off your next FreshMart visit. "
+            f"Enjoy {offer} off {category} on your next FreshMart visit. "
             f"Use code FRESH{days % 100:02d}. See you soon!"
         )
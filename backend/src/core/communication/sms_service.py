@@ -1,65 +1,128 @@
 """
-SMS service using Twilio
+SMS service using Twilio (through a pluggable transport)
 """
-from twilio.rest import Client
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+import threading
 import time
 import logging
 
+from src.core.communication.transports import SMSTransport, create_transport
 from src.utils.config import settings   # ✅ FIXED IMPORT
+from src.utils.concurrency import RateLimiter
+from src.utils.metrics import SMS_SEND_DURATION, SMS_SENDS
+from src.utils.resilience import (
+    CircuitOpenError,
+    Deadline,
+    RetryBudget,
+    call_with_retries,
+    get_breaker,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _is_provider_failure(error: Exception) -> bool:
+    """
+    Timeouts, connection errors, 5xx and 429 count against the provider;
+    other 4xx (bad number, opted out) are the message's fault
+    """
+    status = getattr(error, "status", None)
+    return status is None or status >= 500 or status == 429
+
+
 class SMSService:
-    def __init__(self):
+    def __init__(
+        self,
+        transport: Optional[SMSTransport] = None,
+        from_number: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        rate_limit_per_second: Optional[float] = None,
+    ):
         self.account_sid = settings.TWILIO_ACCOUNT_SID
-        self.auth_token = settings.TWILIO_AUTH_TOKEN
-        self.from_number = settings.TWILIO_PHONE_NUMBER
+        self.from_number = from_number or settings.TWILIO_PHONE_NUMBER
+        self.concurrency = max(1, concurrency or settings.SMS_SEND_CONCURRENCY)
+        self.rate_limit_per_second = (
+            settings.SMS_RATE_LIMIT_PER_SECOND if rate_limit_per_second is None else rate_limit_per_second
+        )
 
-        if all([self.account_sid, self.auth_token, self.from_number]):
-            self.client = Client(self.account_sid, self.auth_token)
-            logger.info("Twilio SMS service initialized")
+        self.breaker = get_breaker("twilio")
+        self.transport = transport if transport is not None else create_transport()
+        if self.transport is not None:
+            logger.info(f"SMS service initialized ({self.transport.name} transport)")
         else:
-            self.client = None
             logger.warning("Twilio credentials not fully configured")
 
     def is_configured(self) -> bool:
         """Check if SMS service is properly configured"""
-        return self.client is not None
+        return self.transport is not None
 
-    def send_sms(self, to_number: str, message: str) -> Dict:
+    def send_sms(
+        self,
+        to_number: str,
+        message: str,
+        retry_budget: Optional[RetryBudget] = None,
+        pace: Optional[Callable[[], None]] = None,
+    ) -> Dict:
         """
-        Send a single SMS
+        Send a single SMS.
+        Provider failures are retried with jittered backoff while
+        ``retry_budget`` and SMS_SEND_DEADLINE_SECONDS allow; ``pace`` runs
+        before every attempt (rate limiting).
         """
         if not self.is_configured():
+            SMS_SENDS.labels("not_configured").inc()
             return {
                 "success": False,
                 "error": "SMS service not configured",
                 "fallback": True,
             }
 
-        try:
-            sms_message = self._format_sms_message(message)
+        sms_message = self._format_sms_message(message)
+
+        def attempt(timeout: float) -> Dict:
+            if pace is not None:
+                pace()
+            start = time.perf_counter()
+            try:
+                return self.transport.send(to_number, sms_message, self.from_number, timeout)
+            finally:
+                SMS_SEND_DURATION.observe(time.perf_counter() - start)
 
-            twilio_message = self.client.messages.create(
-                body=sms_message,
-                from_=self.from_number,
-                to=to_number,
+        try:
+            sent = call_with_retries(
+                "sms",
+                attempt,
+                timeout=settings.SMS_HTTP_TIMEOUT_SECONDS,
+                breaker=self.breaker,
+                budget=retry_budget,
+                deadline=Deadline(settings.SMS_SEND_DEADLINE_SECONDS),
+                is_failure=_is_provider_failure,
+                retry_after=lambda e: getattr(e, "retry_after", None),
             )
+            SMS_SENDS.labels("sent").inc()
 
-            logger.info(
-                f"SMS sent to {to_number[:8]}**** | SID: {twilio_message.sid}"
+            logger.debug(
+                f"SMS sent to {to_number[:8]}**** | SID: {sent['sid']}"
             )
 
             return {
                 "success": True,
-                "message_sid": twilio_message.sid,
+                "message_sid": sent["sid"],
                 "to": to_number,
                 "status": "sent",
             }
 
+        except CircuitOpenError as e:
+            SMS_SENDS.labels("circuit_open").inc()
+            return {
+                "success": False,
+                "error": str(e),
+                "to": to_number,
+            }
+
         except Exception as e:
+            SMS_SENDS.labels("error").inc()
             logger.error(f"SMS sending failed to {to_number}: {e}")
             return {
                 "success": False,
@@ -67,12 +130,21 @@ class SMSService:
                 "to": to_number,
             }
 
-    def send_batch_sms(self, customers: List[Dict]) -> List[Dict]:
-        """
-        Send SMS to multiple customers with rate limiting
+    def send_batch_sms(
+        self,
+        customers: List[Dict],
+        on_result: Optional[Callable[[Dict, Dict], None]] = None,
+        retry_budget: Optional[RetryBudget] = None,
+    ) -> List[Dict]:
         """
-        results = []
+        Send SMS to multiple customers with rate limiting.
+        ``on_result(customer, result)`` is called as each message completes.
 
+        Up to SMS_SEND_CONCURRENCY messages are in flight at once, paced to
+        SMS_RATE_LIMIT_PER_SECOND; results keep the order of ``customers``.
+        All retries of the batch share one ``retry_budget`` (a fresh one per
+        call by default).
+        """
         if not self.is_configured():
             return [
                 {
@@ -84,38 +156,96 @@ class SMSService:
 
         logger.info(f"Starting batch SMS campaign for {len(customers)} customers")
 
-        for index, customer in enumerate(customers, start=1):
+        results: List[Optional[Dict]] = [None] * len(customers)
+
+        def collect(index: int, customer: Dict, result: Dict):
+            results[index] = result
+            if on_result is not None:
+                on_result(customer, result)
+
+        self.send_stream(customers, collect, retry_budget)
+        return results
+
+    def send_stream(
+        self,
+        customers: Iterable[Dict],
+        on_result: Callable[[int, Dict, Dict], None],
+        retry_budget: Optional[RetryBudget] = None,
+    ) -> int:
+        """
+        Send messages as ``customers`` yields them and return how many were
+        processed. ``on_result(index, customer, result)`` is called as each
+        message completes (in completion order).
+
+        The next customer is only pulled once one of the SMS_SEND_CONCURRENCY
+        send slots is free, so a lazy producer is throttled to the send rate.
+        """
+        limiter = RateLimiter(self.rate_limit_per_second)
+        retry_budget = retry_budget or RetryBudget()
+        completed = 0
+        successful = 0
+        completed_lock = threading.Lock()
+
+        logger.info(
+            f"Sending SMS (concurrency={self.concurrency}, "
+            f"rate={self.rate_limit_per_second or 'unlimited'}/s)"
+        )
+
+        def deliver(index: int, customer: Dict):
+            nonlocal completed, successful
             name = customer.get("name", "Customer")
             phone = customer.get("phone")
             message = customer.get("message")
 
             if not phone or not message:
-                results.append(
-                    {
-                        "success": False,
-                        "error": "Missing phone or message",
-                        "customer": name,
-                    }
-                )
-                continue
-
-            result = self.send_sms(phone, message)
-            result["customer"] = name
-            results.append(result)
-
-            # Rate limit: 1 SMS every 2 seconds
-            if index < len(customers):
-                time.sleep(2)
-
-            if index % 10 == 0:
-                logger.info(f"Progress: {index}/{len(customers)} SMS sent")
-
-        successful = sum(1 for r in results if r.get("success"))
+                result = {
+                    "success": False,
+                    "error": "Missing phone or message",
+                    "customer": name,
+                }
+            else:
+                result = self.send_sms(phone, message, retry_budget, pace=limiter.acquire)
+                result["customer"] = name
+
+            on_result(index, customer, result)
+
+            with completed_lock:
+                completed += 1
+                successful += bool(result.get("success"))
+                done = completed
+            if done % 10 == 0:
+                logger.info(f"Progress: {done} SMS sent")
+
+        if self.concurrency == 1:
+            for index, customer in enumerate(customers):
+                deliver(index, customer)
+        else:
+            slots = threading.BoundedSemaphore(self.concurrency)
+            errors: List[Exception] = []
+
+            def run(index: int, customer: Dict):
+                try:
+                    deliver(index, customer)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    slots.release()
+
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="sms-send") as pool:
+                for index, customer in enumerate(customers):
+                    slots.acquire()
+                    if errors:
+                        break
+                    pool.submit(run, index, customer)
+
+            if errors:
+                raise errors[0]
+
         logger.info(
-            f"Batch campaign complete: {successful}/{len(customers)} successful"
+            f"Batch campaign complete: {successful}/{completed} successful "
+            f"(retries used: {retry_budget.retries})"
         )
-
-        return results
+        return completed
 
     def _format_sms_message(self, message: str) -> str:
         """
@@ -137,10 +267,10 @@ class SMSService:
             return {"success": False, "error": "SMS service not configured"}
 
         try:
-            account = self.client.api.accounts(self.account_sid).fetch()
+            account = self.transport.check()
             return {
                 "success": True,
-                "account_status": account.status,
+                "account_status": account["status"],
                 "from_number": self.from_number,
             }
         except Exception as e:
@@ -0,0 +1,167 @@
+"""
+SMS transports
+
+SMSService talks to a transport rather than to the Twilio SDK directly:
+
+* ``TwilioSDKTransport`` – the official ``twilio`` client (default)
+* ``HTTPTransport`` – Twilio's Messages REST API over a pooled keep-alive
+  ``requests.Session``; ``base_url`` can point at any compatible server,
+  e.g. the local fake provider in ``benchmarks/fake_sms_provider.py``
+"""
+from typing import Dict, Optional
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "2010-04-01"
+
+
+class TransportError(Exception):
+    """
+    Provider rejected or failed a request
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status == 429
+
+
+class SMSTransport:
+    """
+    Sends one message; raises TransportError (or any exception) on failure
+    """
+    name = "base"
+
+    def send(self, to_number: str, body: str, from_number: str, timeout: Optional[float] = None) -> Dict:
+        """
+        Returns at least {"sid": ..., "status": ...}
+        """
+        raise NotImplementedError
+
+    def check(self) -> Dict:
+        """
+        Account status (used by SMSService.test_connection)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TwilioSDKTransport(SMSTransport):
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str):
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        self.account_sid = account_sid
+        # The SDK client has one fixed timeout, so per-call deadlines only
+        # shorten retries here, not an attempt already in flight
+        self.client = Client(
+            account_sid,
+            auth_token,
+            http_client=TwilioHttpClient(timeout=settings.SMS_HTTP_TIMEOUT_SECONDS),
+        )
+
+    def send(self, to_number: str, body: str, from_number: str, timeout: Optional[float] = None) -> Dict:
+        message = self.client.messages.create(body=body, from_=from_number, to=to_number)
+        return {"sid": message.sid, "status": message.status}
+
+    def check(self) -> Dict:
+        account = self.client.api.accounts(self.account_sid).fetch()
+        return {"status": account.status}
+
+
+class HTTPTransport(SMSTransport):
+    """
+    Twilio-compatible REST transport with a shared connection pool, so
+    concurrent senders reuse warm keep-alive connections instead of paying
+    a TCP + TLS handshake per message
+    """
+    name = "http"
+
+    def __init__(
+        self,
+        account_sid: str,
+        auth_token: str,
+        base_url: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.account_sid = account_sid
+        self.base_url = (base_url or settings.SMS_API_BASE_URL).rstrip("/")
+        self.timeout = timeout or settings.SMS_HTTP_TIMEOUT_SECONDS
+        pool_size = pool_size or settings.SMS_HTTP_POOL_SIZE
+
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def account_url(self) -> str:
+        return f"{self.base_url}/{API_VERSION}/Accounts/{self.account_sid}"
+
+    def _raise_for_status(self, response: requests.Response):
+        if response.ok:
+            return
+        try:
+            detail = response.json().get("message", response.text)
+        except ValueError:
+            detail = response.text
+        retry_after = response.headers.get("Retry-After")
+        raise TransportError(
+            f"HTTP {response.status_code}: {detail}",
+            status=response.status_code,
+            retry_after=float(retry_after) if retry_after else None,
+        )
+
+    def send(self, to_number: str, body: str, from_number: str, timeout: Optional[float] = None) -> Dict:
+        response = self.session.post(
+            f"{self.account_url}/Messages.json",
+            data={"To": to_number, "From": from_number, "Body": body},
+            timeout=timeout or self.timeout,
+        )
+        self._raise_for_status(response)
+        payload = response.json()
+        return {"sid": payload.get("sid", ""), "status": payload.get("status", "queued")}
+
+    def check(self) -> Dict:
+        response = self.session.get(f"{self.account_url}.json", timeout=self.timeout)
+        self._raise_for_status(response)
+        return {"status": response.json().get("status", "unknown")}
+
+    def close(self):
+        self.session.close()
+
+
+TRANSPORTS = {
+    "twilio": TwilioSDKTransport,
+    "http": HTTPTransport,
+}
+
+
+def create_transport(name: Optional[str] = None) -> Optional[SMSTransport]:
+    """
+    Transport configured by SMS_TRANSPORT, or None without credentials
+    """
+    name = name or settings.SMS_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown SMS transport '{name}'. Expected one of {list(TRANSPORTS)}")
+
+    if not all([settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_PHONE_NUMBER]):
+        return None
+
+    return TRANSPORTS[name](settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
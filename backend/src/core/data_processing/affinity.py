@@ -0,0 +1,290 @@
+"""
+Sparse customer x category spend (affinity) matrix
+
+Spend is summed per (customer, product) into a compressed sparse row (CSR)
+matrix: row c lists only the products customer c bought, so memory is
+bounded by the distinct pairs and a customer's profile (favorite category,
+category shares, top products) costs O(nnz of the row). The category
+matrix is the product matrix with its columns merged through the
+product -> category map, so a changed product catalog re-maps columns
+without rescanning transactions.
+
+Matrices are never modified in place: adding a batch of transactions
+builds new ones (the id dictionaries are append-only), so readers can keep
+using the object they were given while an update is in progress.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class SparseMatrix:
+    """
+    Minimal CSR matrix of float64 sums (NumPy only). Column indices are
+    sorted within each row.
+    """
+    __slots__ = ("indptr", "indices", "data", "shape")
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+
+    @classmethod
+    def empty(cls, n_rows: int = 0, n_cols: int = 0) -> "SparseMatrix":
+        return cls(
+            np.zeros(n_rows + 1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.float64),
+            (n_rows, n_cols),
+        )
+
+    @classmethod
+    def from_triplets(cls, rows, cols, values, shape: Tuple[int, int]) -> "SparseMatrix":
+        """
+        Sum ``values`` into cells (rows[i], cols[i]); repeated cells are added
+        """
+        n_rows, n_cols = shape
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return cls.empty(n_rows, n_cols)
+
+        keys = rows * n_cols + np.asarray(cols, dtype=np.int64)
+        # Stable sort is a merge of runs: near linear on already sorted batches
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        data = np.add.reduceat(np.asarray(values, dtype=np.float64)[order], starts)
+        cell_rows, indices = np.divmod(keys[starts], n_cols)
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, indices.astype(np.int32), data, shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def _rows(self) -> np.ndarray:
+        return np.repeat(np.arange(self.shape[0], dtype=np.int64), np.diff(self.indptr))
+
+    def row(self, r: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (column indices, values) of row ``r``
+        """
+        start, stop = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+    def plus(self, other: "SparseMatrix") -> "SparseMatrix":
+        """
+        Cell-wise sum; the result covers both shapes
+        """
+        shape = (max(self.shape[0], other.shape[0]), max(self.shape[1], other.shape[1]))
+        return SparseMatrix.from_triplets(
+            np.concatenate([self._rows(), other._rows()]),
+            np.concatenate([self.indices, other.indices]),
+            np.concatenate([self.data, other.data]),
+            shape,
+        )
+
+    def map_columns(self, mapping: np.ndarray, n_cols: int) -> "SparseMatrix":
+        """
+        Merge columns: column j is added into ``mapping[j]`` (dropped when < 0)
+        """
+        cols = mapping[self.indices]
+        keep = cols >= 0
+        return SparseMatrix.from_triplets(
+            self._rows()[keep], cols[keep], self.data[keep], (self.shape[0], n_cols)
+        )
+
+    def row_sums(self) -> np.ndarray:
+        return np.bincount(self._rows(), weights=self.data, minlength=self.shape[0])
+
+    def row_argmax(self) -> np.ndarray:
+        """
+        Column of the largest value per row (lowest column on ties, -1 for empty rows)
+        """
+        best = np.full(self.shape[0], -1, dtype=np.int64)
+        non_empty = np.flatnonzero(np.diff(self.indptr))
+        if len(non_empty):
+            starts = self.indptr[non_empty]
+            row_max = np.maximum.reduceat(self.data, starts)
+            lengths = np.diff(self.indptr)[non_empty]
+            # First cell at its row's maximum: columns are sorted within rows
+            maxima = np.flatnonzero(self.data == np.repeat(row_max, lengths))
+            best[non_empty] = self.indices[maxima[np.searchsorted(maxima, starts)]]
+        return best
+
+
+class CustomerAffinity:
+    """
+    Customer x product spend, and the customer x category spend derived
+    from it through the product catalog
+    """
+
+    def __init__(self):
+        self.customer_ids = pd.Index([], dtype=object)   # row -> customer_id
+        self.product_ids = pd.Index([], dtype=object)    # product column -> product_id
+        self.categories = pd.Index([], dtype=object)     # category column -> category
+        self.product_category = np.zeros(0, dtype=np.int64)  # product column -> category column (-1 unknown)
+        self.spend = SparseMatrix.empty()                # customers x products
+        self.category_spend = SparseMatrix.empty()       # customers x categories
+        self._catalog = pd.Series(dtype=object)          # product_id -> category
+
+    def copy(self) -> "CustomerAffinity":
+        # Updates replace arrays and indexes instead of mutating them: sharing is safe
+        other = CustomerAffinity()
+        other.__dict__.update(self.__dict__)
+        return other
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    @staticmethod
+    def _extend(index: pd.Index, ids: Sequence) -> Tuple[pd.Index, np.ndarray]:
+        """
+        ``index`` with the unseen ``ids`` appended, and the code of every id
+        """
+        ids = pd.Index(np.asarray(ids, dtype=object))
+        codes = index.get_indexer(ids)
+        unseen = codes < 0
+        if unseen.any():
+            index = index.append(ids[unseen])
+            codes[unseen] = np.arange(len(index) - unseen.sum(), len(index))
+        return index, codes
+
+    def set_catalog(self, products: Optional[pd.DataFrame]) -> "CustomerAffinity":
+        """
+        Use ``products`` (product_id, category) to map products to categories
+        """
+        if products is not None and {"product_id", "category"} <= set(products.columns):
+            catalog = products.drop_duplicates("product_id").set_index("product_id")["category"]
+            self._catalog = catalog[catalog.notna()].astype(str)
+            self._catalog.index = self._catalog.index.astype(str)
+        else:
+            self._catalog = pd.Series(dtype=object)
+
+        self.categories = pd.Index(sorted(self._catalog.unique()), dtype=object)
+        self.product_category = self._categories_of(self.product_ids)
+        self.category_spend = self.spend.map_columns(self.product_category, len(self.categories))
+        return self
+
+    def _categories_of(self, product_ids: pd.Index) -> np.ndarray:
+        labels = self._catalog.reindex(product_ids)
+        return self.categories.get_indexer(labels).astype(np.int64)
+
+    def add(
+        self,
+        customer_codes: np.ndarray,
+        customer_ids: Sequence,
+        product_codes: np.ndarray,
+        product_ids: Sequence,
+        amounts: np.ndarray,
+    ) -> "CustomerAffinity":
+        """
+        Add transactions given as codes into the ``customer_ids`` and
+        ``product_ids`` dictionaries (negative codes are skipped), with their
+        amounts
+        """
+        customer_codes = np.asarray(customer_codes)
+        product_codes = np.asarray(product_codes)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        valid = (customer_codes >= 0) & (product_codes >= 0) & ~np.isnan(amounts)
+        if not valid.any():
+            return self
+
+        self.customer_ids, customer_map = self._extend(self.customer_ids, customer_ids)
+        products_before = len(self.product_ids)
+        self.product_ids, product_map = self._extend(self.product_ids, product_ids)
+        if len(self.product_ids) > products_before:
+            self.product_category = np.concatenate(
+                [self.product_category, self._categories_of(self.product_ids[products_before:])]
+            )
+
+        delta = SparseMatrix.from_triplets(
+            customer_map[customer_codes[valid]],
+            product_map[product_codes[valid]],
+            amounts[valid],
+            (len(self.customer_ids), len(self.product_ids)),
+        )
+        self.spend = self.spend.plus(delta)
+        self.category_spend = self.category_spend.plus(
+            delta.map_columns(self.product_category, len(self.categories))
+        )
+        return self
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def _row(self, customer_id: str) -> Optional[int]:
+        try:
+            return int(self.customer_ids.get_loc(str(customer_id)))
+        except KeyError:
+            return None
+
+    def profile(self, customer_id: str, top_products: int = 3) -> Optional[Dict]:
+        """
+        Total spend, spend share per category (largest first) and the
+        ``top_products`` products with the highest spend; None for unknown
+        customers
+        """
+        row = self._row(customer_id)
+        if row is None:
+            return None
+
+        categories, category_spend = self.category_spend.row(row)
+        products, product_spend = self.spend.row(row)
+        total = float(product_spend.sum())
+        categorized = float(category_spend.sum())
+
+        by_category = np.argsort(-category_spend, kind="stable")
+        by_product = np.argsort(-product_spend, kind="stable")[:top_products]
+        shares = [
+            {
+                "category": self.categories[categories[i]],
+                "spend": round(float(category_spend[i]), 2),
+                "share": round(float(category_spend[i]) / categorized, 4) if categorized else 0.0,
+            }
+            for i in by_category
+        ]
+        return {
+            "customer_id": str(customer_id),
+            "total_spend": round(total, 2),
+            "favorite_category": shares[0]["category"] if shares else None,
+            "category_share": shares,
+            "top_products": [
+                {
+                    "product_id": self.product_ids[products[i]],
+                    "category": self._catalog.get(self.product_ids[products[i]]),
+                    "spend": round(float(product_spend[i]), 2),
+                }
+                for i in by_product
+            ],
+        }
+
+    def favorite_categories(self) -> pd.DataFrame:
+        """
+        (customer_id, favorite_category) for every customer with categorized spend
+        """
+        best = self.category_spend.row_argmax()
+        known = best >= 0
+        return pd.DataFrame({
+            "customer_id": self.customer_ids[known].to_numpy(),
+            "favorite_category": self.categories.to_numpy()[best[known]],
+        })
+
+    def stats(self) -> Dict:
+        return {
+            "customers": len(self.customer_ids),
+            "products": len(self.product_ids),
+            "categories": len(self.categories),
+            "product_nnz": self.spend.nnz,
+            "category_nnz": self.category_spend.nnz,
+            "bytes": self.spend.nbytes + self.category_spend.nbytes,
+        }
@@ -0,0 +1,294 @@
+"""
+Bitmap indexes for multi-predicate customer segment targeting
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bits set in each byte value, for popcount over packed bitmaps
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+CATEGORICAL_COLUMNS = ("churn_risk", "loyalty_tier", "city", "favorite_category")
+FLAG_COLUMNS = ("has_phone", "has_email")
+
+# Range-encoded bucket edges: one bitmap per edge holding "value > edge"
+NUMERIC_EDGES: Dict[str, Tuple[float, ...]] = {
+    "recency": (7, 14, 30, 45, 60, 90, 120, 180, 270, 365, 540),
+    "monetary": (25, 50, 100, 250, 500, 1000, 2500, 5000),
+    "age": (25, 35, 45, 55, 65),
+}
+
+
+class Bitmap:
+    """
+    Fixed-size bitset packed into uint8 (8 rows per byte)
+    """
+    __slots__ = ("bits", "size")
+
+    def __init__(self, bits: np.ndarray, size: int):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Bitmap":
+        return cls(np.packbits(np.asarray(mask, dtype=bool)), len(mask))
+
+    @classmethod
+    def empty(cls, size: int) -> "Bitmap":
+        return cls(np.zeros((size + 7) // 8, dtype=np.uint8), size)
+
+    @classmethod
+    def full(cls, size: int) -> "Bitmap":
+        return cls.from_mask(np.ones(size, dtype=bool))
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits & other.bits, self.size)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits | other.bits, self.size)
+
+    def __invert__(self) -> "Bitmap":
+        inverted = ~self.bits
+        # Clear padding bits past ``size`` so counts stay exact
+        tail = self.size % 8
+        if tail:
+            inverted[-1] &= np.uint8((0xFF << (8 - tail)) & 0xFF)
+        return Bitmap(inverted, self.size)
+
+    def and_not(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits & ~other.bits, self.size)
+
+    def count(self) -> int:
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def rows(self) -> np.ndarray:
+        """
+        Set row positions in ascending order
+        """
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.size))
+
+    def to_mask(self) -> np.ndarray:
+        return np.unpackbits(self.bits, count=self.size).astype(bool)
+
+
+@dataclass
+class SegmentQuery:
+    """
+    Values inside one attribute are ORed; attributes are ANDed
+    """
+    churn_risk: List[str] = field(default_factory=list)
+    loyalty_tier: List[str] = field(default_factory=list)
+    city: List[str] = field(default_factory=list)
+    favorite_category: List[str] = field(default_factory=list)
+    has_phone: Optional[bool] = None
+    has_email: Optional[bool] = None
+    min_recency: Optional[float] = None
+    max_recency: Optional[float] = None
+    min_monetary: Optional[float] = None
+    max_monetary: Optional[float] = None
+    min_age: Optional[float] = None
+    max_age: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not any(
+            value not in (None, [], ())
+            for value in self.__dict__.values()
+        )
+
+    def cache_key(self) -> Tuple:
+        return tuple(
+            tuple(sorted(v)) if isinstance(v, list) else v
+            for v in self.__dict__.values()
+        )
+
+
+class CustomerSegmentIndex:
+    """
+    Bitmaps over categorical and bucketed numeric customer attributes.
+
+    Rows follow the order of the ``customers`` frame. Categorical values get
+    one bitmap each; numeric columns are range-encoded ("value > edge"), so
+    thresholds that fall on an edge are a single bitmap and other thresholds
+    only inspect rows of the one bucket they split.
+    """
+
+    def __init__(self, customers: pd.DataFrame, attributes: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            customers: Customer rows (defines row order)
+            attributes: Optional per-customer attributes keyed by customer_id
+                (e.g. churn_risk / recency / monetary from predictions)
+        """
+        self.customers = customers.reset_index(drop=True)
+        self.size = len(self.customers)
+        frame = self.customers
+
+        if attributes is not None and not attributes.empty:
+            extra = [c for c in attributes.columns if c != "customer_id" and c not in frame.columns]
+            if extra:
+                aligned = attributes.drop_duplicates("customer_id").set_index("customer_id")[extra]
+                frame = frame.join(aligned, on="customer_id")
+
+        self._categorical: Dict[str, Dict[str, Bitmap]] = {}
+        for column in CATEGORICAL_COLUMNS:
+            if column in frame.columns:
+                self._categorical[column] = self._build_categorical(frame[column])
+
+        self._flags: Dict[str, Bitmap] = {}
+        if "phone" in frame.columns:
+            self._flags["has_phone"] = Bitmap.from_mask(frame["phone"].notna().to_numpy())
+        if "email" in frame.columns:
+            self._flags["has_email"] = Bitmap.from_mask(frame["email"].notna().to_numpy())
+
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._known: Dict[str, Bitmap] = {}
+        self._greater: Dict[str, List[Bitmap]] = {}
+        for column, edges in NUMERIC_EDGES.items():
+            if column in frame.columns:
+                values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float)
+                self._numeric[column] = values
+                self._known[column] = Bitmap.from_mask(~np.isnan(values))
+                self._greater[column] = [Bitmap.from_mask(values > edge) for edge in edges]
+
+        logger.info(
+            f"Built segment index over {self.size} customers "
+            f"({sum(len(v) for v in self._categorical.values())} categorical bitmaps)"
+        )
+
+    @staticmethod
+    def _build_categorical(series: pd.Series) -> Dict[str, Bitmap]:
+        codes, uniques = pd.factorize(series, sort=False)
+        return {
+            str(value): Bitmap.from_mask(codes == code)
+            for code, value in enumerate(uniques)
+        }
+
+    # -----------------------------
+    # Primitive predicates
+    # -----------------------------
+    def all(self) -> Bitmap:
+        return Bitmap.full(self.size)
+
+    def values(self, column: str) -> List[str]:
+        return sorted(self._categorical.get(column, {}))
+
+    def eq(self, column: str, value: str) -> Bitmap:
+        bitmaps = self._categorical.get(column)
+        if bitmaps is None:
+            raise KeyError(f"No bitmap index for column '{column}'")
+        bitmap = bitmaps.get(str(value))
+        return bitmap if bitmap is not None else Bitmap.empty(self.size)
+
+    def any_of(self, column: str, values: Iterable[str]) -> Bitmap:
+        result = Bitmap.empty(self.size)
+        for value in values:
+            result = result | self.eq(column, value)
+        return result
+
+    def flag(self, name: str, expected: bool = True) -> Bitmap:
+        bitmap = self._flags.get(name)
+        if bitmap is None:
+            raise KeyError(f"No bitmap index for flag '{name}'")
+        return bitmap if expected else ~bitmap
+
+    def greater_than(self, column: str, threshold: float, inclusive: bool = False) -> Bitmap:
+        """
+        Rows with value > threshold (>= when inclusive). Missing values never match.
+        """
+        if column not in self._numeric:
+            raise KeyError(f"No bitmap index for column '{column}'")
+
+        edges = NUMERIC_EDGES[column]
+        upper = int(np.searchsorted(edges, threshold, side="left"))
+
+        # Edge-aligned strict threshold: a single precomputed bitmap
+        if not inclusive and upper < len(edges) and edges[upper] == threshold:
+            return self._greater[column][upper]
+
+        # Rows above the next edge match wholesale ...
+        result = self._greater[column][upper] if upper < len(edges) else Bitmap.empty(self.size)
+
+        # ... plus rows inside the bucket the threshold splits, checked exactly
+        lower_bitmap = self._greater[column][upper - 1] if upper > 0 else self._known[column]
+        bucket = lower_bitmap.and_not(result)
+        candidates = bucket.rows()
+        if len(candidates):
+            values = self._numeric[column][candidates]
+            hits = candidates[values >= threshold if inclusive else values > threshold]
+            mask = np.zeros(self.size, dtype=bool)
+            mask[hits] = True
+            result = result | Bitmap.from_mask(mask)
+        return result
+
+    def between(self, column: str, minimum: Optional[float], maximum: Optional[float]) -> Bitmap:
+        """
+        Rows with minimum <= value <= maximum (either bound optional)
+        """
+        result = self._known[column]
+        if minimum is not None:
+            result = result & self.greater_than(column, minimum, inclusive=True)
+        if maximum is not None:
+            result = result.and_not(self.greater_than(column, maximum))
+        return result
+
+    # -----------------------------
+    # Segment queries
+    # -----------------------------
+    def evaluate(self, query: SegmentQuery) -> Bitmap:
+        result = self.all()
+
+        for column in CATEGORICAL_COLUMNS:
+            wanted = getattr(query, column)
+            if wanted:
+                if column not in self._categorical:
+                    return Bitmap.empty(self.size)
+                result = result & self.any_of(column, wanted)
+
+        for name in FLAG_COLUMNS:
+            expected = getattr(query, name)
+            if expected is not None:
+                result = result & self.flag(name, expected)
+
+        for column in NUMERIC_EDGES:
+            minimum = getattr(query, f"min_{column}")
+            maximum = getattr(query, f"max_{column}")
+            if minimum is None and maximum is None:
+                continue
+            if column not in self._numeric:
+                return Bitmap.empty(self.size)
+            result = result & self.between(column, minimum, maximum)
+
+        return result
+
+    def count(self, query: SegmentQuery) -> int:
+        return self.evaluate(query).count()
+
+    def members(self, query: SegmentQuery, offset: int = 0, limit: Optional[int] = None) -> pd.DataFrame:
+        rows = self.evaluate(query).rows()
+        stop = None if limit is None else offset + limit
+        return self.customers.iloc[rows[offset:stop]]
+
+    def breakdown(self, bitmap: Bitmap, columns: Sequence[str] = ("churn_risk", "loyalty_tier")) -> Dict[str, Dict[str, int]]:
+        """
+        Per-value counts inside a segment, straight from bitmap intersections
+        """
+        return {
+            column: {value: (bitmap & value_bitmap).count() for value, value_bitmap in sorted(self._categorical[column].items())}
+            for column in columns
+            if column in self._categorical
+        }
+
+
+def parse_csv_values(value: Optional[str]) -> List[str]:
+    """
+    'Gold,Platinum' -> ['Gold', 'Platinum'] (query-string helper)
+    """
+    if not value:
+        return []
+    return [part.strip() for part in value.split(",") if part.strip()]
+
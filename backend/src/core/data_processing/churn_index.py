@@ -0,0 +1,199 @@
+"""
+Churn-probability ranked index over published predictions
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RISK_TIERS = ("Low", "Medium", "High")
+
+# (low, high): Low <= low < Medium <= high < High
+DEFAULT_RISK_THRESHOLDS = (0.3, 0.7)
+
+
+class ChurnRiskIndex:
+    """
+    Predictions sorted by churn probability, built once per data version.
+
+    * top-K overall or within a tier: O(K)
+    * probability range queries: O(log n + K)
+    * percentile rank of a customer: O(log n)
+    * histogram buckets: O(B log n)
+    * tier sizes / value under other risk thresholds: O(S log n) for S pairs
+    """
+
+    def __init__(self, predictions: pd.DataFrame):
+        self.predictions = predictions.reset_index(drop=True)
+        probabilities = self.predictions["churn_probability"].to_numpy(dtype=float)
+        tiers = self.predictions["churn_risk"].to_numpy()
+
+        # Descending order; rows holds the frame positions in that order
+        order = np.argsort(-probabilities, kind="stable")
+        self._rows: Dict[Optional[str], np.ndarray] = {None: order}
+        for tier in RISK_TIERS:
+            self._rows[tier] = order[tiers[order] == tier]
+
+        # Negated probabilities in descending-probability order are ascending,
+        # so range bounds are a searchsorted away
+        self._negated = {tier: -probabilities[rows] for tier, rows in self._rows.items()}
+
+        # Ascending copy for rank / histogram (unscored NaN rows sort last)
+        self._ascending = np.sort(probabilities)
+        self._position = pd.Index(self.predictions["customer_id"])
+
+        # Threshold what-ifs: scored probabilities ascending, with prefix sums
+        # of monetary value in the same order. Unscored (NaN) rows always
+        # land in Medium, as in FeatureEngineer.predict_churn_risk.
+        monetary = (
+            np.nan_to_num(self.predictions["monetary"].to_numpy(dtype=float))
+            if "monetary" in self.predictions.columns
+            else np.zeros(len(probabilities))
+        )
+        scored = ~np.isnan(probabilities)
+        by_probability = np.argsort(probabilities[scored], kind="stable")
+        self._scored = probabilities[scored][by_probability]
+        self._monetary_prefix = np.concatenate(([0.0], np.cumsum(monetary[scored][by_probability])))
+        self._unscored = (int((~scored).sum()), float(monetary[~scored].sum()))
+
+        n = len(probabilities)
+        self.size = n
+        self.tier_counts = {tier: len(self._rows[tier]) for tier in RISK_TIERS}
+        # Over scored rows only, like pandas' NaN-skipping mean/min/max; null
+        # (not NaN, which is not valid JSON) when nothing is scored, e.g. when
+        # every risk score is equal and normalization divides by zero
+        scored_values = self._scored
+        if len(scored_values):
+            self.stats = {
+                "avg_churn_probability": float(scored_values.mean()),
+                "min_churn_probability": float(scored_values[0]),
+                "max_churn_probability": float(scored_values[-1]),
+            }
+        else:
+            self.stats = {
+                "avg_churn_probability": None if n else 0.0,
+                "min_churn_probability": None if n else 0.0,
+                "max_churn_probability": None if n else 0.0,
+            }
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def _frame(self, rows: np.ndarray) -> pd.DataFrame:
+        return self.predictions.iloc[rows]
+
+    def _range_bounds(
+        self, tier: Optional[str], min_probability: Optional[float], max_probability: Optional[float]
+    ) -> Tuple[int, int]:
+        """
+        [start, stop) positions in the descending array of ``tier`` whose
+        probability lies within [min_probability, max_probability]
+        """
+        negated = self._negated[tier]
+        start = 0 if max_probability is None else int(np.searchsorted(negated, -max_probability, side="left"))
+        stop = len(negated) if min_probability is None else int(
+            np.searchsorted(negated, -min_probability, side="right")
+        )
+        return start, max(start, stop)
+
+    def query(
+        self,
+        tier: Optional[str] = None,
+        min_probability: Optional[float] = None,
+        max_probability: Optional[float] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Tuple[int, pd.DataFrame]:
+        """
+        Customers ordered by descending churn probability.
+        Returns (total matches, requested page).
+        """
+        start, stop = self._range_bounds(tier, min_probability, max_probability)
+        page = self._rows[tier][start + offset:min(stop, start + offset + limit)]
+        return stop - start, self._frame(page)
+
+    def top(self, k: int, tier: Optional[str] = None) -> pd.DataFrame:
+        return self._frame(self._rows[tier][:k])
+
+    def _locate(self, customer_id: str) -> Optional[int]:
+        try:
+            position = self._position.get_loc(customer_id)
+        except KeyError:
+            return None
+        return int(position) if isinstance(position, (int, np.integer)) else None
+
+    def customer(self, customer_id: str) -> Optional[Dict]:
+        """
+        Prediction row for a customer plus its rank and percentile
+        """
+        position = self._locate(customer_id)
+        if position is None:
+            return None
+        return {**self.predictions.iloc[position].to_dict(), **self.percentile(customer_id)}
+
+    def percentile(self, customer_id: str) -> Optional[Dict]:
+        """
+        Rank (1 = highest risk) and percentile (share of customers with a
+        lower or equal probability)
+        """
+        position = self._locate(customer_id)
+        if position is None:
+            return None
+
+        probability = float(self.predictions.at[position, "churn_probability"])
+        at_or_below = int(np.searchsorted(self._ascending, probability, side="right"))
+        strictly_above = self.size - at_or_below
+        return {
+            "rank": strictly_above + 1,
+            "percentile": round(at_or_below / self.size * 100, 2),
+        }
+
+    def threshold_scenarios(self, low: np.ndarray, high: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Tier sizes and monetary value per tier if churn_risk were assigned
+        with thresholds (low[i], high[i]) instead of the published ones:
+        two binary searches and prefix-sum lookups per pair
+        """
+        low = np.asarray(low, dtype=float)
+        high = np.maximum(np.asarray(high, dtype=float), low)
+        prefix = self._monetary_prefix
+        at_or_below_low = np.searchsorted(self._scored, low, side="right")
+        at_or_below_high = np.searchsorted(self._scored, high, side="right")
+        unscored_count, unscored_value = self._unscored
+
+        return {
+            "counts": {
+                "Low": at_or_below_low,
+                "Medium": at_or_below_high - at_or_below_low + unscored_count,
+                "High": len(self._scored) - at_or_below_high,
+            },
+            "monetary": {
+                "Low": prefix[at_or_below_low],
+                "Medium": prefix[at_or_below_high] - prefix[at_or_below_low] + unscored_value,
+                "High": prefix[-1] - prefix[at_or_below_high],
+            },
+        }
+
+    def histogram(self, buckets: int) -> List[Dict]:
+        """
+        Scored probabilities per bucket; unscored rows fall in no bucket
+        """
+        lo = self.stats["min_churn_probability"] or 0.0
+        hi = self.stats["max_churn_probability"] or 0.0
+        edges = np.linspace(min(lo, 0.0), max(hi, 1.0), buckets + 1)
+
+        cumulative = np.searchsorted(self._scored, edges, side="left")
+        cumulative[-1] = len(self._scored)  # last bucket is closed on the right
+        counts = np.diff(cumulative)
+
+        return [
+            {
+                "min_probability": round(float(edges[i]), 4),
+                "max_probability": round(float(edges[i + 1]), 4),
+                "count": int(counts[i]),
+            }
+            for i in range(buckets)
+        ]
@@ -0,0 +1,168 @@
+"""
+Cohort retention matrix
+
+Customers are grouped by the month of their first purchase (cohort) and
+counted again in every later month they buy something. Months are plain
+integers (months since 1970-01), so a transaction's cell is
+``(cohort - origin, month - origin)`` and the whole matrix is two
+``np.bincount`` passes: revenue over all rows, active customers over the
+distinct (customer, month) pairs.
+
+Cells are indexed by calendar month of activity rather than by age, so
+contributions of the most recent months can be dropped and re-added when
+new data arrives without touching older months.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min
+
+
+def to_months(dates) -> np.ndarray:
+    """
+    Months since 1970-01 for datetime64 values (NaT -> NAT)
+    """
+    values = np.asarray(dates, dtype="datetime64[ns]")
+    months = values.astype("datetime64[M]").astype(np.int64)
+    months[np.isnat(values)] = NAT
+    return months
+
+
+def month_label(month: int) -> str:
+    return str(np.datetime64(int(month), "M"))
+
+
+class CohortMatrix:
+    def __init__(self):
+        self.origin: Optional[int] = None    # earliest cohort month
+        self.through: Optional[int] = None   # latest activity month included
+        # [cohort - origin, activity month - origin]
+        self.customers = np.zeros((0, 0), dtype=np.int64)
+        self.revenue = np.zeros((0, 0), dtype=np.float64)
+        self.first_month = pd.Series(dtype=np.int64)  # customer_id -> cohort month
+
+    def copy(self) -> "CohortMatrix":
+        other = CohortMatrix()
+        other.origin, other.through = self.origin, self.through
+        other.customers = self.customers.copy()
+        other.revenue = self.revenue.copy()
+        other.first_month = self.first_month.copy()
+        return other
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def _grow(self, low: int, high: int):
+        """
+        Extend the matrix to cover months [low, high]
+        """
+        if self.origin is None:
+            self.origin = low
+        start = min(self.origin, low)
+        size = max(self.origin + len(self.customers) - 1, high) - start + 1
+        if start == self.origin and size == len(self.customers):
+            return
+
+        offset = self.origin - start
+        customers = np.zeros((size, size), dtype=np.int64)
+        revenue = np.zeros((size, size), dtype=np.float64)
+        n = len(self.customers)
+        customers[offset:offset + n, offset:offset + n] = self.customers
+        revenue[offset:offset + n, offset:offset + n] = self.revenue
+        self.origin, self.customers, self.revenue = start, customers, revenue
+
+    def add(self, codes: np.ndarray, customer_ids: Sequence, months: np.ndarray, amounts: np.ndarray):
+        """
+        Add transactions given as customer codes into ``customer_ids``, their
+        months (``to_months``) and amounts. Rows must be newer than the cohort
+        of every customer already in the matrix (see ``drop_from``).
+        """
+        valid = months != NAT
+        codes, months, amounts = codes[valid], months[valid], amounts[valid]
+        if len(codes) == 0:
+            return
+        customer_ids = pd.Index(np.asarray(customer_ids))
+
+        # Cohort of every customer in the batch: known, or first month seen here
+        first_seen = pd.Series(months).groupby(codes).min()
+        first = np.full(len(customer_ids), NAT, dtype=np.int64)
+        first[first_seen.index.to_numpy()] = first_seen.to_numpy()
+        known = self.first_month.reindex(customer_ids).to_numpy()
+        new = np.isnan(known) & (first != NAT)
+        cohort = np.where(np.isnan(known), first, np.nan_to_num(known)).astype(np.int64)
+        if new.any():
+            added = pd.Series(first[new], index=customer_ids[new])
+            self.first_month = added if self.first_month.empty else pd.concat([self.first_month, added])
+
+        row_cohort = cohort[codes]
+        self._grow(int(row_cohort.min()), int(months.max()))
+        size = len(self.customers)
+        cells = (row_cohort - self.origin) * size + (months - self.origin)
+        self.revenue += np.bincount(cells, weights=amounts, minlength=size * size).reshape(size, size)
+
+        # Distinct (customer, month) pairs: hash-deduplicate, then count
+        span = int(months.max()) - self.origin + 1
+        pairs = pd.unique(codes.astype(np.int64) * span + (months - self.origin))
+        pair_codes, pair_months = np.divmod(pairs, span)
+        active = (cohort[pair_codes] - self.origin) * size + pair_months
+        self.customers += np.bincount(active, minlength=size * size).reshape(size, size)
+
+        latest = int(months.max())
+        self.through = latest if self.through is None else max(self.through, latest)
+
+    def drop_from(self, month: int):
+        """
+        Remove activity in ``month`` and later, and the customers whose first
+        purchase is in that range (they are re-added with the new rows)
+        """
+        if self.origin is None or month <= self.origin:
+            self.__init__()
+            return
+        start = month - self.origin
+        self.customers[:, start:] = 0
+        self.revenue[:, start:] = 0
+        self.first_month = self.first_month[self.first_month < month]
+        self.through = min(self.through, month - 1)
+
+    # -----------------------------
+    # Output
+    # -----------------------------
+    def table(self, cohorts: Optional[int] = None, max_months: Optional[int] = None) -> Dict:
+        """
+        Triangular matrix for the ``cohorts`` most recent cohorts: per cohort,
+        active customers, retention (% of the cohort) and revenue for months
+        since first purchase 0, 1, 2, ...
+        """
+        if self.origin is None:
+            return {"cohorts": [], "sizes": [], "months_since": [], "customers": [], "retention": [], "revenue": []}
+
+        sizes = np.diagonal(self.customers)
+        rows = np.flatnonzero(sizes)
+        if cohorts is not None:
+            rows = rows[-cohorts:]
+
+        labels: List[str] = []
+        active: List[List[int]] = []
+        retention: List[List[float]] = []
+        revenue: List[List[float]] = []
+        for row in rows:
+            last = self.through - self.origin
+            if max_months is not None:
+                last = min(last, row + max_months)
+            counts = self.customers[row, row:last + 1]
+            labels.append(month_label(self.origin + row))
+            active.append(counts.tolist())
+            retention.append(np.round(counts / sizes[row] * 100, 1).tolist())
+            revenue.append(np.round(self.revenue[row, row:last + 1], 2).tolist())
+
+        longest = max((len(r) for r in active), default=0)
+        return {
+            "cohorts": labels,
+            "sizes": sizes[rows].tolist(),
+            "months_since": list(range(longest)),
+            "customers": active,
+            "retention": retention,
+            "revenue": revenue,
+        }
@@ -0,0 +1,242 @@
+"""
+Memory-mapped NumPy column store for transactions
+
+Transactions are written once per transactions.csv version as flat .npy
+arrays, sorted by (customer, date), and opened read-only with
+``mmap_mode="r"``. Every worker process maps the same files, so they share
+one copy of the pages through the OS page cache, and per-customer history is
+a contiguous slice located through ``customer_offsets``.
+"""
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Fact columns (one value per transaction row)
+COLUMNS = {
+    "customer_code": np.int32,
+    "date": np.int64,          # datetime64[ns] as int64
+    "amount": np.float64,
+    "quantity": np.int32,
+    "product_code": np.int32,
+}
+
+# Dictionaries and indexes
+CUSTOMER_IDS = "customer_ids"           # sorted, customer_code -> customer_id
+PRODUCT_IDS = "product_ids"             # product_code -> product_id
+TRANSACTION_IDS = "transaction_ids"     # per row, for history listings
+CUSTOMER_OFFSETS = "customer_offsets"   # rows of customer c: [offsets[c], offsets[c + 1])
+
+META_FILE = "meta.json"
+
+
+def _as_bytes(values: pd.Series) -> np.ndarray:
+    """
+    Fixed-width bytes array (mmap-able, unlike object arrays)
+    """
+    return values.fillna("").astype(str).to_numpy().astype("S")
+
+
+def write_column_store(transactions: pd.DataFrame, directory: Path, version: str) -> Path:
+    """
+    Write the column files for ``transactions`` to ``directory/<version>``.
+    Files go to a private temp directory that is renamed into place, so a
+    concurrent writer in another process simply loses the rename race.
+    """
+    target = directory / version
+    if (target / META_FILE).exists():
+        return target
+
+    df = transactions[transactions["customer_id"].notna()]
+    customer_code, customer_ids = pd.factorize(df["customer_id"].astype(str), sort=True)
+    product_code, product_ids = pd.factorize(df["product_id"].astype(str), sort=False)
+    dates = pd.to_datetime(df["date"], errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    # Customer-major, date-minor order: history is a slice, RFM a segmented reduce
+    order = np.lexsort((dates, customer_code))
+    columns = {
+        "customer_code": customer_code[order],
+        "date": dates[order],
+        "amount": df["amount"].to_numpy(dtype=np.float64)[order],
+        "quantity": df["quantity"].to_numpy()[order] if "quantity" in df.columns else np.zeros(len(df)),
+        "product_code": product_code[order],
+    }
+    offsets = np.searchsorted(columns["customer_code"], np.arange(len(customer_ids) + 1), side="left")
+
+    tmp = directory / f".tmp-{version}-{os.getpid()}-{threading.get_ident()}"
+    tmp.mkdir(parents=True, exist_ok=True)
+    try:
+        for name, dtype in COLUMNS.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(columns[name], dtype=dtype))
+        np.save(tmp / f"{CUSTOMER_IDS}.npy", _as_bytes(pd.Series(customer_ids)))
+        np.save(tmp / f"{PRODUCT_IDS}.npy", _as_bytes(pd.Series(product_ids)))
+        np.save(tmp / f"{TRANSACTION_IDS}.npy", _as_bytes(df["transaction_id"].iloc[order]) if "transaction_id" in df.columns else np.zeros(len(df), dtype="S1"))
+        np.save(tmp / f"{CUSTOMER_OFFSETS}.npy", offsets.astype(np.int64))
+        (tmp / META_FILE).write_text(json.dumps({
+            "version": version,
+            "rows": int(len(df)),
+            "customers": int(len(customer_ids)),
+            "products": int(len(product_ids)),
+        }, indent=2))
+
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            # Another process published this version first
+            if not (target / META_FILE).exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    logger.info(f"Wrote transaction column store v{version} ({len(df)} rows)")
+    return target
+
+
+class TransactionColumnStore:
+    """
+    Read-only memory-mapped view of one column store version
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / META_FILE).read_text())
+        self.version: str = meta["version"]
+        self.rows: int = meta["rows"]
+
+        def mapped(name: str) -> np.ndarray:
+            return np.load(path / f"{name}.npy", mmap_mode="r")
+
+        self.columns: Dict[str, np.ndarray] = {name: mapped(name) for name in COLUMNS}
+        self.customer_ids = mapped(CUSTOMER_IDS)
+        self.product_ids = mapped(PRODUCT_IDS)
+        self.transaction_ids = mapped(TRANSACTION_IDS)
+        self.customer_offsets = mapped(CUSTOMER_OFFSETS)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    @property
+    def dates(self) -> np.ndarray:
+        """
+        Zero-copy datetime64[ns] view of the date column
+        """
+        return self.columns["date"].view("datetime64[ns]")
+
+    def customer_code(self, customer_id: str) -> Optional[int]:
+        key = str(customer_id).encode()
+        position = int(np.searchsorted(self.customer_ids, key))
+        if position < len(self.customer_ids) and self.customer_ids[position] == key:
+            return position
+        return None
+
+    def customer_codes(self, customer_ids) -> np.ndarray:
+        """
+        Codes of many customers at once (-1 for customers without transactions)
+        """
+        keys = np.asarray(customer_ids).astype(str).astype("S")
+        n = len(self.customer_ids)
+        if n == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.searchsorted(self.customer_ids, keys)
+        clipped = np.minimum(positions, n - 1)
+        return np.where(self.customer_ids[clipped] == keys, clipped, -1).astype(np.int64)
+
+    # -----------------------------
+    # Computations
+    # -----------------------------
+    def rfm(self, snapshot_date=None) -> pd.DataFrame:
+        """
+        Recency / frequency / monetary per customer with one segmented
+        reduce per column (same output as FeatureEngineer.calculate_rfm_features)
+        """
+        dates = self.columns["date"]
+        starts = self.customer_offsets[:-1]
+        if self.rows == 0:
+            return pd.DataFrame(columns=["customer_id", "recency", "frequency", "monetary"])
+
+        if snapshot_date is None:
+            snapshot = int(dates.max()) + NS_PER_DAY
+        else:
+            snapshot = pd.Timestamp(snapshot_date).value
+
+        last_purchase = np.maximum.reduceat(dates, starts)
+        return pd.DataFrame({
+            "customer_id": self.customer_ids.astype(str),
+            "recency": (snapshot - last_purchase) // NS_PER_DAY,
+            "frequency": np.diff(self.customer_offsets),
+            "monetary": np.add.reduceat(self.columns["amount"], starts),
+        })
+
+    def revenue_by_month(self, start=None) -> pd.Series:
+        """
+        Revenue per calendar month for transactions on/after ``start``
+        """
+        dates = self.columns["date"]
+        amounts = self.columns["amount"]
+        if start is not None:
+            mask = dates >= pd.Timestamp(start).value
+            dates, amounts = dates[mask], amounts[mask]
+        if len(dates) == 0:
+            return pd.Series(dtype=float)
+
+        months = dates.view("datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+        first = int(months.min())
+        totals = np.bincount(months - first, weights=amounts)
+        index = pd.PeriodIndex(
+            (np.arange(len(totals)) + first).astype("datetime64[M]"), freq="M"
+        )
+        series = pd.Series(totals, index=index)
+        return series[np.bincount(months - first) > 0]
+
+    def revenue(self, start=None) -> float:
+        if start is None:
+            return float(self.columns["amount"].sum())
+        return float(self.columns["amount"][self.columns["date"] >= pd.Timestamp(start).value].sum())
+
+    def frame(self, rows: Optional[np.ndarray] = None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Transactions in transactions.csv's columns (only ``columns`` when
+        given), for every row or the ``rows`` positions, in store
+        (customer, date) order
+        """
+        select = slice(None) if rows is None else rows
+        builders = {
+            "transaction_id": lambda: self.transaction_ids[select].astype(str),
+            "customer_id": lambda: self.customer_ids[self.columns["customer_code"][select]].astype(str),
+            "product_id": lambda: self.product_ids[self.columns["product_code"][select]].astype(str),
+            "quantity": lambda: self.columns["quantity"][select],
+            "amount": lambda: self.columns["amount"][select],
+            "date": lambda: self.dates[select],
+        }
+        return pd.DataFrame({
+            name: build() for name, build in builders.items() if columns is None or name in columns
+        })
+
+    def history(self, customer_id: str) -> Optional[pd.DataFrame]:
+        """
+        A customer's transactions, most recent first (None if unknown)
+        """
+        code = self.customer_code(customer_id)
+        if code is None:
+            return None
+
+        lo, hi = int(self.customer_offsets[code]), int(self.customer_offsets[code + 1])
+        rows = slice(hi - 1, lo - 1 if lo else None, -1)
+        return pd.DataFrame({
+            "transaction_id": self.transaction_ids[rows].astype(str),
+            "customer_id": str(customer_id),
+            "product_id": self.product_ids[self.columns["product_code"][rows]].astype(str),
+            "quantity": self.columns["quantity"][rows],
+            "amount": self.columns["amount"][rows],
+            "date": self.dates[rows],
+        })
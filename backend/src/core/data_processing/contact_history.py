@@ -0,0 +1,247 @@
+"""
+Persistent "contacted within N days" set for campaign frequency capping
+
+Customers get a stable integer code from an append-only dictionary
+(``customers.txt``, code = line number). Contacts are kept as one packed
+bitmap per day over those codes (``days/YYYY-MM-DD.bin``), so thousands of
+campaigns collapse into at most ``retention_days`` bitmaps of
+``customers / 8`` bytes each. A window lookup ORs the day bitmaps once
+(cached) and then tests one bit per customer.
+"""
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import threading
+
+import numpy as np
+
+from src.core.data_processing.bitmap_index import Bitmap
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: single-process writes only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CODES_FILE = "customers.txt"
+DAYS_DIR = "days"
+LOCK_FILE = ".lock"
+
+
+def _set_bits(bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """
+    Copy of packed ``bits`` (np.packbits order) with ``codes`` set, grown as needed
+    """
+    size = int(codes.max()) // 8 + 1 if len(codes) else 0
+    if size > len(bits):
+        bits = np.concatenate([bits, np.zeros(size - len(bits), dtype=np.uint8)])
+    else:
+        bits = bits.copy()
+    np.bitwise_or.at(bits, codes >> 3, (0x80 >> (codes & 7)).astype(np.uint8))
+    return bits
+
+
+def _test_bits(bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """
+    Whether each code's bit is set (unknown / out-of-range codes -> False)
+    """
+    result = np.zeros(len(codes), dtype=bool)
+    valid = (codes >= 0) & (codes < len(bits) * 8)
+    known = codes[valid]
+    result[valid] = (bits[known >> 3] >> (7 - (known & 7))) & 1 == 1
+    return result
+
+
+def _or_all(bitmaps: List[np.ndarray]) -> np.ndarray:
+    size = max((len(b) for b in bitmaps), default=0)
+    result = np.zeros(size, dtype=np.uint8)
+    for bits in bitmaps:
+        result[:len(bits)] |= bits
+    return result
+
+
+class ContactHistory:
+    """
+    Thread-safe; several processes may share one directory (writes take an
+    advisory file lock and merge with what is on disk)
+    """
+
+    def __init__(self, directory: Path, retention_days: int = 180):
+        self.directory = directory
+        self.days_dir = directory / DAYS_DIR
+        self.retention_days = retention_days
+
+        self._codes: Dict[str, int] = {}
+        self._codes_read = 0  # bytes of CODES_FILE already loaded
+        self._days: Dict[date, Tuple[float, np.ndarray]] = {}  # day -> (mtime, bits)
+        self._pending: Dict[date, List[str]] = {}
+        self._windows: Dict[Tuple, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    # -----------------------------
+    # Customer codes
+    # -----------------------------
+    def _sync_codes(self):
+        """
+        Load dictionary lines appended since the last read (by any process)
+        """
+        path = self.directory / CODES_FILE
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            f.seek(self._codes_read)
+            chunk = f.read()
+        # Only consume complete lines
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].decode().splitlines():
+            self._codes.setdefault(line, len(self._codes))
+        self._codes_read += end
+
+    def _assign_codes(self, customer_ids: List[str]) -> np.ndarray:
+        """
+        Codes for ``customer_ids``, appending new ones (caller holds the file lock)
+        """
+        self._sync_codes()
+        new = list(dict.fromkeys(cid for cid in customer_ids if cid not in self._codes))
+        if new:
+            with open(self.directory / CODES_FILE, "a") as f:
+                f.write("".join(f"{cid}\n" for cid in new))
+            self._sync_codes()
+        return np.array([self._codes[cid] for cid in customer_ids], dtype=np.int64)
+
+    # -----------------------------
+    # Day bitmaps
+    # -----------------------------
+    def _day_path(self, day: date) -> Path:
+        return self.days_dir / f"{day.isoformat()}.bin"
+
+    def _day_bits(self, day: date) -> Optional[np.ndarray]:
+        path = self._day_path(day)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            if self._days.pop(day, None) is not None:
+                self._windows.clear()
+            return None
+
+        cached = self._days.get(day)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, np.fromfile(path, dtype=np.uint8))
+            self._days[day] = cached
+            self._windows.clear()
+        return cached[1]
+
+    def _window(self, days: int, today: date) -> np.ndarray:
+        """
+        OR of the day bitmaps for the ``days`` days ending ``today``
+        """
+        span = [today - timedelta(days=offset) for offset in range(days)]
+        bitmaps = [bits for bits in (self._day_bits(day) for day in span) if bits is not None]
+
+        key = (days, today)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _or_all(bitmaps)
+        return window
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def contacted_within(
+        self,
+        customer_ids: Iterable[str],
+        days: int,
+        now: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """
+        Boolean mask: contacted today or on any of the previous ``days - 1`` days
+        """
+        customer_ids = [str(cid) for cid in customer_ids]
+        if days <= 0 or not customer_ids:
+            return np.zeros(len(customer_ids), dtype=bool)
+
+        today = (now or datetime.now()).date()
+        with self._lock:
+            self._sync_codes()
+            window = self._window(days, today)
+            codes = np.fromiter(
+                (self._codes.get(cid, -1) for cid in customer_ids), dtype=np.int64, count=len(customer_ids)
+            )
+            # Contacts recorded but not flushed yet (and possibly without a code)
+            pending = {cid for day, ids in self._pending.items() if (today - day).days < days for cid in ids}
+        mask = _test_bits(window, codes)
+        if pending:
+            mask |= np.fromiter((cid in pending for cid in customer_ids), dtype=bool, count=len(customer_ids))
+        return mask
+
+    def record(self, customer_ids: Iterable[str], when: Optional[datetime] = None):
+        """
+        Mark customers as contacted (kept in memory until ``flush``)
+        """
+        day = (when or datetime.now()).date()
+        with self._lock:
+            self._pending.setdefault(day, []).extend(str(cid) for cid in customer_ids)
+
+    def flush(self):
+        """
+        Merge pending contacts into the day files and drop expired days
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            self.days_dir.mkdir(parents=True, exist_ok=True)
+
+            with open(self.directory / LOCK_FILE, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    for day, customer_ids in pending.items():
+                        codes = self._assign_codes(customer_ids)
+                        path = self._day_path(day)
+                        current = np.fromfile(path, dtype=np.uint8) if path.exists() else np.zeros(0, dtype=np.uint8)
+                        merged = _set_bits(current, codes)
+
+                        tmp = path.with_suffix(f".tmp-{os.getpid()}")
+                        merged.tofile(tmp)
+                        os.replace(tmp, path)
+                    self._expire()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+            self._windows.clear()
+            logger.info(
+                f"Recorded {sum(len(ids) for ids in pending.values())} contacts "
+                f"({len(self._codes)} customers tracked)"
+            )
+
+    def _expire(self):
+        cutoff = date.today() - timedelta(days=self.retention_days)
+        for path in self.days_dir.glob("*.bin"):
+            try:
+                day = date.fromisoformat(path.stem)
+            except ValueError:
+                continue
+            if day < cutoff:
+                path.unlink(missing_ok=True)
+                self._days.pop(day, None)
+
+    def stats(self, days: int) -> Dict:
+        today = date.today()
+        with self._lock:
+            self._sync_codes()
+            window = self._window(days, today) if days > 0 else np.zeros(0, dtype=np.uint8)
+            stored = sorted(p.stem for p in self.days_dir.glob("*.bin")) if self.days_dir.exists() else []
+            return {
+                "customers_tracked": len(self._codes),
+                "window_days": days,
+                "contacted_in_window": Bitmap(window, len(window) * 8).count(),
+                "days_stored": len(stored),
+                "oldest_day": stored[0] if stored else None,
+                "bytes_per_day": (len(self._codes) + 7) // 8,
+            }
+
@@ -4,18 +4,101 @@ Data loading from CSV files
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
+from functools import wraps
+import hashlib
+import json
 import logging
+import os
+import shutil
+import threading
+import time
 from datetime import datetime, timedelta
 
+from src.core.data_processing.column_store import TransactionColumnStore, write_column_store
+from src.core.data_processing.schemas import (
+    CHURN_PREDICTIONS, CUSTOMERS, PRODUCTS, TRANSACTIONS, project, read_csv,
+)
 from src.utils.config import settings
+from src.utils.concurrency import ThreadSingleFlight
+from src.utils.metrics import DATA_LOAD_DURATION, DATA_LOAD_ROWS
 
 logger = logging.getLogger(__name__)
 
+# Concurrent loads of the same file share one parse
+_loads = ThreadSingleFlight("data_loader")
+
+# One partition rewrite per transactions.csv version
+_partitioning = ThreadSingleFlight("transaction_partitions")
+
+# Memory-mapped column stores opened by this process, per data directory
+_column_stores: Dict[str, TransactionColumnStore] = {}
+_column_store_lock = threading.Lock()
+_column_store_builds = ThreadSingleFlight("transaction_columns")
+
+
+def _instrumented(dataset: str):
+    """
+    Record load duration and returned row count for a dataset
+    """
+    duration = DATA_LOAD_DURATION.labels(dataset)
+    rows = DATA_LOAD_ROWS.labels(dataset)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            df = func(*args, **kwargs)
+            duration.observe(time.perf_counter() - start)
+            rows.set(len(df) if df is not None else 0)
+            return df
+
+        return wrapper
+
+    return decorator
+
+
+def _coalesced(dataset: str):
+    """
+    Share one in-flight load of a dataset between concurrent callers.
+    Returned frames are shared, so callers must not mutate them in place.
+    """
+    def hashable(value):
+        return tuple(value) if isinstance(value, list) else value
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (
+                dataset,
+                str(self.data_dir),
+                tuple(hashable(a) for a in args),
+                tuple(sorted((k, hashable(v)) for k, v in kwargs.items())),
+            )
+            return _loads.do(key, func, self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _within(df: pd.DataFrame, start, end, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Rows of ``df`` dated within [start, end], projected to ``columns``
+    """
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    return project(df.loc[mask], columns).reset_index(drop=True)
+
 
 class DataLoader:
     """
-    Centralized data loading for FreshMart
+    Centralized data loading for FreshMart.
+    Loaders parse with the dataset's declared schema (see schemas.py) and
+    accept a ``columns`` projection: only those columns are read.
     """
 
     def __init__(self):
@@ -25,41 +108,29 @@ class DataLoader:
     # -----------------------------
     # Customers
     # -----------------------------
-    def load_customers(self) -> pd.DataFrame:
-        file_path = self.data_dir / "customers.csv"
+    @_coalesced("customers")
+    @_instrumented("customers")
+    def load_customers(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        file_path = self.data_dir / CUSTOMERS.filename
 
         if not file_path.exists():
             logger.warning("customers.csv not found. Using DEV sample data.")
-            return self._create_sample_customers()
+            return project(self._create_sample_customers(), columns)
 
         try:
-            df = pd.read_csv(file_path)
+            # Required columns are checked on the header, before parsing;
+            # a missing phone column gets the single demo number
+            df = read_csv(file_path, CUSTOMERS, columns)
 
             # Handle empty / invalid CSV
             if df.empty or len(df.columns) == 0:
                 raise ValueError("customers.csv is empty or invalid")
 
-            self._validate_customers(df)
             return df
 
         except Exception as e:
             logger.error(f"Failed to load customers.csv: {e}")
-            return self._create_sample_customers()
-
-    def _validate_customers(self, df: pd.DataFrame):
-        # Required columns (phone NOT mandatory in raw data)
-        required_cols = {"customer_id", "first_name", "last_name"}
-        missing = required_cols - set(df.columns)
-
-        if missing:
-            raise ValueError(f"customers.csv missing columns: {missing}")
-
-        # ✅ SINGLE DEMO PHONE NUMBER FOR ALL CUSTOMERS
-        if "phone" not in df.columns:
-            logger.warning(
-                "phone column missing. Using a single demo phone number for all customers."
-            )
-            df["phone"] = "+919704300547"  # DEMO NUMBER
+            return project(self._create_sample_customers(), columns)
 
     def _create_sample_customers(self) -> pd.DataFrame:
         logger.info("Creating DEV sample customers")
@@ -84,21 +155,23 @@ class DataLoader:
     # -----------------------------
     # Products
     # -----------------------------
-    def load_products(self) -> pd.DataFrame:
-        file_path = self.data_dir / "products.csv"
+    @_coalesced("products")
+    @_instrumented("products")
+    def load_products(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        file_path = self.data_dir / PRODUCTS.filename
 
         if not file_path.exists():
             logger.warning("products.csv not found. Using DEV sample products.")
-            return self._create_sample_products()
+            return project(self._create_sample_products(), columns)
 
         try:
-            df = pd.read_csv(file_path)
+            df = read_csv(file_path, PRODUCTS, columns)
             if df.empty:
                 raise ValueError("products.csv is empty")
             return df
         except Exception as e:
             logger.error(f"Failed to load products.csv: {e}")
-            return self._create_sample_products()
+            return project(self._create_sample_products(), columns)
 
     def _create_sample_products(self) -> pd.DataFrame:
         size = 20
@@ -114,24 +187,65 @@ class DataLoader:
     # -----------------------------
     # Transactions
     # -----------------------------
-    def load_transactions(self) -> pd.DataFrame:
-        file_path = self.data_dir / "transactions.csv"
+    @_coalesced("transactions")
+    @_instrumented("transactions")
+    def load_transactions(self, start=None, end=None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        All transactions, or only those dated within [start, end] (either
+        bound optional), read from the monthly partitions overlapping it
+        """
+        if start is not None or end is not None:
+            return self._load_transactions_window(start, end, columns)
+
+        file_path = self.data_dir / TRANSACTIONS.filename
 
         if not file_path.exists():
             logger.warning("transactions.csv not found. Using DEV sample transactions.")
-            return self._create_sample_transactions()
+            return project(self._create_sample_transactions(), columns)
 
         try:
-            df = pd.read_csv(file_path)
+            df = read_csv(file_path, TRANSACTIONS, columns)
             if df.empty:
                 raise ValueError("transactions.csv is empty")
-
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
             return df
 
         except Exception as e:
             logger.error(f"Failed to load transactions.csv: {e}")
-            return self._create_sample_transactions()
+            return project(self._create_sample_transactions(), columns)
+
+    def _load_transactions_window(self, start, end, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        partitions = self.transaction_partitions()
+        if partitions is not None:
+            return self.read_partitions(partitions, start, end, columns)
+
+        # The window filter needs the date column even when not requested
+        read_columns = None if columns is None else [*columns, "date"]
+        return _within(self.load_transactions(columns=read_columns), start, end, columns)
+
+    def read_partitions(
+        self, partitions: Sequence[Dict], start=None, end=None, columns: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Transactions dated within [start, end] (either bound optional) from
+        the monthly ``partitions`` of one manifest (``transaction_partitions``)
+        that overlap it. Raises FileNotFoundError once that version's
+        partition files were cleaned up.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        read_columns = None if columns is None else [*columns, "date"]
+
+        selected = [
+            p for p in partitions
+            if (start is None or pd.Timestamp(p["max_date"]) >= start)
+            and (end is None or pd.Timestamp(p["min_date"]) <= end)
+        ]
+        frames = [
+            read_csv(self.partitions_dir / p["file"], TRANSACTIONS, read_columns) for p in selected
+        ]
+        if not frames:
+            return project(pd.DataFrame(columns=self._partition_meta().get("columns", [])), columns)
+        return _within(pd.concat(frames, ignore_index=True), start, end, columns)
 
     def _create_sample_transactions(self) -> pd.DataFrame:
         size = 1000
@@ -147,29 +261,177 @@ class DataLoader:
             ),
             "quantity": np.random.randint(1, 5, size),
             "amount": np.round(np.random.uniform(10, 200, size), 2),
-            "date": [
-                start_date + timedelta(days=np.random.randint(0, 730))
-                for _ in range(size)
-            ]
+            "date": pd.Timestamp(start_date) + pd.to_timedelta(
+                np.random.randint(0, 730, size), unit="D"
+            ),
         })
 
+    # -----------------------------
+    # Transaction partitions
+    # -----------------------------
+    PARTITIONS_DIR = "transactions"
+    PARTITIONS_META = "_partitions.json"
+
+    @property
+    def partitions_dir(self) -> Path:
+        return self.data_dir / self.PARTITIONS_DIR
+
+    def _partition_meta(self) -> Dict:
+        try:
+            return json.loads((self.partitions_dir / self.PARTITIONS_META).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def transaction_partitions(self) -> Optional[List[Dict]]:
+        """
+        Monthly partition metadata (file, rows, min/max date, amount,
+        transactions), rewritten from transactions.csv whenever it changes.
+        Without transactions.csv, existing partitions are the source of truth.
+        """
+        meta = self._partition_meta()
+        if not (self.data_dir / "transactions.csv").exists():
+            return meta.get("partitions")
+
+        version = self.data_version(("transactions.csv",))
+        if meta.get("version") == version:
+            return meta["partitions"]
+
+        return _partitioning.do(
+            (str(self.data_dir), version), self._write_partitions, version, meta.get("version")
+        )
+
+    def _write_partitions(self, version: str, previous: Optional[str] = None) -> Optional[List[Dict]]:
+        df = self.load_transactions()
+        if df.empty or "date" not in df.columns:
+            return None
+
+        target = self.partitions_dir / version
+        target.mkdir(parents=True, exist_ok=True)
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+
+        dated = df[df["date"].notna()]
+        partitions = []
+        for month, part in dated.groupby(dated["date"].dt.to_period("M"), sort=True):
+            path = target / f"{month}.csv"
+            tmp = path.with_name(path.name + suffix)
+            part.to_csv(tmp, index=False)
+            os.replace(tmp, path)
+
+            partitions.append({
+                "month": str(month),
+                "file": f"{version}/{path.name}",
+                "rows": len(part),
+                "min_date": part["date"].min().isoformat(),
+                "max_date": part["date"].max().isoformat(),
+                "amount": round(float(part["amount"].sum()), 2) if "amount" in part.columns else None,
+                "transactions": int(part["transaction_id"].nunique()) if "transaction_id" in part.columns else None,
+            })
+
+        meta_path = self.partitions_dir / self.PARTITIONS_META
+        tmp = meta_path.with_name(meta_path.name + suffix)
+        tmp.write_text(json.dumps({
+            "version": version,
+            "columns": list(df.columns),
+            "partitions": partitions,
+        }, indent=2))
+        os.replace(tmp, meta_path)
+
+        # Keep the previous version for readers still holding its metadata
+        for entry in self.partitions_dir.iterdir():
+            if entry.is_dir() and entry.name not in (version, previous):
+                shutil.rmtree(entry, ignore_errors=True)
+
+        logger.info(f"Wrote {len(partitions)} monthly transaction partitions (v{version})")
+        return partitions
+
+    # -----------------------------
+    # Transaction column store
+    # -----------------------------
+    COLUMNS_DIR = "columns"
+
+    def transaction_columns(self) -> Optional[TransactionColumnStore]:
+        """
+        Read-only memory-mapped columns of transactions.csv (None without it).
+        Built once per version on disk and shared by every worker process.
+        """
+        if not (self.data_dir / "transactions.csv").exists():
+            return None
+
+        version = self.data_version(("transactions.csv",))
+        key = str(self.data_dir)
+        with _column_store_lock:
+            store = _column_stores.get(key)
+        if store is not None and store.version == version:
+            return store
+
+        return _column_store_builds.do((key, version), self._open_column_store, version)
+
+    def _open_column_store(self, version: str) -> TransactionColumnStore:
+        directory = self.data_dir / self.COLUMNS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / version
+        if not path.exists():
+            write_column_store(self.load_transactions(), directory, version)
+
+        store = TransactionColumnStore(path)
+        with _column_store_lock:
+            previous = _column_stores.get(str(self.data_dir))
+            _column_stores[str(self.data_dir)] = store
+
+        # Mapped pages of removed files stay valid for processes still using them
+        keep = {version, previous.version if previous is not None else None}
+        for entry in directory.iterdir():
+            if entry.is_dir() and entry.name not in keep and not entry.name.startswith(".tmp-"):
+                shutil.rmtree(entry, ignore_errors=True)
+
+        return store
+
     # -----------------------------
     # Churn Predictions
     # -----------------------------
-    def load_churn_predictions(self) -> Optional[pd.DataFrame]:
-        file_path = self.data_dir / "churn_predictions.csv"
+    @_coalesced("churn_predictions")
+    @_instrumented("churn_predictions")
+    def load_churn_predictions(self, columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        file_path = self.data_dir / CHURN_PREDICTIONS.filename
 
         if not file_path.exists():
             logger.warning("churn_predictions.csv not found")
             return None
 
         try:
-            df = pd.read_csv(file_path)
+            df = read_csv(file_path, CHURN_PREDICTIONS, columns)
             return df if not df.empty else None
         except Exception as e:
             logger.error(f"Failed to load churn_predictions.csv: {e}")
             return None
 
+    # -----------------------------
+    # Versioning
+    # -----------------------------
+    SOURCE_FILES = ("customers.csv", "products.csv", "transactions.csv")
+
+    def file_stamp(self, name: str) -> str:
+        """
+        Size + mtime of one source file ("missing" when absent)
+        """
+        try:
+            stat = (self.data_dir / name).stat()
+            return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            return f"{name}:missing"
+
+    @staticmethod
+    def fingerprint(stamps) -> str:
+        return hashlib.sha1("|".join(stamps).encode()).hexdigest()[:12]
+
+    def data_version(self, files=SOURCE_FILES) -> str:
+        """
+        Fingerprint of the source files (size + mtime).
+        Changes whenever any of them is rewritten.
+        """
+        return self.fingerprint(self.file_stamp(name) for name in files)
+
     # -----------------------------
     # Load All
     # -----------------------------
@@ -6,10 +6,15 @@ import numpy as np
 from typing import Dict, Tuple
 import logging
 
+from src.core.data_processing.churn_index import DEFAULT_RISK_THRESHOLDS
+from src.core.data_processing.column_store import TransactionColumnStore
+from src.utils.metrics import FEATURE_ENGINEERING_DURATION, timed
+
 logger = logging.getLogger(__name__)
 
 class FeatureEngineer:
     @staticmethod
+    @timed(FEATURE_ENGINEERING_DURATION, "rfm")
     def calculate_rfm_features(transactions_df: pd.DataFrame, snapshot_date=None) -> pd.DataFrame:
         """
         Calculate RFM (Recency, Frequency, Monetary) features
@@ -22,9 +27,9 @@ class FeatureEngineer:
             DataFrame with RFM features for each customer
         """
         try:
-            # Ensure date column is datetime
+            # Ensure date column is datetime (on a copy: callers share the frame)
             if not pd.api.types.is_datetime64_any_dtype(transactions_df['date']):
-                transactions_df['date'] = pd.to_datetime(transactions_df['date'])
+                transactions_df = transactions_df.assign(date=pd.to_datetime(transactions_df['date']))
             
             # Set snapshot date to max transaction date + 1 day
             if snapshot_date is None:
@@ -47,6 +52,25 @@ class FeatureEngineer:
             raise
     
     @staticmethod
+    @timed(FEATURE_ENGINEERING_DURATION, "rfm")
+    def calculate_rfm_from_columns(store: TransactionColumnStore, snapshot_date=None) -> pd.DataFrame:
+        """
+        Calculate RFM features from the memory-mapped transaction column store
+        (segmented reductions over customer-sorted arrays, no DataFrame parse)
+        
+        Args:
+            store: Transaction column store
+            snapshot_date: Reference date for recency calculation
+            
+        Returns:
+            DataFrame with RFM features for each customer
+        """
+        rfm = store.rfm(snapshot_date)
+        logger.info(f"Calculated RFM features for {len(rfm)} customers (column store)")
+        return rfm
+    
+    @staticmethod
+    @timed(FEATURE_ENGINEERING_DURATION, "churn_features")
     def create_churn_features(customers_df: pd.DataFrame, rfm_df: pd.DataFrame) -> pd.DataFrame:
         """
         Create features for churn prediction
@@ -83,7 +107,8 @@ class FeatureEngineer:
             raise
     
     @staticmethod
-    def predict_churn_risk(features_df: pd.DataFrame, churn_thresholds: Tuple[float, float] = (0.3, 0.7)) -> pd.DataFrame:
+    @timed(FEATURE_ENGINEERING_DURATION, "risk_scoring")
+    def predict_churn_risk(features_df: pd.DataFrame, churn_thresholds: Tuple[float, float] = DEFAULT_RISK_THRESHOLDS) -> pd.DataFrame:
         """
         Predict churn risk based on features
         
@@ -0,0 +1,381 @@
+"""
+Synthetic FreshMart dataset generator for load and benchmark testing
+
+Usage (from backend/):
+    python -m src.core.data_processing.synthetic_data \\
+        --customers 1000000 --transactions 100000000 --output ../data --seed 7 \\
+        --end-date 2025-01-01
+
+Customers, products and transactions are generated with vectorized NumPy
+operations. Transactions are produced in fixed-size chunks and streamed to
+disk, so memory stays flat regardless of the requested scale.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = np.array([
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Priya", "Arjun", "Wei", "Mei", "Carlos", "Sofia", "Ahmed", "Fatima",
+])
+LAST_NAMES = np.array([
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor",
+    "Moore", "Jackson", "Martin", "Lee", "Patel", "Reddy", "Chen", "Khan",
+])
+CITIES = np.array([
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia",
+    "San Antonio", "San Diego", "Dallas", "Austin", "Seattle", "Denver",
+])
+# Larger cities get proportionally more customers
+CITY_WEIGHTS = np.array([18, 14, 10, 9, 7, 6, 6, 6, 6, 5, 7, 6], dtype=float)
+LOYALTY_TIERS = np.array(["Bronze", "Silver", "Gold", "Platinum"])
+CATEGORIES = np.array([
+    "Grocery", "Dairy", "Produce", "Bakery", "Meat", "Seafood",
+    "Beverages", "Snacks", "Frozen", "Household",
+])
+
+
+@dataclass
+class GeneratorConfig:
+    n_customers: int = 10_000
+    n_products: int = 500
+    n_transactions: int = 1_000_000
+    history_days: int = 730
+    churn_rate: float = 0.35
+    missing_phone_rate: float = 0.05
+    chunk_size: int = 1_000_000
+    seed: Optional[int] = 42
+    # Last day of history; fixed so a seed yields the same dataset on any day
+    end_date: str = "2025-01-01"
+
+
+class SyntheticDataGenerator:
+    """
+    Seedable generator of realistic customers, products and transactions.
+
+    * Purchase frequency per customer is log-normal, so a small share of
+      heavy shoppers produces most transactions.
+    * Each customer has a signup date; churned customers stop purchasing at
+      a random point in their lifetime, which yields realistic recency.
+    * Product popularity follows a Zipf-like distribution.
+    """
+
+    def __init__(self, config: GeneratorConfig):
+        self.config = config
+        self.rng = np.random.default_rng(config.seed)
+        self.end_date = pd.Timestamp(config.end_date).normalize()
+        self.start_date = self.end_date - pd.Timedelta(days=config.history_days)
+
+        self._customers: Optional[pd.DataFrame] = None
+        self._products: Optional[pd.DataFrame] = None
+
+    # -----------------------------
+    # Customers
+    # -----------------------------
+    def generate_customers(self) -> pd.DataFrame:
+        if self._customers is not None:
+            return self._customers
+
+        cfg = self.config
+        n = cfg.n_customers
+        rng = self.rng
+        days = cfg.history_days
+
+        # Skewed activity: log-normal purchase rate (baskets per day)
+        rate = rng.lognormal(mean=np.log(0.05), sigma=1.0, size=n)
+
+        # Lifetime window [start_day, end_day) in days since start_date
+        start_day = (rng.beta(1.2, 2.5, size=n) * days * 0.9).astype(np.int64)
+        churned = rng.random(n) < cfg.churn_rate
+        lifetime_left = days - start_day
+        end_day = np.where(
+            churned,
+            start_day + np.maximum(1, (rng.random(n) * lifetime_left).astype(np.int64)),
+            days,
+        )
+
+        # Loyalty follows activity rank
+        rank = rate.argsort().argsort() / max(n - 1, 1)
+        tier_idx = np.searchsorted([0.5, 0.8, 0.95], rank, side="right")
+
+        first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n)]
+        last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), n)]
+        ids = np.arange(n)
+        customer_ids = pd.Series(ids + 100000).astype(str).radd("CUST")
+
+        email = (
+            pd.Series(first).str.lower() + "." + pd.Series(last).str.lower()
+            + pd.Series(ids).astype(str) + "@example.com"
+        )
+        phone = pd.Series(ids % 10_000_000).astype(str).str.zfill(7).radd("+1555")
+        phone[rng.random(n) < cfg.missing_phone_rate] = None
+
+        self._customers = pd.DataFrame({
+            "customer_id": customer_ids,
+            "first_name": first,
+            "last_name": last,
+            "email": email,
+            "phone": phone,
+            "age": np.clip(rng.normal(42, 13, n), 18, 85).astype(np.int64),
+            "city": CITIES[self._weighted_choice(CITY_WEIGHTS, n)],
+            "loyalty_tier": LOYALTY_TIERS[tier_idx],
+            "signup_date": (self.start_date + pd.to_timedelta(start_day, unit="D")).strftime("%Y-%m-%d"),
+            "avg_monthly_spend": np.round(rate * 30 * 35.0, 2),
+        })
+
+        # Kept for transaction sampling, not written out
+        self._rate = rate
+        self._start_day = start_day
+        self._end_day = end_day
+        return self._customers
+
+    # -----------------------------
+    # Products
+    # -----------------------------
+    def generate_products(self) -> pd.DataFrame:
+        if self._products is not None:
+            return self._products
+
+        n = self.config.n_products
+        rng = self.rng
+
+        self._products = pd.DataFrame({
+            "product_id": pd.Series(np.arange(n) + 1000).astype(str).radd("PROD"),
+            "product_name": pd.Series(np.arange(n) + 1).astype(str).radd("Product "),
+            "category": CATEGORIES[rng.integers(0, len(CATEGORIES), n)],
+            "price": np.round(rng.lognormal(np.log(6.0), 0.6, n), 2).clip(0.5, 99.0),
+        })
+        self._popularity = 1.0 / np.power(np.arange(1, n + 1), 1.1)
+        rng.shuffle(self._popularity)
+        return self._products
+
+    # -----------------------------
+    # Transactions
+    # -----------------------------
+    def iter_transaction_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Yield transaction line items in chunks of ``chunk_size`` rows
+        """
+        self.generate_customers()
+        products = self.generate_products()
+
+        cfg = self.config
+        rng = self.rng
+
+        customer_ids = self._customers["customer_id"].to_numpy()
+        product_ids = products["product_id"].to_numpy()
+        prices = products["price"].to_numpy()
+
+        # Expected baskets per customer ∝ rate × active days
+        active_days = (self._end_day - self._start_day).astype(float)
+        customer_cdf = np.cumsum(self._rate * active_days)
+        customer_cdf /= customer_cdf[-1]
+        product_cdf = np.cumsum(self._popularity)
+        product_cdf /= product_cdf[-1]
+
+        start_ns = self.start_date.value
+        day_ns = 86_400 * 1_000_000_000
+
+        produced = 0
+        next_transaction = 0
+        while produced < cfg.n_transactions:
+            rows = min(cfg.chunk_size, cfg.n_transactions - produced)
+
+            # Baskets of 1..n line items (geometric, mean ≈ 3)
+            basket_sizes = rng.geometric(1 / 3.0, size=rows)
+            basket_sizes = basket_sizes[np.cumsum(basket_sizes) <= rows]
+            shortfall = rows - int(basket_sizes.sum())
+            if shortfall:
+                basket_sizes = np.append(basket_sizes, shortfall)
+            n_baskets = len(basket_sizes)
+
+            basket_customer = np.searchsorted(customer_cdf, rng.random(n_baskets), side="right")
+            basket_customer = np.minimum(basket_customer, len(customer_cdf) - 1)
+            span = self._end_day[basket_customer] - self._start_day[basket_customer]
+            basket_day = self._start_day[basket_customer] + (rng.random(n_baskets) * span).astype(np.int64)
+            basket_time = start_ns + basket_day * day_ns + rng.integers(
+                8 * 3600, 21 * 3600, n_baskets
+            ) * 1_000_000_000
+
+            line_customer = np.repeat(basket_customer, basket_sizes)
+            line_basket = np.repeat(np.arange(n_baskets) + next_transaction, basket_sizes)
+            line_time = np.repeat(basket_time, basket_sizes)
+
+            product_idx = np.searchsorted(product_cdf, rng.random(rows), side="right")
+            product_idx = np.minimum(product_idx, len(product_cdf) - 1)
+            quantity = rng.geometric(0.55, rows).clip(max=10)
+
+            yield pd.DataFrame({
+                "transaction_id": pd.Series(line_basket + 1_000_000).astype(str).radd("TRANS"),
+                "customer_id": customer_ids[line_customer],
+                "product_id": product_ids[product_idx],
+                "quantity": quantity,
+                "amount": np.round(prices[product_idx] * quantity, 2),
+                "date": pd.to_datetime(line_time),
+            })
+
+            produced += rows
+            next_transaction += n_baskets
+
+    def generate_transactions(self) -> pd.DataFrame:
+        """
+        Materialize all transactions (small scales only)
+        """
+        return pd.concat(list(self.iter_transaction_chunks()), ignore_index=True)
+
+    def _weighted_choice(self, weights: np.ndarray, size: int) -> np.ndarray:
+        cdf = np.cumsum(weights) / weights.sum()
+        return np.minimum(np.searchsorted(cdf, self.rng.random(size), side="right"), len(cdf) - 1)
+
+    # -----------------------------
+    # Output
+    # -----------------------------
+    def write(self, output_dir: Path, file_format: str = "csv") -> dict:
+        """
+        Write customers, products and transactions to ``output_dir``
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        writer = _CsvWriter if file_format == "csv" else _ParquetWriter
+
+        start = time.perf_counter()
+        customers = self.generate_customers()
+        products = self.generate_products()
+        writer.write_frame(customers, output_dir / f"customers.{file_format}")
+        writer.write_frame(products, output_dir / f"products.{file_format}")
+
+        rows = 0
+        with writer(output_dir / f"transactions.{file_format}") as sink:
+            for chunk in self.iter_transaction_chunks():
+                sink.append(chunk)
+                rows += len(chunk)
+                logger.info(f"Wrote {rows:,}/{self.config.n_transactions:,} transactions")
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Synthetic dataset written to {output_dir} in {elapsed:.1f}s")
+        return {
+            "customers": len(customers),
+            "products": len(products),
+            "transactions": rows,
+            "output_dir": str(output_dir),
+            "seconds": round(elapsed, 2),
+        }
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+class _CsvWriter:
+    def __init__(self, path: Path):
+        self.path = path
+        self._header = True
+
+    @staticmethod
+    def write_frame(df: pd.DataFrame, path: Path):
+        df.to_csv(path, index=False)
+
+    def __enter__(self):
+        self.path.unlink(missing_ok=True)
+        return self
+
+    def append(self, df: pd.DataFrame):
+        df.to_csv(
+            self.path,
+            mode="a",
+            header=self._header,
+            index=False,
+            date_format="%Y-%m-%d %H:%M:%S",
+        )
+        self._header = False
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _ParquetWriter:
+    def __init__(self, path: Path):
+        self.path = path
+        self._writer = None
+
+    @staticmethod
+    def _pyarrow():
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+        return pa, pq
+
+    @classmethod
+    def write_frame(cls, df: pd.DataFrame, path: Path):
+        pa, pq = cls._pyarrow()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+
+    def __enter__(self):
+        self._pa, self._pq = self._pyarrow()
+        return self
+
+    def append(self, df: pd.DataFrame):
+        table = self._pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def __exit__(self, *exc):
+        if self._writer is not None:
+            self._writer.close()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic FreshMart dataset")
+    parser.add_argument("--customers", type=int, default=GeneratorConfig.n_customers)
+    parser.add_argument("--products", type=int, default=GeneratorConfig.n_products)
+    parser.add_argument("--transactions", type=int, default=GeneratorConfig.n_transactions)
+    parser.add_argument("--days", type=int, default=GeneratorConfig.history_days, help="History length in days")
+    parser.add_argument("--churn-rate", type=float, default=GeneratorConfig.churn_rate)
+    parser.add_argument("--chunk-size", type=int, default=GeneratorConfig.chunk_size)
+    parser.add_argument("--seed", type=int, default=GeneratorConfig.seed)
+    parser.add_argument(
+        "--end-date",
+        default=GeneratorConfig.end_date,
+        help=(
+            "Last day of history (YYYY-MM-DD). The default is fixed for reproducibility, "
+            "so the app's 'last N days' analytics windows, measured from today, may be "
+            "empty; pass today's date for a current-looking dataset"
+        ),
+    )
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output", type=Path, required=True, help="Output directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    generator = SyntheticDataGenerator(
+        GeneratorConfig(
+            n_customers=args.customers,
+            n_products=args.products,
+            n_transactions=args.transactions,
+            history_days=args.days,
+            churn_rate=args.churn_rate,
+            chunk_size=args.chunk_size,
+            seed=args.seed,
+            end_date=args.end_date,
+        )
+    )
+    summary = generator.write(args.output, args.format)
+    logger.info(f"Done: {summary}")
+
+
+if __name__ == "__main__":
+    main()
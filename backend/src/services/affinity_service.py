@@ -0,0 +1,239 @@
+"""
+Customer category affinity provider
+
+Keeps one CustomerAffinity per (transactions.csv, products.csv) version.
+The first build is one pass over the transaction column store (customer
+and product codes are already dictionary-encoded there). Later versions
+are folded in incrementally, like the cohort matrices: alongside the full
+matrix the provider keeps a "settled" one covering every month before the
+last partition month. When the partition statistics of those months are
+unchanged, the settled matrix plus the re-read rows of the last covered
+month and newer ones give the new matrix without rescanning history. A
+products.csv-only change just re-maps product columns to categories.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.core.data_processing.affinity import CustomerAffinity
+from src.core.data_processing.data_loader import DataLoader
+from src.core.data_processing.schemas import TRANSACTIONS, read_csv
+from src.services.data_snapshots import DataSnapshot, current_snapshot, data_snapshots
+from src.utils.concurrency import ThreadSingleFlight
+from src.utils.metrics import record_cache_lookup, registry
+
+logger = logging.getLogger(__name__)
+
+AFFINITY_COLUMNS = ["customer_id", "product_id", "date", "amount"]
+
+AFFINITY_UPDATES = registry.counter(
+    "freshmart_affinity_updates_total",
+    "Customer category affinity updates by kind (full/incremental/catalog)",
+    ("kind",),
+)
+
+
+@dataclass(frozen=True)
+class PublishedAffinity:
+    version: str               # transactions.csv + products.csv
+    transactions_version: str
+    affinity: CustomerAffinity
+    settled: Optional[CustomerAffinity]  # months before the last partition month
+    months: Optional[Dict[str, Tuple]]   # partition month -> (rows, amount, transactions)
+    undated: int                         # rows outside every partition
+    update: str  # "full" | "incremental" | "catalog"
+
+
+def _undated_rows(snapshot: DataSnapshot) -> int:
+    if not snapshot.partitions:
+        return 0
+    return snapshot.transaction_rows - sum(p["rows"] for p in snapshot.partitions)
+
+
+def _month_start(month: str) -> np.datetime64:
+    return np.datetime64(month, "M").astype("datetime64[ns]")
+
+
+class AffinityProvider:
+    def __init__(self, data_loader: Optional[DataLoader] = None):
+        self.data_loader = data_loader or DataLoader()
+
+        self._published: Optional[PublishedAffinity] = None
+        self._lock = threading.Lock()
+        self._single_flight = ThreadSingleFlight("affinity")
+
+    @staticmethod
+    def version(snapshot: DataSnapshot) -> str:
+        return snapshot.version_of(("transactions.csv", "products.csv"))
+
+    def get(self, snapshot: Optional[DataSnapshot] = None) -> PublishedAffinity:
+        """
+        Affinity for ``snapshot`` (default: the request's pinned snapshot); blocking
+        """
+        snapshot = snapshot or current_snapshot()
+        version = self.version(snapshot)
+        with self._lock:
+            published = self._published
+        if published is not None and published.version == version:
+            record_cache_lookup("affinity", True)
+            return published
+
+        record_cache_lookup("affinity", False)
+        return self._single_flight.do(version, self._update, snapshot, version)
+
+    def on_snapshot(self, snapshot: DataSnapshot):
+        """
+        Fold a newly published snapshot in (only once affinity was requested)
+        """
+        if self._published is not None:
+            self.get(snapshot)
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def _update(self, snapshot: DataSnapshot, version: str) -> PublishedAffinity:
+        previous = self._published
+        transactions_version = snapshot.version_of(("transactions.csv",))
+        months = snapshot.month_stats()
+        undated = _undated_rows(snapshot)
+
+        if previous is not None and previous.transactions_version == transactions_version:
+            affinity = previous.affinity.copy().set_catalog(snapshot.products)
+            settled = previous.settled.copy().set_catalog(snapshot.products) if previous.settled else None
+            kind = "catalog"
+        else:
+            start = self._incremental_start(previous, months, undated)
+            if start is None:
+                affinity, settled = self._full_build(snapshot, months)
+                kind = "full"
+            else:
+                affinity, settled = self._incremental(snapshot, previous.settled, start, months)
+                kind = "incremental"
+
+        published = PublishedAffinity(
+            version, transactions_version, affinity, settled, months, undated, kind
+        )
+        with self._lock:
+            # A slower build for an older version must not replace a newer one
+            if self._published is None or self._published is previous:
+                self._published = published
+        AFFINITY_UPDATES.labels(kind).inc()
+        stats = affinity.stats()
+        logger.info(
+            f"Customer affinity v{version} ({kind}, {stats['customers']} customers, "
+            f"{stats['category_nnz']} customer/category cells)"
+        )
+        return published
+
+    @staticmethod
+    def _incremental_start(
+        previous: Optional[PublishedAffinity], months: Optional[Dict[str, Tuple]], undated: int
+    ) -> Optional[str]:
+        """
+        First month to re-read, or None when a full rebuild is needed
+        """
+        if (
+            previous is None or previous.settled is None or not previous.months
+            or months is None or undated != previous.undated
+        ):
+            return None
+
+        last = max(previous.months)
+        before = {m: stats for m, stats in months.items() if m < last}
+        previous_before = {m: stats for m, stats in previous.months.items() if m < last}
+        return last if before == previous_before else None
+
+    @staticmethod
+    def _split_at(months: Optional[Dict[str, Tuple]]) -> Optional[np.datetime64]:
+        """
+        Start of the last partition month: rows before it are settled
+        """
+        return _month_start(max(months)) if months else None
+
+    def _full_build(
+        self, snapshot: DataSnapshot, months: Optional[Dict[str, Tuple]]
+    ) -> Tuple[CustomerAffinity, Optional[CustomerAffinity]]:
+        store = snapshot.columns
+        if store is not None:
+            customer_codes = np.asarray(store["customer_code"])
+            product_codes = np.asarray(store["product_code"])
+            amounts = np.asarray(store["amount"])
+            dates = store.dates
+            customer_ids = store.customer_ids.astype(str)
+            product_ids = store.product_ids.astype(str)
+        elif {"customer_id", "product_id", "amount"} <= set(snapshot.transactions.columns):
+            tx = snapshot.transactions
+            customer_codes, customer_ids = pd.factorize(tx["customer_id"])
+            product_codes, product_ids = pd.factorize(tx["product_id"].astype(str))
+            amounts = tx["amount"].to_numpy(dtype=np.float64)
+            dates = (
+                tx["date"].to_numpy(dtype="datetime64[ns]") if "date" in tx.columns
+                else np.full(len(tx), np.datetime64("NaT"), dtype="datetime64[ns]")
+            )
+        else:
+            return CustomerAffinity().set_catalog(snapshot.products), None
+
+        split = self._split_at(months)
+        if split is None:
+            affinity = CustomerAffinity().set_catalog(snapshot.products)
+            return affinity.add(customer_codes, customer_ids, product_codes, product_ids, amounts), None
+
+        # Undated rows are in no partition: they belong to the settled part
+        recent = dates >= split
+        settled = CustomerAffinity().set_catalog(snapshot.products).add(
+            customer_codes[~recent], customer_ids, product_codes[~recent], product_ids, amounts[~recent]
+        )
+        affinity = settled.copy().add(
+            customer_codes[recent], customer_ids, product_codes[recent], product_ids, amounts[recent]
+        )
+        return affinity, settled
+
+    def _incremental(
+        self,
+        snapshot: DataSnapshot,
+        settled: CustomerAffinity,
+        start: str,
+        months: Dict[str, Tuple],
+    ) -> Tuple[CustomerAffinity, CustomerAffinity]:
+        tx = self._rows_since(snapshot, start)
+        customer_codes, customer_ids = pd.factorize(tx["customer_id"])
+        product_codes, product_ids = pd.factorize(tx["product_id"].astype(str))
+        amounts = tx["amount"].to_numpy(dtype=np.float64)
+        recent = pd.to_datetime(tx["date"], errors="coerce").to_numpy() >= self._split_at(months)
+
+        # The settled part moves forward to the new last month
+        settled = settled.copy().set_catalog(snapshot.products).add(
+            customer_codes[~recent], customer_ids, product_codes[~recent], product_ids, amounts[~recent]
+        )
+        affinity = settled.copy().add(
+            customer_codes[recent], customer_ids, product_codes[recent], product_ids, amounts[recent]
+        )
+        return affinity, settled
+
+    def _rows_since(self, snapshot: DataSnapshot, start: str) -> pd.DataFrame:
+        """
+        Transactions of the partitions from month ``start`` on
+        """
+        selected = [p for p in snapshot.partitions if p["month"] >= start]
+        try:
+            frames = [
+                read_csv(self.data_loader.partitions_dir / p["file"], TRANSACTIONS, AFFINITY_COLUMNS)
+                for p in selected
+            ]
+            if frames:
+                return pd.concat(frames, ignore_index=True)
+            return pd.DataFrame(columns=AFFINITY_COLUMNS)
+        except FileNotFoundError:
+            # Partition files of this version were already cleaned up
+            return snapshot.transactions_between(
+                start=pd.Period(start, "M").start_time, columns=AFFINITY_COLUMNS
+            )
+
+
+# Global singleton instance
+customer_affinities = AffinityProvider()
+data_snapshots.subscribe(customer_affinities.on_snapshot)
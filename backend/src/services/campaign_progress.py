@@ -0,0 +1,265 @@
+"""
+Live campaign progress
+
+Send results are appended to one shared event log per campaign. Stream
+listeners only keep a cursor into that log and are woken at most once per
+flush interval, so fast campaigns produce batched events and additional
+listeners cost no extra copies or work on the sending threads.
+
+The log is bounded whatever the campaign size: entries every open
+listener has read are dropped, and at most CAMPAIGN_PROGRESS_BUFFER
+recent entries are kept for listeners that connect later. A listener
+that falls behind the buffer skips ahead; its next event reports the
+number of results it missed.
+"""
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+from src.utils.config import settings
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STREAM_LISTENERS = registry.gauge(
+    "freshmart_campaign_stream_listeners",
+    "Open campaign progress streams",
+)
+
+# Largest number of per-message results carried by one stream event
+MAX_BATCH = 500
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class CampaignProgress:
+    """
+    Progress of one campaign. ``record`` / ``finish`` are called from
+    executor threads; listeners run on the event loop that created it.
+    """
+
+    def __init__(self, campaign_id: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.campaign_id = campaign_id
+        self.status = "preparing"
+        self.total: Optional[int] = None
+        self.successful = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.summary: Optional[Dict] = None
+
+        self._results: Deque[Dict] = deque()
+        self._first = 0     # result number of _results[0]
+        self._recorded = 0
+        self._cursors: Dict[int, int] = {}  # open listener -> cursor
+        self._buffer = settings.CAMPAIGN_PROGRESS_BUFFER
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._changed = asyncio.Event()
+        self._wake_pending = False
+        self._flush_interval = settings.CAMPAIGN_PROGRESS_FLUSH_SECONDS
+
+    # -----------------------------
+    # Publishing (any thread)
+    # -----------------------------
+    def start_sending(self, total: int):
+        with self._lock:
+            self.status = "sending"
+            self.total = total
+            self.started_at = time.time()
+        self._notify()
+
+    def record(self, customer: Dict, result: Dict):
+        success = bool(result.get("success"))
+        with self._lock:
+            self._recorded += 1
+            self._results.append({
+                "index": self._recorded,
+                "customer_id": customer.get("customer_id"),
+                "customer": result.get("customer", customer.get("name")),
+                "success": success,
+                "message_sid": result.get("message_sid", ""),
+                "error": result.get("error", ""),
+            })
+            if success:
+                self.successful += 1
+            else:
+                self.failed += 1
+            if len(self._results) > self._buffer:
+                self._results.popleft()
+                self._first += 1
+        self._notify()
+
+    def finish(self, summary: Optional[Dict] = None, status: str = "completed"):
+        with self._lock:
+            self.status = status
+            self.summary = summary
+            self.finished_at = time.time()
+        self._notify(immediate=True)
+
+    def _notify(self, immediate: bool = False):
+        """
+        Wake listeners after the flush interval (once per interval however
+        many results arrive), or right away for state changes
+        """
+        if self._loop is None:
+            return
+        with self._lock:
+            if self._wake_pending and not immediate:
+                return
+            self._wake_pending = True
+
+        delay = 0 if immediate else self._flush_interval
+        try:
+            self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._wake)
+        except RuntimeError:
+            # Loop closed: nobody can be listening any more
+            pass
+
+    def _wake(self):
+        with self._lock:
+            self._wake_pending = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            processed = self.successful + self.failed
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                "campaign_id": self.campaign_id,
+                "status": self.status,
+                "total": self.total,
+                "processed": processed,
+                "successful": self.successful,
+                "failed": self.failed,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+                "summary": self.summary,
+            }
+
+    def results_since(self, cursor: int, limit: int = MAX_BATCH) -> Tuple[List[Dict], int, int]:
+        """
+        (up to ``limit`` results after ``cursor``, the cursor they start at,
+        total results so far). Results no longer buffered are skipped.
+        """
+        with self._lock:
+            start = max(cursor, self._first)
+            offset = start - self._first
+            return list(islice(self._results, offset, offset + limit)), start, self._recorded
+
+    def _advance(self, listener: int, cursor: Optional[int]):
+        """
+        Move (or, with None, remove) a listener's cursor and drop the
+        results every open listener has read
+        """
+        with self._lock:
+            if cursor is None:
+                self._cursors.pop(listener, None)
+            else:
+                self._cursors[listener] = cursor
+            if self._cursors:
+                read = min(self._cursors.values())
+                while self._results and self._first < read:
+                    self._results.popleft()
+                    self._first += 1
+
+    async def events(self, cursor: int = 0, keepalive: Optional[float] = None) -> AsyncIterator[Optional[Dict]]:
+        """
+        Progress events from result ``cursor`` on: each carries the new
+        results plus running counts; the last one has final=True. Yields None
+        as a keep-alive when idle.
+        """
+        keepalive = keepalive or settings.CAMPAIGN_PROGRESS_KEEPALIVE_SECONDS
+        last_status = None
+        listener = object()
+        self._advance(id(listener), cursor)
+
+        try:
+            while True:
+                changed = self._changed
+                # Snapshot first: once it reports a finished campaign, every
+                # result is already in the log
+                snapshot = self.snapshot()
+                results, start, recorded = self.results_since(cursor)
+                finished = snapshot["status"] in FINISHED_STATUSES
+
+                if results or start > cursor or snapshot["status"] != last_status:
+                    missed, cursor = start - cursor, start + len(results)
+                    last_status = snapshot["status"]
+                    final = finished and cursor >= recorded
+                    # A final event needs nothing kept for this listener
+                    self._advance(id(listener), None if final else cursor)
+                    yield {
+                        **snapshot, "cursor": cursor, "final": final, "missed": missed, "results": results,
+                    }
+                    if final:
+                        return
+                    continue
+
+                if finished:
+                    return
+
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._advance(id(listener), None)
+
+
+class CampaignProgressRegistry:
+    """
+    Active campaigns plus the most recent finished ones
+    """
+
+    def __init__(self, keep_finished: Optional[int] = None):
+        self.keep_finished = keep_finished or settings.CAMPAIGN_PROGRESS_HISTORY
+        self._campaigns: Dict[str, CampaignProgress] = {}
+        self._lock = threading.Lock()
+
+    def create(self) -> CampaignProgress:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        progress = CampaignProgress(uuid.uuid4().hex[:12], loop)
+        with self._lock:
+            self._campaigns[progress.campaign_id] = progress
+            self._prune()
+        return progress
+
+    def _prune(self):
+        finished = sorted(
+            (p for p in self._campaigns.values() if p.done), key=lambda p: p.finished_at
+        )
+        for progress in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._campaigns[progress.campaign_id]
+
+    def get(self, campaign_id: str) -> Optional[CampaignProgress]:
+        with self._lock:
+            return self._campaigns.get(campaign_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            campaigns = sorted(self._campaigns.values(), key=lambda p: p.created_at, reverse=True)
+        return [progress.snapshot() for progress in campaigns]
+
+
+# Global singleton instance
+campaign_progress = CampaignProgressRegistry()
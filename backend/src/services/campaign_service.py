@@ -2,22 +2,107 @@
 Campaign management service
 """
 import pandas as pd
+import csv
 import json
-from typing import Dict, List
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import replace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 import logging
 
 from src.utils.config import settings                          # ✅ FIXED
-from src.core.data_processing.data_loader import DataLoader    # ✅ FIXED
 from src.core.ai_messaging.ai_generator import AIMessageGenerator  # ✅ FIXED
 from src.core.communication.sms_service import sms_service     # ✅ FIXED
+from src.core.data_processing.affinity import CustomerAffinity
+from src.core.data_processing.bitmap_index import SegmentQuery
+from src.core.data_processing.column_store import TransactionColumnStore
+from src.core.data_processing.contact_history import ContactHistory
+from src.services.affinity_service import customer_affinities
+from src.services.campaign_progress import CampaignProgress
+from src.services.campaign_shards import prepare_partitioned
+from src.services.data_snapshots import DataSnapshot, data_snapshots
+from src.services.segment_service import segment_indexes
+from src.utils.resilience import Deadline, RetryBudget, WorkDeadline, breaker_states
 
 logger = logging.getLogger(__name__)
 
+# End-of-stream marker passed between pipeline stages
+_DONE = object()
+
+# Successful sends are recorded in the contact history in batches of this size
+CONTACT_FLUSH_BATCH = 1_000
+
+# Campaign outputs read back by the history endpoint
+RESULT_COLUMNS = [
+    "campaign_id", "customer_id", "customer_name", "phone", "churn_risk",
+    "message_sent", "offer_code", "sms_success", "message_sid", "error", "timestamp",
+]
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up once the pipeline is stopping
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class _CampaignWriter:
+    """
+    Writes campaign_data.json and campaign_results.csv row by row as the
+    pipeline produces them (thread-safe). With results=False only the
+    messages are written (preparation without sending).
+    """
+
+    def __init__(self, outputs_dir: Path, results: bool = True):
+        self._lock = threading.Lock()
+        self._data = open(outputs_dir / "campaign_data.json", "w")
+        self._data.write("[")
+        self._first = True
+        self._results_file = None
+        if results:
+            self._results_file = open(outputs_dir / "campaign_results.csv", "w", newline="")
+            self._results = csv.DictWriter(self._results_file, fieldnames=RESULT_COLUMNS)
+            self._results.writeheader()
+
+    def add_message(self, record: Dict):
+        with self._lock:
+            self._data.write(("\n" if self._first else ",\n") + json.dumps(record, indent=2))
+            self._first = False
+
+    def add_result(self, row: Dict):
+        with self._lock:
+            self._results.writerow(row)
+            self._results_file.flush()
+
+    def close(self):
+        with self._lock:
+            self._data.write("\n]\n")
+            self._data.close()
+            if self._results_file is not None:
+                self._results_file.close()
+
 
 class CampaignService:
     def __init__(self):
-        self.data_loader = DataLoader()
         self.ai_generator = AIMessageGenerator()
         self.sms_service = sms_service
 
@@ -25,72 +110,380 @@ class CampaignService:
         self.outputs_dir = settings.outputs_dir
         self.outputs_dir.mkdir(parents=True, exist_ok=True)
 
+        # Who was texted when (frequency capping across campaigns)
+        self.contact_history = ContactHistory(
+            self.outputs_dir / "contact_history",
+            settings.CONTACT_HISTORY_RETENTION_DAYS,
+        )
+
     def prepare_campaign(
         self,
         customer_limit: int = 10,
         churn_risk: str = "High",
+        segment: Optional[SegmentQuery] = None,
+        contact_cap_days: Optional[int] = None,
     ) -> List[Dict]:
         """
         Prepare campaign data for specified customers
+        (reachable by phone, in ``churn_risk`` and any extra ``segment`` filters,
+        not contacted within ``contact_cap_days``)
         """
         try:
-            data = self.data_loader.load_all_data()
-            customers_df = data["customers"]
-            transactions_df = data["transactions"]
+            with data_snapshots.hold() as snapshot:
+                return self._prepare_campaign(
+                    snapshot, customer_limit, churn_risk, segment, contact_cap_days
+                )
 
-            # Filter customers with phone numbers
-            if "churn_risk" in customers_df.columns and churn_risk:
-                filtered = customers_df[
-                    customers_df["phone"].notna()
-                    & (customers_df["churn_risk"] == churn_risk)
-                ]
-            else:
-                filtered = customers_df[customers_df["phone"].notna()]
+        except Exception as e:
+            logger.error(f"Error preparing campaign: {e}")
+            return []
 
-            target_customers = filtered.head(customer_limit)
+    def _prepare_campaign(
+        self,
+        snapshot: DataSnapshot,
+        customer_limit: int,
+        churn_risk: str,
+        segment: Optional[SegmentQuery],
+        contact_cap_days: Optional[int],
+    ) -> List[Dict]:
+        target_customers, _ = self._select_targets(
+            snapshot, customer_limit, churn_risk, segment, contact_cap_days
+        )
 
-            if target_customers.empty:
-                logger.warning("No customers found for campaign")
-                return []
+        if target_customers.empty:
+            logger.warning("No customers found for campaign")
+            return []
 
-            logger.info(f"Preparing campaign for {len(target_customers)} customers")
+        logger.info(f"Preparing campaign for {len(target_customers)} customers")
 
-            campaign_data: List[Dict] = []
+        store, transactions_df = self._customer_history_source(snapshot)
+        affinity = customer_affinities.get(snapshot).affinity
+        processes = self._partition_processes(store, len(target_customers))
+        if processes:
+            return self._prepare_partitioned(target_customers, store, affinity, processes)
 
-            for _, customer in target_customers.iterrows():
-                customer_info = self._prepare_customer_info(
-                    customer, transactions_df
-                )
+        campaign_data: List[Dict] = []
+        # One retry budget and overall deadline for the whole campaign:
+        # once AI is slow or down, remaining customers get the fallback
+        retry_budget = RetryBudget()
+        deadline = Deadline(settings.AI_CAMPAIGN_DEADLINE_SECONDS)
 
-                # AI message (fallback guaranteed)
-                message = self.ai_generator.generate_retention_message(customer_info)
-                if not message:
-                    message = self.ai_generator.generate_fallback_message(customer_info)
-
-                campaign_data.append(
-                    {
-                        "customer_id": customer["customer_id"],
-                        "name": f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip(),
-                        "phone": customer["phone"],
-                        "email": customer.get("email", ""),
-                        "churn_risk": customer.get("churn_risk", "High"),
-                        "message": message,
-                        "offer_code": self._generate_offer_code(customer["customer_id"]),
-                        "days_since": customer_info["days_since"],
-                    }
-                )
+        for _, customer in target_customers.iterrows():
+            campaign_data.append(
+                self._prepare_message(customer, transactions_df, store, affinity, retry_budget, deadline)
+            )
 
-            self._save_campaign_data(campaign_data)
-            return campaign_data
+        self._save_campaign_data(campaign_data)
+        return campaign_data
 
+    def _prepare_partitioned(
+        self,
+        targets: pd.DataFrame,
+        store: TransactionColumnStore,
+        affinity: CustomerAffinity,
+        processes: int,
+    ) -> List[Dict]:
+        """
+        Messages prepared by worker processes (see campaign_shards), written
+        to campaign_data.json as shards complete, in customer code order
+        """
+        campaign_data: List[Dict] = []
+        writer = _CampaignWriter(self.outputs_dir, results=False)
+        try:
+            for record in prepare_partitioned(targets, store, affinity, processes):
+                writer.add_message(record)
+                campaign_data.append(record)
+        finally:
+            writer.close()
+
+        logger.info(f"Campaign data saved to {self.outputs_dir / 'campaign_data.json'}")
+        return campaign_data
+
+    @staticmethod
+    def _partition_processes(store: Optional[TransactionColumnStore], audience: int) -> int:
+        """
+        Worker processes for partitioned preparation of ``audience`` customers
+        (0 = prepare in this process: small audience, no column store or one CPU)
+        """
+        if store is None or audience < settings.CAMPAIGN_PARTITION_MIN_CUSTOMERS:
+            return 0
+        processes = settings.CAMPAIGN_PARTITION_PROCESSES or os.cpu_count() or 1
+        processes = min(processes, -(-audience // settings.CAMPAIGN_PARTITION_SHARD_SIZE))
+        return processes if processes > 1 else 0
+
+    def _select_targets(
+        self,
+        snapshot: DataSnapshot,
+        customer_limit: int,
+        churn_risk: str,
+        segment: Optional[SegmentQuery],
+        contact_cap_days: Optional[int] = None,
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        (first ``customer_limit`` eligible segment members, number of segment
+        members skipped by frequency capping)
+        """
+        query = replace(segment or SegmentQuery(), has_phone=True)
+        if churn_risk and not query.churn_risk:
+            query.churn_risk = [churn_risk]
+
+        index = segment_indexes.get(snapshot)
+        cap_days = settings.CONTACT_CAP_DAYS if contact_cap_days is None else contact_cap_days
+        if cap_days <= 0:
+            return index.members(query, limit=customer_limit), 0
+
+        rows = index.evaluate(query).rows()
+        customer_ids = index.customers["customer_id"].to_numpy()[rows]
+        recent = self.contact_history.contacted_within(customer_ids, cap_days)
+        capped = int(recent.sum())
+        if capped:
+            logger.info(f"Frequency cap: skipping {capped} customers contacted in the last {cap_days} days")
+        return index.customers.iloc[rows[~recent][:customer_limit]], capped
+
+    def _record_contacts(self, customer_ids: List[str]):
+        if customer_ids:
+            self.contact_history.record(customer_ids)
+        self.contact_history.flush()
+
+    @staticmethod
+    def _customer_history_source(
+        snapshot: DataSnapshot,
+    ) -> Tuple[Optional[TransactionColumnStore], Optional[pd.DataFrame]]:
+        # Per-customer history is a slice of the column store when present
+        store = snapshot.columns
+        return store, snapshot.transactions if store is None else None
+
+    def _prepare_message(
+        self,
+        customer: pd.Series,
+        transactions_df: Optional[pd.DataFrame],
+        store: Optional[TransactionColumnStore],
+        affinity: Optional[CustomerAffinity],
+        retry_budget: RetryBudget,
+        deadline: Deadline,
+    ) -> Dict:
+        customer_info = self._prepare_customer_info(
+            customer, transactions_df, store, affinity
+        )
+
+        # AI message (fallback guaranteed)
+        message = self.ai_generator.generate_retention_message(
+            customer_info, retry_budget, deadline
+        )
+        if not message:
+            message = self.ai_generator.generate_fallback_message(customer_info)
+
+        return {
+            "customer_id": customer["customer_id"],
+            "name": f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip(),
+            "phone": customer["phone"],
+            "email": customer.get("email", ""),
+            "churn_risk": customer.get("churn_risk", "High"),
+            "message": message,
+            "offer_code": self._generate_offer_code(customer["customer_id"]),
+            "days_since": customer_info["days_since"],
+            "favorite_category": customer_info["favorite_category"],
+        }
+
+    # -----------------------------
+    # Pipelined execution
+    # -----------------------------
+    def run_campaign(
+        self,
+        customer_limit: int = 10,
+        churn_risk: str = "High",
+        segment: Optional[SegmentQuery] = None,
+        progress: Optional[CampaignProgress] = None,
+        sample_size: int = 3,
+        contact_cap_days: Optional[int] = None,
+    ) -> Tuple[Dict, List[Dict]]:
+        """
+        Select, generate and send as one streaming pipeline:
+
+            selection -> [queue] -> generation workers -> [queue] -> SMS dispatch
+
+        Sending starts with the first generated message; the bounded queues
+        and send slots keep at most a few dozen messages in memory whatever
+        the campaign size, and both output files are written as rows arrive.
+        Large audiences are prepared by a process pool instead of the
+        generation threads (see campaign_shards), in customer code order.
+
+        Customers contacted within ``contact_cap_days`` (default
+        CONTACT_CAP_DAYS) are skipped; successful sends are recorded for
+        later campaigns. The whole run reads one pinned data snapshot.
+
+        Returns (campaign results, first ``sample_size`` messages).
+        """
+        try:
+            with data_snapshots.hold() as snapshot:
+                results, samples = self._run_pipeline(
+                    snapshot, customer_limit, churn_risk, segment, progress, sample_size, contact_cap_days
+                )
         except Exception as e:
-            logger.error(f"Error preparing campaign: {e}")
-            return []
+            logger.error(f"Error running campaign: {e}")
+            results, samples = self._empty_results(str(e)), []
+
+        if progress is not None:
+            progress.finish(results, status="completed" if results["success"] else "failed")
+        return results, samples
+
+    def _run_pipeline(
+        self,
+        snapshot: DataSnapshot,
+        customer_limit: int,
+        churn_risk: str,
+        segment: Optional[SegmentQuery],
+        progress: Optional[CampaignProgress],
+        sample_size: int,
+        contact_cap_days: Optional[int],
+    ) -> Tuple[Dict, List[Dict]]:
+        targets, capped = self._select_targets(
+            snapshot, customer_limit, churn_risk, segment, contact_cap_days
+        )
+        if targets.empty:
+            logger.warning("No customers found for campaign")
+            return {**self._empty_results("No customers found for campaign"), "frequency_capped": capped}, []
+
+        logger.info(f"Running pipelined campaign for {len(targets)} customers")
+        if progress is not None:
+            progress.start_sending(len(targets))
+
+        store, transactions_df = self._customer_history_source(snapshot)
+        affinity = customer_affinities.get(snapshot).affinity
+        retry_budget = RetryBudget()
+        # Only time spent generating counts: waiting for send slots does not
+        deadline = WorkDeadline(settings.AI_CAMPAIGN_DEADLINE_SECONDS)
+        workers = max(1, min(settings.CAMPAIGN_GENERATION_WORKERS, len(targets)))
+        processes = self._partition_processes(store, len(targets))
+        if processes:
+            # One feeding stage replaces selection and the generation threads
+            workers = 1
+
+        stop = threading.Event()
+        pending = queue.Queue(maxsize=settings.CAMPAIGN_PIPELINE_QUEUE_SIZE)
+        prepared = queue.Queue(maxsize=settings.CAMPAIGN_PIPELINE_QUEUE_SIZE)
+
+        def select():
+            try:
+                for _, customer in targets.iterrows():
+                    if not _put(pending, customer, stop):
+                        return
+            finally:
+                for _ in range(workers):
+                    _put(pending, _DONE, stop)
+
+        def generate():
+            try:
+                while True:
+                    customer = _get(pending, stop)
+                    if customer is _DONE:
+                        return
+                    try:
+                        with deadline.working():
+                            record = self._prepare_message(
+                                customer, transactions_df, store, affinity, retry_budget, deadline
+                            )
+                    except Exception as e:
+                        logger.error(f"Skipping customer {customer.get('customer_id')}: {e}")
+                        continue
+                    if not _put(prepared, record, stop):
+                        return
+            finally:
+                _put(prepared, _DONE, stop)
+
+        def feed():
+            try:
+                with closing(prepare_partitioned(targets, store, affinity, processes)) as records:
+                    for record in records:
+                        if not _put(prepared, record, stop):
+                            return
+            finally:
+                _put(prepared, _DONE, stop)
+
+        samples: List[Dict] = []
+        contacted: List[str] = []
+        counts = {"successful": 0, "failed": 0}
+        counts_lock = threading.Lock()
+        writer = _CampaignWriter(self.outputs_dir)
+
+        def messages() -> Iterator[Dict]:
+            finished = 0
+            while finished < workers:
+                record = _get(prepared, stop)
+                if record is _DONE:
+                    finished += 1
+                    continue
+                writer.add_message(record)
+                if len(samples) < sample_size:
+                    samples.append(record)
+                yield record
+
+        def on_result(index: int, customer: Dict, sms: Dict):
+            writer.add_result(self._result_row(index + 1, customer, sms))
+            batch = None
+            with counts_lock:
+                counts["successful" if sms.get("success") else "failed"] += 1
+                if sms.get("success"):
+                    contacted.append(customer["customer_id"])
+                    if len(contacted) >= CONTACT_FLUSH_BATCH:
+                        batch, contacted[:] = contacted[:], []
+            if batch:
+                self._record_contacts(batch)
+            if progress is not None:
+                progress.record(customer, sms)
+
+        pipeline = [feed] if processes else [select] + [generate] * workers
+        with ThreadPoolExecutor(len(pipeline), thread_name_prefix="campaign-stage") as stages:
+            futures = [stages.submit(stage) for stage in pipeline]
+            try:
+                total = self.sms_service.send_stream(messages(), on_result, RetryBudget())
+            finally:
+                stop.set()
+                writer.close()
+                self._record_contacts(contacted)
+            for future in futures:
+                future.result()
+
+        logger.info(f"Campaign data saved to {self.outputs_dir / 'campaign_data.json'}")
+        logger.info(f"Campaign results saved to {self.outputs_dir / 'campaign_results.csv'}")
+
+        return {
+            "success": True,
+            "total": total,
+            "successful": counts["successful"],
+            "failed": counts["failed"],
+            "frequency_capped": capped,
+            "results_file": str(self.outputs_dir / "campaign_results.csv"),
+        }, samples
+
+    @staticmethod
+    def _empty_results(error: str) -> Dict:
+        return {
+            "success": False,
+            "error": error,
+            "total": 0,
+            "successful": 0,
+            "failed": 0,
+        }
 
-    def execute_campaign(self, campaign_data: List[Dict]) -> Dict:
+    def execute_campaign(
+        self,
+        campaign_data: List[Dict],
+        progress: Optional[CampaignProgress] = None,
+    ) -> Dict:
         """
-        Execute SMS campaign
+        Execute SMS campaign (per-message results are published to ``progress``)
         """
+        result = self._execute_campaign(campaign_data, progress)
+        if progress is not None:
+            progress.finish(result, status="completed" if result["success"] else "failed")
+        return result
+
+    def _execute_campaign(
+        self,
+        campaign_data: List[Dict],
+        progress: Optional[CampaignProgress] = None,
+    ) -> Dict:
         if not campaign_data:
             return {
                 "success": False,
@@ -103,10 +496,22 @@ class CampaignService:
         try:
             logger.info(f"Executing campaign for {len(campaign_data)} customers")
 
-            sms_results = self.sms_service.send_batch_sms(campaign_data)
+            if progress is not None:
+                progress.start_sending(len(campaign_data))
+
+            sms_results = self.sms_service.send_batch_sms(
+                campaign_data,
+                on_result=progress.record if progress is not None else None,
+                retry_budget=RetryBudget(),
+            )
 
             successful = sum(1 for r in sms_results if r.get("success"))
             failed = len(sms_results) - successful
+            self._record_contacts([
+                customer["customer_id"]
+                for customer, sms in zip(campaign_data, sms_results)
+                if sms.get("success")
+            ])
 
             results_data = self._prepare_results_data(
                 campaign_data, sms_results
@@ -132,15 +537,24 @@ class CampaignService:
             }
 
     def _prepare_customer_info(
-        self, customer: pd.Series, transactions_df: pd.DataFrame
+        self,
+        customer: pd.Series,
+        transactions_df: Optional[pd.DataFrame],
+        store: Optional[TransactionColumnStore] = None,
+        affinity: Optional[CustomerAffinity] = None,
     ) -> Dict:
         """
         Prepare customer information for AI
         """
         customer_id = customer["customer_id"]
-        cust_txn = transactions_df[
-            transactions_df["customer_id"] == customer_id
-        ]
+        if store is not None:
+            history = store.history(customer_id)
+            # Most recent first; flip so the last row is the latest purchase
+            cust_txn = history.iloc[::-1] if history is not None else pd.DataFrame()
+        else:
+            cust_txn = transactions_df[
+                transactions_df["customer_id"] == customer_id
+            ]
 
         if not cust_txn.empty and "date" in cust_txn.columns:
             last_purchase_date = cust_txn["date"].max()
@@ -150,13 +564,21 @@ class CampaignService:
             days_since = 60
             last_product = "groceries"
 
+        # Category spend shares from the sparse affinity matrix: O(customer's products)
+        profile = affinity.profile(customer_id) if affinity is not None else None
+        favorite = profile["favorite_category"] if profile else None
+
         return {
             "name": f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip(),
             "days_since": int(days_since),
             "last_purchase": last_product,
-            "favorite_category": customer.get(
+            "favorite_category": favorite or customer.get(
                 "favorite_category", "items you love"
             ),
+            "top_products": [p["product_id"] for p in profile["top_products"]] if profile else [],
+            "category_share": {
+                c["category"]: c["share"] for c in profile["category_share"]
+            } if profile else {},
         }
 
     def _generate_offer_code(self, customer_id: str) -> str:
@@ -182,28 +604,28 @@ class CampaignService:
         campaign_data: List[Dict],
         sms_results: List[Dict],
     ) -> List[Dict]:
-        results = []
-
-        for idx, (customer, sms) in enumerate(
-            zip(campaign_data, sms_results), start=1
-        ):
-            results.append(
-                {
-                    "campaign_id": idx,
-                    "customer_id": customer["customer_id"],
-                    "customer_name": customer["name"],
-                    "phone": customer["phone"],
-                    "churn_risk": customer["churn_risk"],
-                    "message_sent": customer["message"][:100],
-                    "offer_code": customer["offer_code"],
-                    "sms_success": sms.get("success", False),
-                    "message_sid": sms.get("message_sid", ""),
-                    "error": sms.get("error", ""),
-                    "timestamp": pd.Timestamp.now().isoformat(),
-                }
+        return [
+            self._result_row(idx, customer, sms)
+            for idx, (customer, sms) in enumerate(
+                zip(campaign_data, sms_results), start=1
             )
+        ]
 
-        return results
+    @staticmethod
+    def _result_row(idx: int, customer: Dict, sms: Dict) -> Dict:
+        return {
+            "campaign_id": idx,
+            "customer_id": customer["customer_id"],
+            "customer_name": customer["name"],
+            "phone": customer["phone"],
+            "churn_risk": customer["churn_risk"],
+            "message_sent": customer["message"][:100],
+            "offer_code": customer["offer_code"],
+            "sms_success": sms.get("success", False),
+            "message_sid": sms.get("message_sid", ""),
+            "error": sms.get("error", ""),
+            "timestamp": pd.Timestamp.now().isoformat(),
+        }
 
     def get_campaign_status(self) -> Dict:
         """
@@ -217,4 +639,6 @@ class CampaignService:
             if self.ai_generator.api_token
             else "Not configured",
             "outputs_dir": str(self.outputs_dir),
+            "circuit_breakers": breaker_states(),
+            "frequency_cap": self.contact_history.stats(settings.CONTACT_CAP_DAYS),
         }
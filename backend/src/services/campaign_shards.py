@@ -0,0 +1,157 @@
+"""
+Partitioned (multi-process) campaign preparation
+
+Preparing a message is independent per customer: purchase history from
+the column store, the category affinity profile, AI or template rendering
+and the offer code. For large audiences the targets are ordered by their
+column store customer code and cut into contiguous shards, which a process
+pool prepares in parallel.
+
+Workers never receive the data frames. Each worker re-opens the column
+store from its memory-mapped files (one copy of the pages, in the OS page
+cache) and receives the affinity matrix once, at start-up. Tasks carry
+only their shard's customer rows.
+
+A few shards per worker are in flight at a time, and results are yielded
+in shard order as each one completes. Writers can stream output while later
+shards are still being prepared, and memory stays bounded whatever the
+audience size.
+"""
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor
+import logging
+import multiprocessing
+import time
+
+import pandas as pd
+
+from src.core.data_processing.affinity import CustomerAffinity
+from src.core.data_processing.column_store import TransactionColumnStore
+from src.utils.config import settings
+from src.utils.metrics import registry
+from src.utils.resilience import RetryBudget, WorkDeadline
+
+logger = logging.getLogger(__name__)
+
+# Shards submitted ahead per worker process (bounds memory, keeps workers busy)
+SHARDS_IN_FLIGHT_PER_PROCESS = 2
+
+CAMPAIGN_SHARD_DURATION = registry.histogram(
+    "freshmart_campaign_shard_duration_seconds",
+    "Time from submitting a campaign preparation shard to receiving its messages",
+)
+
+# Per worker process, set by _init_worker
+_worker: Optional[Dict] = None
+
+
+def _start_method() -> str:
+    method = settings.CAMPAIGN_PARTITION_START_METHOD
+    if method == "auto":
+        # Never fork: the pool is started from a thread of a multi-threaded
+        # server, and a forked child can inherit locks held by other threads
+        return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return method
+
+
+def _init_worker(store_path: str, affinity: Optional[CustomerAffinity], deadline_seconds: Optional[float]):
+    global _worker
+    # Imported here: campaign_service imports this module
+    from src.services.campaign_service import CampaignService
+
+    _worker = {
+        "service": CampaignService(),
+        "store": TransactionColumnStore(Path(store_path)),
+        "affinity": affinity,
+        # Generation time of this process: idle time between shards, while
+        # the consumer is held back by sending, does not count
+        "deadline": WorkDeadline(deadline_seconds),
+    }
+
+
+def _prepare_shard(customers: List[Dict]) -> List[Dict]:
+    """
+    Messages for one shard, in shard order (customers that fail are skipped)
+    """
+    service = _worker["service"]
+    deadline = _worker["deadline"]
+    # One retry budget per shard, sized to the shard like a small campaign
+    retry_budget = RetryBudget()
+
+    records = []
+    for customer in customers:
+        try:
+            with deadline.working():
+                records.append(
+                    service._prepare_message(
+                        customer, None, _worker["store"], _worker["affinity"], retry_budget, deadline
+                    )
+                )
+        except Exception as e:
+            logger.error(f"Skipping customer {customer.get('customer_id')}: {e}")
+    return records
+
+
+def _shards(targets: pd.DataFrame, store: TransactionColumnStore, shard_size: int) -> Iterator[List[Dict]]:
+    """
+    Target rows ordered by customer code (customers without transactions
+    last, in selection order), as lists of ``shard_size`` row dicts
+    """
+    codes = store.customer_codes(targets["customer_id"].to_numpy())
+    codes[codes < 0] = len(store.customer_ids)
+    order = codes.argsort(kind="stable")
+    for start in range(0, len(order), shard_size):
+        yield targets.iloc[order[start:start + shard_size]].to_dict(orient="records")
+
+
+def prepare_partitioned(
+    targets: pd.DataFrame,
+    store: TransactionColumnStore,
+    affinity: Optional[CustomerAffinity],
+    processes: int,
+    shard_size: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    Prepared messages for ``targets`` in customer code order, produced by
+    ``processes`` worker processes and yielded as soon as each shard (in
+    order) is done
+    """
+    shard_size = shard_size or settings.CAMPAIGN_PARTITION_SHARD_SIZE
+    shards = _shards(targets, store, shard_size)
+
+    logger.info(
+        f"Preparing {len(targets)} messages in {-(-len(targets) // shard_size)} shards "
+        f"on {processes} processes"
+    )
+    pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context(_start_method()),
+        initializer=_init_worker,
+        initargs=(str(store.path), affinity, settings.AI_CAMPAIGN_DEADLINE_SECONDS),
+    )
+    pending: Deque[Tuple[float, Future]] = deque()
+
+    def submit_next() -> bool:
+        shard = next(shards, None)
+        if shard is None:
+            return False
+        pending.append((time.perf_counter(), pool.submit(_prepare_shard, shard)))
+        return True
+
+    try:
+        for _ in range(processes * SHARDS_IN_FLIGHT_PER_PROCESS):
+            if not submit_next():
+                break
+        while pending:
+            submitted, future = pending.popleft()
+            records = future.result()
+            CAMPAIGN_SHARD_DURATION.observe(time.perf_counter() - submitted)
+            submit_next()
+            yield from records
+    finally:
+        # Consumer stopped early (or a shard failed): drop queued shards
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
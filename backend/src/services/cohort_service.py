@@ -0,0 +1,164 @@
+"""
+Cohort retention matrix provider
+
+Keeps one CohortMatrix per transactions.csv version. The first build
+scans the whole history (column store arrays when available). Later
+versions are folded in incrementally: when the monthly partition
+statistics (rows, amount, transactions) of every month before the last
+one already covered are unchanged, only the last covered month (usually
+partial) and newer months are dropped and re-read, from their projected
+partition files. Anything else, such as a rewritten past month, triggers
+a full rebuild. Every new snapshot is folded in in the background.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.core.data_processing.cohorts import CohortMatrix, to_months
+from src.core.data_processing.data_loader import DataLoader
+from src.core.data_processing.schemas import TRANSACTIONS, read_csv
+from src.services.data_snapshots import DataSnapshot, current_snapshot, data_snapshots
+from src.utils.concurrency import ThreadSingleFlight
+from src.utils.metrics import record_cache_lookup, registry
+
+logger = logging.getLogger(__name__)
+
+COHORT_COLUMNS = ["customer_id", "date", "amount"]
+
+COHORT_UPDATES = registry.counter(
+    "freshmart_cohort_updates_total",
+    "Cohort matrix updates by kind (full/incremental)",
+    ("kind",),
+)
+
+
+@dataclass(frozen=True)
+class PublishedCohorts:
+    version: str
+    matrix: CohortMatrix
+    months: Optional[Dict[str, Tuple]]  # partition month -> (rows, amount, transactions)
+    update: str  # "full" | "incremental"
+
+
+class CohortProvider:
+    def __init__(self, data_loader: Optional[DataLoader] = None):
+        self.data_loader = data_loader or DataLoader()
+
+        self._published: Optional[PublishedCohorts] = None
+        self._lock = threading.Lock()
+        self._single_flight = ThreadSingleFlight("cohorts")
+
+    def get(self, snapshot: Optional[DataSnapshot] = None) -> PublishedCohorts:
+        """
+        Cohorts for ``snapshot`` (default: the request's pinned snapshot); blocking
+        """
+        snapshot = snapshot or current_snapshot()
+        version = snapshot.version_of(("transactions.csv",))
+        with self._lock:
+            published = self._published
+        if published is not None and published.version == version:
+            record_cache_lookup("cohorts", True)
+            return published
+
+        record_cache_lookup("cohorts", False)
+        return self._single_flight.do(version, self._update, snapshot, version)
+
+    def on_snapshot(self, snapshot: DataSnapshot):
+        """
+        Fold a newly published snapshot in (only once cohorts were requested)
+        """
+        if self._published is not None:
+            self.get(snapshot)
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def _update(self, snapshot: DataSnapshot, version: str) -> PublishedCohorts:
+        previous = self._published
+        months = snapshot.month_stats()
+        start = self._incremental_start(previous, months)
+
+        if start is None:
+            matrix = self._full_build(snapshot)
+            kind = "full"
+        else:
+            matrix = previous.matrix.copy()
+            start_month = int(np.datetime64(start, "M").astype(np.int64))
+            matrix.drop_from(start_month)
+            customer_ids, dates, amounts = self._rows_since(snapshot, start)
+            codes, uniques = pd.factorize(customer_ids)
+            matrix.add(codes, uniques, to_months(dates), amounts)
+            kind = "incremental"
+
+        published = PublishedCohorts(version, matrix, months, kind)
+        with self._lock:
+            # A slower build for an older version must not replace a newer one
+            if self._published is None or self._published is previous:
+                self._published = published
+        COHORT_UPDATES.labels(kind).inc()
+        logger.info(f"Cohort matrix v{version} ({kind}, {len(matrix.first_month)} customers)")
+        return published
+
+    @staticmethod
+    def _incremental_start(
+        previous: Optional[PublishedCohorts], months: Optional[Dict[str, Tuple]]
+    ) -> Optional[str]:
+        """
+        First month to re-read, or None when a full rebuild is needed
+        """
+        if previous is None or previous.months is None or months is None or not previous.months:
+            return None
+
+        last = max(previous.months)
+        before = {m: stats for m, stats in months.items() if m < last}
+        previous_before = {m: stats for m, stats in previous.months.items() if m < last}
+        return last if before == previous_before else None
+
+    @staticmethod
+    def _full_build(snapshot: DataSnapshot) -> CohortMatrix:
+        matrix = CohortMatrix()
+        store = snapshot.columns
+        if store is not None:
+            matrix.add(
+                np.asarray(store["customer_code"]),
+                store.customer_ids.astype(str),
+                to_months(store.dates),
+                np.asarray(store["amount"]),
+            )
+        elif {"customer_id", "date", "amount"} <= set(snapshot.transactions.columns):
+            tx = snapshot.transactions
+            codes, uniques = pd.factorize(tx["customer_id"])
+            matrix.add(codes, uniques, to_months(tx["date"]), tx["amount"].to_numpy(dtype=np.float64))
+        return matrix
+
+    def _rows_since(self, snapshot: DataSnapshot, start: str):
+        """
+        (customer ids, dates, amounts) of the partitions from month ``start`` on
+        """
+        selected = [p for p in snapshot.partitions if p["month"] >= start]
+        try:
+            frames = [
+                read_csv(self.data_loader.partitions_dir / p["file"], TRANSACTIONS, COHORT_COLUMNS)
+                for p in selected
+            ]
+            tx = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COHORT_COLUMNS)
+        except FileNotFoundError:
+            # Partition files of this version were already cleaned up
+            tx = snapshot.transactions_between(
+                start=pd.Period(start, "M").start_time, columns=COHORT_COLUMNS
+            )
+
+        return (
+            tx["customer_id"].to_numpy(),
+            pd.to_datetime(tx["date"], errors="coerce").to_numpy(),
+            tx["amount"].to_numpy(dtype=np.float64),
+        )
+
+
+# Global singleton instance
+cohort_matrices = CohortProvider()
+data_snapshots.subscribe(cohort_matrices.on_snapshot)
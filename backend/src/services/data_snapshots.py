@@ -0,0 +1,466 @@
+"""
+Immutable, versioned data snapshots
+
+A DataSnapshot bundles the customers, products and transactions of one
+consistent version of the source files, together with the transaction
+column store and partition metadata built from that version. Requests
+never parse CSVs: they read the published snapshot.
+
+Transactions are not kept as a parsed frame when the column store exists:
+every worker process maps the same column files, whole-history readers
+use those arrays, and date windows are read from the snapshot's monthly
+partitions (``transactions_between``), so they scale with the window.
+
+Reloads are copy-on-write. When a source file changes, a complete new
+snapshot is built off the request path (datasets whose file did not change
+are shared with the previous snapshot), then published with a single
+reference swap. Each request pins the snapshot it first reads for its
+whole duration (``SnapshotMiddleware`` + ``current_snapshot()``), so a
+handler never mixes two versions; a replaced snapshot is released once its
+last reader has finished.
+
+Snapshot frames are shared by every reader and must not be modified in
+place: derive new frames (``assign``, ``copy``, boolean selection) instead.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+import contextvars
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.core.data_processing.column_store import TransactionColumnStore
+from src.core.data_processing.data_loader import DataLoader
+from src.core.data_processing.schemas import TRANSACTIONS, project
+from src.utils.concurrency import ThreadSingleFlight
+from src.utils.config import settings
+from src.utils.metrics import DerivedGauge, registry
+
+logger = logging.getLogger(__name__)
+
+# A build is retried when a source file changes while it is being read
+BUILD_ATTEMPTS = 3
+
+SNAPSHOT_BUILD_DURATION = registry.histogram(
+    "freshmart_data_snapshot_build_duration_seconds",
+    "Time to build a new data snapshot",
+)
+SNAPSHOTS_PUBLISHED = registry.counter(
+    "freshmart_data_snapshots_published_total",
+    "Data snapshots published",
+)
+SNAPSHOTS_RELEASED = registry.counter(
+    "freshmart_data_snapshots_released_total",
+    "Replaced data snapshots freed after their last reader finished",
+)
+SNAPSHOT_DATASETS_REUSED = registry.counter(
+    "freshmart_data_snapshot_datasets_reused_total",
+    "Datasets shared with the previous snapshot because their file did not change",
+    ("dataset",),
+)
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    version: str
+    stamps: Mapping[str, str]  # source file -> size/mtime stamp it was read at
+    customers: pd.DataFrame
+    products: pd.DataFrame
+    columns: Optional[TransactionColumnStore]
+    partitions: Optional[Tuple[Dict, ...]]
+    built_at: float
+    # Parsed transactions.csv, only kept when there is no column store
+    parsed_transactions: Optional[pd.DataFrame] = None
+    data_loader: Optional[DataLoader] = field(default=None, repr=False, compare=False)
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        """
+        Every transaction. With a column store the frame is materialized
+        from the mapped columns on each call: whole-history readers should
+        use ``columns`` and windowed ones ``transactions_between``.
+        """
+        if self.columns is not None:
+            return self.columns.frame()
+        if self.parsed_transactions is None:
+            return pd.DataFrame(columns=TRANSACTIONS.columns)
+        return self.parsed_transactions
+
+    @property
+    def transaction_rows(self) -> int:
+        if self.columns is not None:
+            return self.columns.rows
+        return len(self.parsed_transactions) if self.parsed_transactions is not None else 0
+
+    def version_of(self, files: Iterable[str]) -> str:
+        """
+        ``DataLoader.data_version(files)`` as of this snapshot
+        """
+        return DataLoader.fingerprint(self.stamps[name] for name in files)
+
+    def month_stats(self) -> Optional[Dict[str, Tuple]]:
+        """
+        Partition month -> (rows, amount, transactions), None without partitions
+        """
+        if not self.partitions:
+            return None
+        return {p["month"]: (p["rows"], p["amount"], p["transactions"]) for p in self.partitions}
+
+    def transactions_between(
+        self, start=None, end=None, columns: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Transactions dated within [start, end] (either bound optional), read
+        from this snapshot's partitions that overlap the window; only
+        ``columns`` are read when given
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        if self.partitions and self.data_loader is not None:
+            try:
+                return self.data_loader.read_partitions(self.partitions, start, end, columns)
+            except FileNotFoundError:
+                # Partition files of this version were already cleaned up
+                pass
+
+        store = self.columns
+        if store is not None:
+            dates = store["date"]
+            mask = ~np.isnat(store.dates)
+            if start is not None:
+                mask &= dates >= start.value
+            if end is not None:
+                mask &= dates <= end.value
+            return store.frame(np.flatnonzero(mask), columns)
+
+        df = self.transactions
+        if "date" not in df.columns:
+            return project(df.iloc[0:0], columns)
+
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df["date"] >= start
+        if end is not None:
+            mask &= df["date"] <= end
+        return project(df.loc[mask], columns).reset_index(drop=True)
+
+
+class SnapshotManager:
+    def __init__(self, data_loader: Optional[DataLoader] = None, check_interval: Optional[float] = None):
+        self.data_loader = data_loader or DataLoader()
+        self.check_interval = (
+            settings.SNAPSHOT_CHECK_SECONDS if check_interval is None else check_interval
+        )
+
+        self._current: Optional[DataSnapshot] = None
+        self._checked_at = 0.0
+        self._reloading = False
+        self._readers: Dict[str, int] = {}  # version -> pinned readers
+        self._retired: Dict[str, DataSnapshot] = {}  # replaced, still pinned
+        self._lock = threading.Lock()
+        self._builds = ThreadSingleFlight("data_snapshot")
+        self._listeners: List[Callable[[DataSnapshot], None]] = []
+
+    # -----------------------------
+    # Serving
+    # -----------------------------
+    @property
+    def published(self) -> Optional[DataSnapshot]:
+        """
+        Latest published snapshot without change checks (None before the first build)
+        """
+        return self._current
+
+    def current(self) -> DataSnapshot:
+        """
+        Latest published snapshot. Only the very first call waits for a
+        build; afterwards a changed source file triggers a background
+        reload and callers keep the current snapshot until it is published.
+        """
+        snapshot = self._current
+        if snapshot is None:
+            return self.refresh()
+        self._check_for_changes(snapshot)
+        return snapshot
+
+    def acquire(self) -> DataSnapshot:
+        """
+        Current snapshot, kept alive until the matching ``release``
+        """
+        snapshot = self.current()
+        with self._lock:
+            self._readers[snapshot.version] = self._readers.get(snapshot.version, 0) + 1
+        return snapshot
+
+    def release(self, snapshot: DataSnapshot):
+        with self._lock:
+            remaining = self._readers.get(snapshot.version, 0) - 1
+            if remaining > 0:
+                self._readers[snapshot.version] = remaining
+                return
+            self._readers.pop(snapshot.version, None)
+            if self._retired.pop(snapshot.version, None) is not None:
+                SNAPSHOTS_RELEASED.inc()
+                logger.info(f"Released data snapshot v{snapshot.version}")
+
+    @contextmanager
+    def hold(self) -> Iterator[DataSnapshot]:
+        """
+        Pin the current snapshot for the enclosed block
+        """
+        snapshot = self.acquire()
+        try:
+            yield snapshot
+        finally:
+            self.release(snapshot)
+
+    # -----------------------------
+    # Reload
+    # -----------------------------
+    def _stamps(self) -> Dict[str, str]:
+        return {name: self.data_loader.file_stamp(name) for name in DataLoader.SOURCE_FILES}
+
+    def _check_for_changes(self, snapshot: DataSnapshot):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._stamps() == snapshot.stamps:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="snapshot-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Data snapshot reload failed: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def refresh(self) -> DataSnapshot:
+        """
+        Publish a snapshot of the source files as they are now (blocking;
+        concurrent callers share one build). Returns the current snapshot
+        when nothing changed.
+        """
+        return self._builds.do("refresh", self._refresh)
+
+    def _refresh(self) -> DataSnapshot:
+        previous = self._current
+        if previous is not None and self._stamps() == previous.stamps:
+            return previous
+
+        start = time.perf_counter()
+        snapshot = self._build(previous)
+        SNAPSHOT_BUILD_DURATION.observe(time.perf_counter() - start)
+        self._publish(snapshot)
+        return snapshot
+
+    def _build(self, previous: Optional[DataSnapshot]) -> DataSnapshot:
+        for attempt in range(1, BUILD_ATTEMPTS + 1):
+            stamps = self._stamps()
+            datasets = self._load_datasets(previous, stamps)
+
+            columns = datasets["columns"]
+            consistent = self._stamps() == stamps and (
+                columns is None
+                or columns.version == DataLoader.fingerprint([stamps["transactions.csv"]])
+            )
+            if consistent:
+                break
+            if attempt < BUILD_ATTEMPTS:
+                logger.info(f"Source files changed while building a snapshot, retrying ({attempt})")
+            else:
+                logger.warning("Source files kept changing; publishing a best-effort snapshot")
+
+        return DataSnapshot(
+            version=DataLoader.fingerprint(stamps.values()),
+            stamps=MappingProxyType(stamps),
+            built_at=time.time(),
+            data_loader=self.data_loader,
+            **datasets,
+        )
+
+    def _load_datasets(self, previous: Optional[DataSnapshot], stamps: Dict[str, str]) -> Dict:
+        """
+        Snapshot fields; datasets whose file is unchanged are shared with ``previous``
+        """
+        def unchanged(name: str) -> bool:
+            if previous is None or previous.stamps[f"{name}.csv"] != stamps[f"{name}.csv"]:
+                return False
+            SNAPSHOT_DATASETS_REUSED.labels(name).inc()
+            return True
+
+        loader = self.data_loader
+        datasets = {
+            "customers": previous.customers if unchanged("customers") else loader.load_customers(),
+            "products": previous.products if unchanged("products") else loader.load_products(),
+        }
+        if unchanged("transactions"):
+            datasets.update(
+                parsed_transactions=previous.parsed_transactions,
+                columns=previous.columns,
+                partitions=previous.partitions,
+            )
+        else:
+            partitions = loader.transaction_partitions()
+            store = loader.transaction_columns()
+            datasets.update(
+                # Parsed rows are only kept when there is no column store to
+                # map, and only the declared columns endpoints read
+                parsed_transactions=(
+                    loader.load_transactions(columns=TRANSACTIONS.columns) if store is None else None
+                ),
+                columns=store,
+                partitions=tuple(partitions) if partitions is not None else None,
+            )
+        return datasets
+
+    def _publish(self, snapshot: DataSnapshot):
+        with self._lock:
+            previous, self._current = self._current, snapshot
+            if previous is not None and previous.version != snapshot.version:
+                if self._readers.get(previous.version):
+                    # Freed by the last reader's release()
+                    self._retired[previous.version] = previous
+                else:
+                    SNAPSHOTS_RELEASED.inc()
+
+        SNAPSHOTS_PUBLISHED.inc()
+        logger.info(
+            f"Published data snapshot v{snapshot.version} "
+            f"({len(snapshot.customers)} customers, {snapshot.transaction_rows} transactions)"
+        )
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Snapshot listener failed: {e}")
+
+    def subscribe(self, listener: Callable[[DataSnapshot], None]):
+        """
+        Call ``listener(snapshot)`` after every publish (on the publishing thread)
+        """
+        self._listeners.append(listener)
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            snapshot = self._current
+            return {
+                "version": snapshot.version if snapshot is not None else None,
+                "built_at": snapshot.built_at if snapshot is not None else None,
+                "files": dict(snapshot.stamps) if snapshot is not None else {},
+                "readers": dict(self._readers),
+                "retired_pinned": sorted(self._retired),
+                "reloading": self._reloading,
+                "check_interval_seconds": self.check_interval,
+            }
+
+    def _reader_counts(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            current = self._current.version if self._current is not None else None
+            counts = {("current",): float(self._readers.get(current, 0))}
+            counts[("retired",)] = float(sum(self._readers.get(v, 0) for v in self._retired))
+            return counts
+
+
+# -----------------------------
+# Per-request pinning
+# -----------------------------
+class _Pin:
+    """
+    Snapshot pinned by one request, acquired on first use
+    """
+    __slots__ = ("manager", "snapshot", "released", "lock")
+
+    def __init__(self, manager: SnapshotManager):
+        self.manager = manager
+        self.snapshot: Optional[DataSnapshot] = None
+        self.released = False
+        self.lock = threading.Lock()
+
+    def get(self) -> DataSnapshot:
+        with self.lock:
+            if self.snapshot is None:
+                if self.released:
+                    return self.manager.current()
+                self.snapshot = self.manager.acquire()
+            return self.snapshot
+
+    def release(self):
+        with self.lock:
+            self.released = True
+            if self.snapshot is not None:
+                self.manager.release(self.snapshot)
+
+
+_pin: contextvars.ContextVar[Optional[_Pin]] = contextvars.ContextVar("data_snapshot_pin", default=None)
+
+
+@contextmanager
+def pinned(manager: Optional[SnapshotManager] = None) -> Iterator[None]:
+    """
+    Make ``current_snapshot()`` return one snapshot for the enclosed block
+    (acquired lazily, so blocks that read no data pin nothing)
+    """
+    pin = _Pin(manager or data_snapshots)
+    token = _pin.set(pin)
+    try:
+        yield
+    finally:
+        _pin.reset(token)
+        pin.release()
+
+
+def current_snapshot() -> DataSnapshot:
+    """
+    The snapshot pinned by the current request, or the latest one
+    """
+    pin = _pin.get()
+    if pin is None:
+        return data_snapshots.current()
+    return pin.get()
+
+
+class SnapshotMiddleware:
+    """
+    Pins one data snapshot per HTTP request
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with pinned():
+            await self.app(scope, receive, send)
+
+
+# Global singleton instance
+data_snapshots = SnapshotManager()
+
+registry.register(
+    DerivedGauge(
+        "freshmart_data_snapshot_readers",
+        "Requests pinning the current or a replaced data snapshot",
+        ("snapshot",),
+        data_snapshots._reader_counts,
+    )
+)
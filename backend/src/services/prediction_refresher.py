@@ -0,0 +1,274 @@
+"""
+Background churn-prediction refresher
+
+Recomputes churn predictions whenever customers.csv or transactions.csv
+change (read from the latest data snapshot), writes them atomically to
+churn_predictions.csv (temp file + rename) with a version stamp, and
+publishes them to the serving layer so requests never run the feature
+pipeline themselves.
+
+Predictions computed from DEV sample data (a source file is missing) are
+served but never written. A churn_predictions.csv without the refresher's
+meta file comes from an outside pipeline: it is never replaced and is served
+as is (source "file"), versioned by its own size and mtime together with the
+sources, so rewriting it publishes the new predictions. Only when it cannot
+be read are rule-based predictions computed instead.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from src.utils.config import settings
+from src.utils.concurrency import SingleFlight, run_blocking
+from src.utils.metrics import registry
+from src.core.data_processing.churn_index import ChurnRiskIndex
+from src.core.data_processing.data_loader import DataLoader
+from src.core.data_processing.feature_engineering import FeatureEngineer
+from src.services.data_snapshots import DataSnapshot, SnapshotManager, data_snapshots
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_SOURCES = ("customers.csv", "transactions.csv")
+
+REFRESH_DURATION = registry.histogram(
+    "freshmart_prediction_refresh_duration_seconds",
+    "Time to recompute and publish churn predictions",
+)
+REFRESHES = registry.counter(
+    "freshmart_prediction_refreshes_total",
+    "Prediction refresh attempts by outcome",
+    ("outcome",),
+)
+PUBLISHED_AT = registry.gauge(
+    "freshmart_prediction_published_timestamp_seconds",
+    "Unix time the serving predictions were published",
+)
+
+
+@dataclass(frozen=True)
+class PublishedPredictions:
+    version: str
+    predictions: pd.DataFrame
+    computed_at: str
+    source: str  # "computed" | "file"
+    index: ChurnRiskIndex
+
+
+class ChurnPredictionRefresher:
+    def __init__(self, data_loader: Optional[DataLoader] = None):
+        self.data_loader = data_loader or DataLoader()
+        # A custom loader (another data directory) gets its own snapshots
+        self.snapshots = data_snapshots if data_loader is None else SnapshotManager(data_loader)
+        self.feature_engineer = FeatureEngineer()
+        self.interval = settings.PREDICTION_REFRESH_INTERVAL_SECONDS
+
+        self._published: Optional[PublishedPredictions] = None
+        self._refresh_lock = threading.Lock()
+        self._single_flight = SingleFlight("prediction_refresh")
+        self._task: Optional[asyncio.Task] = None
+
+    # -----------------------------
+    # Serving
+    # -----------------------------
+    def current(self) -> Optional[PublishedPredictions]:
+        return self._published
+
+    async def get(self) -> Optional[PublishedPredictions]:
+        """
+        Current predictions; the very first caller waits for the initial
+        refresh (shared with every concurrent caller), later ones never do.
+        """
+        if self._published is None:
+            await self._single_flight.do("refresh", self.refresh)
+        return self._published
+
+    # -----------------------------
+    # Refresh
+    # -----------------------------
+    @property
+    def predictions_path(self) -> Path:
+        return self.data_loader.data_dir / "churn_predictions.csv"
+
+    @property
+    def meta_path(self) -> Path:
+        return self.data_loader.data_dir / "churn_predictions.meta.json"
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Bring predictions up to date with the source files (blocking).
+        Returns True when a new version was published.
+        """
+        with self._refresh_lock:
+            snapshot = self.snapshots.refresh()
+            version = snapshot.version_of(PREDICTION_SOURCES)
+            external = self._external_stamp()
+            if external is not None:
+                version = DataLoader.fingerprint([version, external])
+
+            if not force and self._published is not None and self._published.version == version:
+                return False
+
+            start = time.perf_counter()
+            try:
+                if external is not None:
+                    published = self._load_external_file(version)
+                else:
+                    published = None if force else self._load_published_file(version)
+                if published is None:
+                    published = self._compute(snapshot, version)
+                    if self._persistable(snapshot):
+                        self._write_atomically(published)
+            except Exception as e:
+                REFRESHES.labels("error").inc()
+                logger.error(f"Churn prediction refresh failed: {e}")
+                return False
+
+            self._published = published
+            REFRESH_DURATION.observe(time.perf_counter() - start)
+            REFRESHES.labels(published.source).inc()
+            PUBLISHED_AT.set(time.time())
+            logger.info(
+                f"Published churn predictions v{version} "
+                f"({len(published.predictions)} customers, {published.source})"
+            )
+            return True
+
+    def _compute(self, snapshot: DataSnapshot, version: str) -> PublishedPredictions:
+        if snapshot.columns is not None:
+            rfm_df = self.feature_engineer.calculate_rfm_from_columns(snapshot.columns)
+        else:
+            rfm_df = self.feature_engineer.calculate_rfm_features(snapshot.transactions)
+        features_df = self.feature_engineer.create_churn_features(snapshot.customers, rfm_df)
+        churn_df = self.feature_engineer.predict_churn_risk(features_df).reset_index(drop=True)
+
+        return PublishedPredictions(
+            version=version,
+            predictions=churn_df,
+            computed_at=datetime.now().isoformat(),
+            source="computed",
+            index=ChurnRiskIndex(churn_df),
+        )
+
+    def _load_published_file(self, version: str) -> Optional[PublishedPredictions]:
+        """
+        Reuse churn_predictions.csv if its stamp matches the sources
+        (e.g. written by another worker process)
+        """
+        try:
+            meta = json.loads(self.meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if meta.get("version") != version:
+            return None
+
+        df = self.data_loader.load_churn_predictions()
+        # CSV and stamp are replaced separately; a row mismatch means we raced
+        # a writer, so recompute rather than trust the pair
+        if df is None or len(df) != meta.get("rows"):
+            return None
+
+        return PublishedPredictions(
+            version=version,
+            predictions=df,
+            computed_at=meta.get("computed_at", ""),
+            source="file",
+            index=ChurnRiskIndex(df),
+        )
+
+    def _external_stamp(self) -> Optional[str]:
+        """
+        Stamp of a churn_predictions.csv the refresher did not write (no meta
+        file next to it), None otherwise
+        """
+        if self.meta_path.exists() or not self.predictions_path.exists():
+            return None
+        return self.data_loader.file_stamp(self.predictions_path.name)
+
+    def _load_external_file(self, version: str) -> Optional[PublishedPredictions]:
+        """
+        Serve churn_predictions.csv from an outside pipeline as is
+        """
+        df = self.data_loader.load_churn_predictions()
+        if df is None:
+            logger.error(
+                f"Externally provided {self.predictions_path.name} could not be read; "
+                f"serving computed predictions instead"
+            )
+            return None
+
+        logger.info(f"Serving externally provided {self.predictions_path.name}")
+        return PublishedPredictions(
+            version=version,
+            predictions=df.reset_index(drop=True),
+            computed_at=datetime.fromtimestamp(self.predictions_path.stat().st_mtime).isoformat(),
+            source="file",
+            index=ChurnRiskIndex(df),
+        )
+
+    def _persistable(self, snapshot: DataSnapshot) -> bool:
+        """
+        Whether computed predictions may be written to churn_predictions.csv
+        """
+        missing = [name for name in PREDICTION_SOURCES if snapshot.stamps[name] == f"{name}:missing"]
+        if missing:
+            logger.info(f"Not writing predictions computed from DEV sample data ({', '.join(missing)} missing)")
+            return False
+        if self.predictions_path.exists() and not self.meta_path.exists():
+            logger.warning(f"{self.predictions_path.name} was not written by the refresher; leaving it in place")
+            return False
+        return True
+
+    def _write_atomically(self, published: PublishedPredictions):
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+
+        csv_tmp = self.predictions_path.with_name(self.predictions_path.name + suffix)
+        published.predictions.to_csv(csv_tmp, index=False)
+        os.replace(csv_tmp, self.predictions_path)
+
+        meta_tmp = self.meta_path.with_name(self.meta_path.name + suffix)
+        meta_tmp.write_text(json.dumps({
+            "version": published.version,
+            "computed_at": published.computed_at,
+            "rows": len(published.predictions),
+            "sources": list(PREDICTION_SOURCES),
+        }, indent=2))
+        os.replace(meta_tmp, self.meta_path)
+
+    # -----------------------------
+    # Scheduling
+    # -----------------------------
+    async def _run(self):
+        while True:
+            try:
+                await run_blocking(self.refresh)
+            except Exception as e:
+                logger.error(f"Prediction refresher iteration failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Churn prediction refresher started (every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global singleton instance
+prediction_refresher = ChurnPredictionRefresher()
@@ -0,0 +1,223 @@
+"""
+Parameterized query-result cache
+
+Endpoint answers are cached under (route, normalized params, data version),
+where the data version combines the request's pinned data snapshot with
+the published churn predictions. A new snapshot or prediction version
+makes every older entry unreachable; they are purged as soon as the change
+is seen, so stale answers are never served and never pin memory.
+
+Entries are bounded by their approximate size (JSON-encoded length,
+measured on the executor thread that computed them) and evicted least
+recently used first. An optional TTL covers answers that depend on the
+clock as well as on the data (e.g. "last 90 days" windows).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+from src.services.data_snapshots import DataSnapshot, current_snapshot, data_snapshots
+from src.services.prediction_refresher import PublishedPredictions, prediction_refresher
+from src.utils.concurrency import SingleFlight
+from src.utils.config import settings
+from src.utils.metrics import DerivedGauge, record_cache_lookup, registry
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_EVICTIONS = registry.counter(
+    "freshmart_result_cache_evictions_total",
+    "Cached query results dropped, by reason (size/ttl/version)",
+    ("reason",),
+)
+
+
+def normalize_params(params: Mapping[str, Any]) -> Tuple:
+    """
+    Order-insensitive, hashable form of query parameters: unset (None)
+    parameters are dropped, strings are stripped and multi-value filters
+    (ORed, so order does not matter) are sorted
+    """
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            value = tuple(sorted(str(v).strip() for v in value))
+        elif hasattr(value, "cache_key"):
+            value = value.cache_key()
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+def _result_size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+def _sized(func: Callable, *args, **kwargs) -> Tuple[Any, int]:
+    result = func(*args, **kwargs)
+    return result, _result_size(result)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: Optional[float]
+
+
+class ResultCache:
+    def __init__(self, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_bytes = settings.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = settings.RESULT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[str] = None  # version of the latest published data
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Versioning
+    # -----------------------------
+    @staticmethod
+    def _data_version(snapshot: DataSnapshot, predictions: Optional[PublishedPredictions] = None) -> str:
+        published = predictions or prediction_refresher.current()
+        return f"{snapshot.version}/{published.version if published is not None else '-'}"
+
+    def _observe_version(self, version: str):
+        """
+        Make ``version`` (that of the latest published data) the live one,
+        dropping entries of every other version (caller holds the lock)
+        """
+        if version == self._version:
+            return
+        self._version = version
+        stale = [key for key in self._entries if key[2] != version]
+        for key in stale:
+            self._remove(key, "version")
+        if stale:
+            logger.info(f"Result cache: dropped {len(stale)} entries for older data")
+
+    def invalidate(self, snapshot: Optional[DataSnapshot] = None):
+        """
+        Drop entries not computed from ``snapshot`` (default: drop everything)
+        """
+        with self._lock:
+            if snapshot is None:
+                for key in list(self._entries):
+                    self._remove(key, "version")
+                self._version = None
+            else:
+                self._observe_version(self._data_version(snapshot))
+
+    # -----------------------------
+    # Entries
+    # -----------------------------
+    def _remove(self, key: Tuple, reason: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        RESULT_CACHE_EVICTIONS.labels(reason).inc()
+
+    def _lookup(self, key: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key, "ttl")
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry.value
+
+    def _store(self, key: Tuple, value: Any, size: int, ttl: Optional[float]):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Answers computed from a snapshot that was replaced meanwhile
+            # would only be evicted again
+            if key[2] != self._version or key in self._entries:
+                return
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._entries[key] = _Entry(value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), "size")
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    async def get_or_compute(
+        self,
+        route: str,
+        params: Mapping[str, Any],
+        flight: SingleFlight,
+        func: Callable,
+        *args,
+        ttl: Optional[float] = None,
+        predictions: Optional[PublishedPredictions] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Cached answer of ``route`` for ``params``, else ``func(*args, **kwargs)``
+        run on the executor (shared with identical in-flight calls). ``ttl``
+        overrides RESULT_CACHE_TTL_SECONDS for this route. Handlers that
+        compute from ``predictions`` they captured earlier pass them, so the
+        answer is keyed by that version rather than the latest one.
+        """
+        key_params = normalize_params(params)
+
+        # Before the first snapshot exists, resolving the version would
+        # block the event loop on the initial build: just compute
+        if self.max_bytes <= 0 or data_snapshots.published is None:
+            return await flight.do((route, key_params), func, *args, **kwargs)
+
+        with self._lock:
+            self._observe_version(self._data_version(data_snapshots.published))
+        # Requests still pinning a replaced snapshot miss and do not store
+        key = (route, key_params, self._data_version(current_snapshot(), predictions))
+
+        hit, value = self._lookup(key)
+        record_cache_lookup(f"result:{route}", hit)
+        if hit:
+            return value
+
+        value, size = await flight.do(key, _sized, func, *args, **kwargs)
+        self._store(key, value, size, self.ttl_seconds if ttl is None else ttl)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            routes: Dict[str, int] = {}
+            for route, _, _ in self._entries:
+                routes[route] = routes.get(route, 0) + 1
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "data_version": self._version,
+                "entries_by_route": routes,
+            }
+
+    def _gauges(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return {("entries",): float(len(self._entries)), ("bytes",): float(self._bytes)}
+
+
+# Global singleton instance
+result_cache = ResultCache()
+data_snapshots.subscribe(result_cache.invalidate)
+
+registry.register(
+    DerivedGauge(
+        "freshmart_result_cache_size",
+        "Cached query results (entries) and their approximate size (bytes)",
+        ("measure",),
+        result_cache._gauges,
+    )
+)
@@ -0,0 +1,97 @@
+"""
+Customer segment index provider
+
+Keeps one CustomerSegmentIndex per (customers.csv version, published
+predictions version, affinity version) so segment queries in listings and campaigns reuse
+the same bitmaps instead of re-filtering DataFrames per request. The
+previous version's index is kept too, for requests still pinning the
+previous data snapshot while a reload is published. Each customer's
+favorite category (largest share of spend) comes from the affinity matrix.
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import logging
+import threading
+
+from src.core.data_processing.bitmap_index import CustomerSegmentIndex
+from src.services.affinity_service import AffinityProvider, customer_affinities
+from src.services.data_snapshots import DataSnapshot, current_snapshot
+from src.services.prediction_refresher import ChurnPredictionRefresher, prediction_refresher
+from src.utils.concurrency import ThreadSingleFlight
+from src.utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_ATTRIBUTES = ["customer_id", "churn_risk", "recency", "monetary"]
+
+# Indexes kept: the current version and the one before it
+KEPT_VERSIONS = 2
+
+
+class SegmentIndexProvider:
+    def __init__(
+        self,
+        refresher: Optional[ChurnPredictionRefresher] = None,
+        affinities: Optional[AffinityProvider] = None,
+    ):
+        self.refresher = refresher or prediction_refresher
+        self.affinities = affinities or customer_affinities
+
+        self._indexes: "OrderedDict[Tuple[str, str, str], CustomerSegmentIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = ThreadSingleFlight("segment_index")
+
+    def _version(self, snapshot: DataSnapshot) -> Tuple[str, str, str]:
+        published = self.refresher.current()
+        return (
+            snapshot.version_of(("customers.csv",)),
+            published.version if published is not None else "",
+            AffinityProvider.version(snapshot),
+        )
+
+    def get(self, snapshot: Optional[DataSnapshot] = None) -> CustomerSegmentIndex:
+        """
+        Index over ``snapshot`` (default: the request's pinned snapshot).
+        Blocking; rebuilt once per version change.
+        """
+        snapshot = snapshot or current_snapshot()
+        version = self._version(snapshot)
+        with self._lock:
+            index = self._indexes.get(version)
+            if index is not None:
+                self._indexes.move_to_end(version)
+                record_cache_lookup("segment_index", True)
+                return index
+
+        record_cache_lookup("segment_index", False)
+        return self._single_flight.do(version, self._build, snapshot)
+
+    def _build(self, snapshot: DataSnapshot) -> CustomerSegmentIndex:
+        # Block on the first refresh so risk/recency predicates have data
+        if self.refresher.current() is None:
+            self.refresher.refresh()
+
+        version = self._version(snapshot)
+        published = self.refresher.current()
+
+        attributes = None
+        if published is not None:
+            columns = [c for c in PREDICTION_ATTRIBUTES if c in published.predictions.columns]
+            attributes = published.predictions[columns]
+
+        favorites = self.affinities.get(snapshot).affinity.favorite_categories()
+        if attributes is None:
+            attributes = favorites
+        else:
+            attributes = attributes.drop_duplicates("customer_id").merge(favorites, on="customer_id", how="outer")
+
+        index = CustomerSegmentIndex(snapshot.customers, attributes)
+        with self._lock:
+            self._indexes[version] = index
+            while len(self._indexes) > KEPT_VERSIONS:
+                self._indexes.popitem(last=False)
+        return index
+
+
+# Global singleton instance
+segment_indexes = SegmentIndexProvider()
@@ -0,0 +1,172 @@
+"""
+Bounded executors and single-flight request coalescing
+
+Handlers are ``async def`` but their bodies are blocking pandas / file / HTTP
+work. ``run_blocking`` moves that work onto a bounded thread pool so the
+event loop keeps serving other clients, and ``SingleFlight`` makes identical
+concurrent computations share one in-flight execution.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+import contextvars
+import threading
+import time
+
+from src.utils.config import settings
+from src.utils.metrics import registry
+
+SINGLEFLIGHT_COALESCED = registry.counter(
+    "freshmart_singleflight_coalesced_total",
+    "Callers that joined an identical in-flight computation",
+    ("name",),
+)
+EXECUTOR_QUEUE = registry.gauge(
+    "freshmart_executor_pending",
+    "Blocking tasks submitted and not yet finished",
+    ("pool",),
+)
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool: str = "default") -> ThreadPoolExecutor:
+    """
+    Lazily created, bounded thread pools.
+
+    ``default`` serves request handlers; ``campaign`` runs long campaign
+    jobs so they cannot starve dashboard traffic.
+    """
+    executor = _executors.get(pool)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                workers = (
+                    settings.CAMPAIGN_WORKERS if pool == "campaign" else settings.BLOCKING_WORKERS
+                )
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{pool}-worker")
+                _executors[pool] = executor
+    return executor
+
+
+async def run_blocking(func: Callable, *args, pool: str = "default", **kwargs) -> Any:
+    """
+    Run a blocking callable on a bounded executor and await its result.
+    The caller's context variables (e.g. the request's pinned data
+    snapshot) are visible to ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    pending = EXECUTOR_QUEUE.labels(pool)
+    pending.inc()
+    context = contextvars.copy_context()
+    try:
+        return await loop.run_in_executor(
+            get_executor(pool), partial(context.run, func, *args, **kwargs)
+        )
+    finally:
+        pending.dec()
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent async calls.
+
+    The first caller for a key runs ``func`` on the executor; callers that
+    arrive while it is in flight await the same future. Results are shared,
+    so callers must treat them as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        future = self._inflight.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(run_blocking(func, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            SINGLEFLIGHT_COALESCED.labels(self.name).inc()
+
+        # Shield so one cancelled client does not cancel the shared work
+        return await asyncio.shield(future)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ThreadSingleFlight:
+    """
+    Thread-safe single-flight for blocking code running on executor threads
+    (e.g. two routes parsing the same CSV at the same time)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_COALESCED.labels(self.name).inc()
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class RateLimiter:
+    """
+    Thread-safe pacing: at most ``per_second`` acquisitions per second,
+    spread evenly (0 or less = unlimited)
+    """
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
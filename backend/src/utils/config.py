@@ -23,6 +23,96 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
 
+    # Concurrency (blocking handler work runs on bounded thread pools)
+    BLOCKING_WORKERS: int = 8
+    CAMPAIGN_WORKERS: int = 2
+
+    # CSV parsing: "auto" (pyarrow's multithreaded parser when installed),
+    # "pyarrow" or "c"
+    CSV_ENGINE: str = "auto"
+
+    # Data snapshots: how often requests check the source files for changes
+    # (a changed file triggers a background reload; requests keep the old
+    # snapshot until the new one is published)
+    SNAPSHOT_CHECK_SECONDS: float = 1.0
+
+    # Query-result cache: endpoint answers keyed on (route, params, data
+    # version), bounded by approximate JSON size; TTL 0 = until the data changes
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 0 = disabled
+    RESULT_CACHE_TTL_SECONDS: float = 0.0
+    RESULT_CACHE_RELATIVE_TTL_SECONDS: float = 60.0  # answers relative to "now"
+
+    # Background churn-prediction refresh
+    PREDICTION_REFRESH_ENABLED: bool = True
+    PREDICTION_REFRESH_INTERVAL_SECONDS: float = 60.0
+
+    # SMS delivery (transport: "twilio" SDK or pooled "http" REST client)
+    SMS_TRANSPORT: str = "twilio"
+    SMS_API_BASE_URL: str = "https://api.twilio.com"
+    SMS_HTTP_POOL_SIZE: int = 32
+    SMS_HTTP_TIMEOUT_SECONDS: float = 10.0
+    SMS_SEND_CONCURRENCY: int = 1
+    SMS_RATE_LIMIT_PER_SECOND: float = 0.5  # 0 = unlimited
+    SMS_SEND_DEADLINE_SECONDS: float = 30.0  # per message, including retries
+
+    # AI message generation (falls back to templates once deadlines pass)
+    AI_REQUEST_TIMEOUT_SECONDS: float = 10.0
+    AI_CALL_DEADLINE_SECONDS: float = 15.0  # per message, including retries
+    AI_CAMPAIGN_DEADLINE_SECONDS: float = 120.0  # generation time per campaign (send waits excluded)
+
+    # Integration resilience: jittered retries within a per-campaign budget
+    # (RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO retries per message) and
+    # error-rate circuit breakers
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY_SECONDS: float = 0.25
+    RETRY_MAX_DELAY_SECONDS: float = 5.0
+    RETRY_BUDGET_RATIO: float = 0.1
+    RETRY_BUDGET_MIN: int = 5
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_WINDOW_SECONDS: float = 60.0
+    BREAKER_OPEN_SECONDS: float = 30.0
+
+    # Pipelined campaigns (selection -> generation -> dispatch, bounded queues)
+    CAMPAIGN_GENERATION_WORKERS: int = 4
+    CAMPAIGN_PIPELINE_QUEUE_SIZE: int = 32
+
+    # Partitioned campaign preparation: audiences of at least
+    # CAMPAIGN_PARTITION_MIN_CUSTOMERS are sharded by customer code across
+    # worker processes (0 = one per CPU, 1 = off). Start method "auto" uses
+    # forkserver where available, else spawn (never fork from the server).
+    CAMPAIGN_PARTITION_PROCESSES: int = 0
+    CAMPAIGN_PARTITION_MIN_CUSTOMERS: int = 20_000
+    CAMPAIGN_PARTITION_SHARD_SIZE: int = 2_000
+    CAMPAIGN_PARTITION_START_METHOD: str = "auto"
+
+    # Contact frequency capping: customers texted in the last CONTACT_CAP_DAYS
+    # days are skipped when targeting (0 = off)
+    CONTACT_CAP_DAYS: int = 7
+    CONTACT_HISTORY_RETENTION_DAYS: int = 180
+
+    # Live campaign progress streams
+    CAMPAIGN_PROGRESS_FLUSH_SECONDS: float = 0.25
+    CAMPAIGN_PROGRESS_KEEPALIVE_SECONDS: float = 15.0
+    CAMPAIGN_PROGRESS_HISTORY: int = 20
+    CAMPAIGN_PROGRESS_BUFFER: int = 2_000  # per-message results kept for late listeners
+
+    # Distinct-customer counting (auto = exact up to DISTINCT_EXACT_MAX_ROWS transactions)
+    DISTINCT_COUNT_MODE: str = "auto"
+    DISTINCT_COUNT_PRECISION: int = 12
+    DISTINCT_EXACT_MAX_ROWS: int = 250_000
+
+    # Observability
+    METRICS_ENABLED: bool = True
+
+    # On-demand request profiling (X-Profile: 1 + X-Profile-Token; nothing is
+    # profiled until PROFILING_TOKEN is set). The same token guards the
+    # admin routes that list and download profiles.
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_PROFILES: int = 100
+
     # Base paths
     PROJECT_ROOT: Path = Path(__file__).resolve().parents[3]
     DATA_DIR_NAME: str = "data"
@@ -0,0 +1,212 @@
+"""
+Opt-in per-request sampling profiler
+
+A request is profiled when profiling is enabled in settings and the client
+sends ``X-Profile: 1`` (or ``?profile=1``) together with the admin token
+(PROFILING_TOKEN, which must be set: without it nothing is profiled).
+Stacks are written in collapsed ("folded") format, ready for flamegraph.pl,
+speedscope or inferno, next to a JSON metadata file.
+"""
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+import hmac
+import json
+import logging
+import re
+import sys
+import threading
+import time
+
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+
+
+def profiles_dir() -> Path:
+    path = settings.outputs_dir / "profiles"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of all threads at a fixed interval
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        names = {}
+
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_") or "root"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles flagged requests.
+
+    Only installed when ``PROFILING_ENABLED`` is set, so unflagged traffic
+    pays nothing when profiling is off.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = settings.PROFILING_SAMPLE_INTERVAL_MS / 1000.0
+
+    def _wants_profile(self, scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+
+        flagged = headers.get(PROFILE_HEADER, b"") in (b"1", b"true")
+        if not flagged and scope.get("query_string"):
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            flagged = query.get("profile", [""])[0] in ("1", "true")
+
+        if not flagged:
+            return False
+
+        # The sampler sees every thread's stack: without a configured
+        # token nobody may start it
+        token = settings.PROFILING_TOKEN
+        if not token:
+            logger.warning("Profiling requested but PROFILING_TOKEN is not set")
+            return False
+        supplied = headers.get(PROFILE_TOKEN_HEADER, b"").decode("latin-1")
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            logger.warning("Profiling requested without a valid admin token")
+            return False
+
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        sampler = StackSampler(self.interval)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            try:
+                write_profile(
+                    sampler,
+                    {
+                        "method": scope["method"],
+                        "route": route,
+                        "path": scope["path"],
+                        "query_string": scope.get("query_string", b"").decode("latin-1"),
+                        "status": status_holder["status"],
+                        "duration_ms": round(elapsed * 1000, 2),
+                        "started_at": started_at.isoformat(),
+                    },
+                )
+            except Exception as e:
+                logger.error(f"Failed to write request profile: {e}")
+
+
+def write_profile(sampler: StackSampler, metadata: Dict) -> Path:
+    """
+    Write folded stacks plus a JSON sidecar, returning the profile path
+    """
+    started = datetime.fromisoformat(metadata["started_at"])
+    name = f"{started:%Y%m%dT%H%M%S%f}_{metadata['method']}_{_slug(metadata['route'])}"
+    directory = profiles_dir()
+
+    profile_path = directory / f"{name}.folded"
+    profile_path.write_text(sampler.folded())
+
+    metadata = {
+        **metadata,
+        "name": name,
+        "file": profile_path.name,
+        "format": "folded",
+        "samples": sampler.sample_count,
+        "sample_interval_ms": round(sampler.interval * 1000, 3),
+    }
+    (directory / f"{name}.json").write_text(json.dumps(metadata, indent=2))
+
+    logger.info(f"Request profile written to {profile_path} ({metadata['duration_ms']} ms)")
+    _prune_profiles(directory)
+    return profile_path
+
+
+def _prune_profiles(directory: Path):
+    keep = settings.PROFILING_MAX_PROFILES
+    metas = sorted(directory.glob("*.json"))
+    for meta in metas[:-keep] if keep > 0 else []:
+        meta.with_suffix(".folded").unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+
+
+def list_profiles(limit: int = 20) -> List[Dict]:
+    """
+    Most recent profiles first
+    """
+    results = []
+    for meta in sorted(profiles_dir().glob("*.json"), reverse=True)[:limit]:
+        try:
+            results.append(json.loads(meta.read_text()))
+        except Exception as e:
+            logger.warning(f"Skipping unreadable profile metadata {meta.name}: {e}")
+    return results
+
+
+def get_profile_path(name: str) -> Optional[Path]:
+    path = profiles_dir() / f"{_slug(name)}.folded"
+    return path if path.exists() else None
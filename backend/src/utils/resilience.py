@@ -0,0 +1,381 @@
+"""
+Resilience primitives for external integrations (Hugging Face, Twilio)
+
+* ``CircuitBreaker`` – stops calling a dependency once its recent error rate
+  crosses a threshold, and lets single probe calls through after a cool-down
+* ``RetryBudget`` – caps retries per campaign to a share of first attempts,
+  so a degraded provider cannot multiply the load it receives
+* ``Deadline`` – overall time allowance that per-attempt timeouts and
+  backoff sleeps are clipped to
+* ``WorkDeadline`` – a Deadline that only counts time spent working, so
+  waits between messages (pipeline backpressure) do not use it up
+* ``call_with_retries`` – runs one call through all three with jittered
+  exponential backoff
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import logging
+import random
+import threading
+import time
+
+from src.utils.config import settings
+from src.utils.metrics import DerivedGauge, registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_TRANSITIONS = registry.counter(
+    "freshmart_circuit_breaker_transitions_total",
+    "Circuit breaker state changes",
+    ("breaker", "state"),
+)
+BREAKER_REJECTIONS = registry.counter(
+    "freshmart_circuit_breaker_rejections_total",
+    "Calls short-circuited by an open breaker",
+    ("breaker",),
+)
+RETRIES = registry.counter(
+    "freshmart_integration_retries_total",
+    "Retried integration calls by outcome (scheduled/budget_exhausted/deadline)",
+    ("integration", "outcome"),
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Call rejected without being attempted because the breaker is open
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    Overall deadline ran out before the call could succeed
+    """
+
+
+# -----------------------------
+# Circuit breaker
+# -----------------------------
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a sliding time window.
+
+    Closed: calls pass; once at least ``min_calls`` outcomes within
+    ``window_seconds`` fail at ``failure_rate`` or more it opens.
+    Open: calls are rejected for ``open_seconds``.
+    Half-open: one probe call at a time; success closes, failure reopens.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        window_seconds: Optional[float] = None,
+        open_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate or settings.BREAKER_FAILURE_RATE
+        self.min_calls = min_calls or settings.BREAKER_MIN_CALLS
+        self.window_seconds = window_seconds or settings.BREAKER_WINDOW_SECONDS
+        self.open_seconds = open_seconds or settings.BREAKER_OPEN_SECONDS
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now (the caller must then record its outcome)
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    BREAKER_REJECTIONS.labels(self.name).inc()
+                    return False
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    BREAKER_REJECTIONS.labels(self.name).inc()
+                    return False
+                self._probe_in_flight = True
+
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._outcomes.clear()
+                self._failures = 0
+                self._transition(CLOSED)
+                return
+            self._add(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._open()
+                return
+            if self.state == OPEN:
+                return
+            self._add(False)
+
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._open()
+
+    def _add(self, success: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, success))
+        if not success:
+            self._failures += 1
+
+        horizon = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+            self.state = state
+            BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "name": self.name,
+                "state": self.state,
+                "window_calls": calls,
+                "window_failures": self._failures,
+                "failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+                "threshold": self.failure_rate,
+                "retry_in_seconds": round(retry_in, 2) if retry_in is not None else None,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Process-wide breaker per integration (shared by all campaigns)
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states() -> List[Dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
+
+
+registry.register(
+    DerivedGauge(
+        "freshmart_circuit_breaker_state",
+        "Circuit breaker state (0 = closed, 1 = half-open, 2 = open)",
+        ("breaker",),
+        lambda: {(b["name"],): _STATE_VALUES[b["state"]] for b in breaker_states()},
+    )
+)
+
+
+# -----------------------------
+# Retry budget & deadline
+# -----------------------------
+class RetryBudget:
+    """
+    Retries allowed for one campaign: ``minimum`` plus ``ratio`` per first
+    attempt. Thread-safe; shared by every send of the campaign.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, minimum: Optional[int] = None):
+        self.ratio = settings.RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.minimum = settings.RETRY_BUDGET_MIN if minimum is None else minimum
+        self.attempts = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_attempt(self):
+        with self._lock:
+            self.attempts += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.retries < self.minimum + self.ratio * self.attempts:
+                self.retries += 1
+                return True
+            return False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "allowed": int(self.minimum + self.ratio * self.attempts),
+            }
+
+
+class Deadline:
+    """
+    Absolute deadline ``seconds`` from now (None = no deadline)
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: float) -> float:
+        """
+        Per-attempt timeout clipped to the time left
+        """
+        return min(default, self.remaining())
+
+
+class WorkDeadline(Deadline):
+    """
+    Allowance of ``seconds`` of working time (None = no deadline): the
+    clock only runs while at least one caller is inside ``working()``
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        super().__init__(None)
+        self.seconds = seconds or None
+        self._spent = 0.0
+        self._working = 0
+        self._since = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def working(self) -> Iterator[None]:
+        with self._lock:
+            if self._working == 0:
+                self._since = time.monotonic()
+            self._working += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._working -= 1
+                if self._working == 0:
+                    self._spent += time.monotonic() - self._since
+
+    def spent(self) -> float:
+        with self._lock:
+            running = time.monotonic() - self._since if self._working else 0.0
+            return self._spent + running
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return float("inf")
+        return max(0.0, self.seconds - self.spent())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Full-jitter exponential backoff for retry ``attempt`` (1-based)
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def call_with_retries(
+    integration: str,
+    func: Callable[[float], Any],
+    *,
+    timeout: float,
+    breaker: Optional[CircuitBreaker] = None,
+    budget: Optional[RetryBudget] = None,
+    deadline: Optional[Deadline] = None,
+    is_failure: Callable[[Exception], bool] = lambda e: True,
+    retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+    max_attempts: Optional[int] = None,
+) -> Any:
+    """
+    Call ``func(timeout)`` until it succeeds.
+
+    Exceptions for which ``is_failure`` is False (e.g. an invalid phone
+    number) are neither retried nor counted against the breaker. A failure
+    is retried while attempts, the retry budget and the deadline allow;
+    otherwise the last error is raised. Raises CircuitOpenError /
+    DeadlineExceeded when no attempt could be made.
+    """
+    max_attempts = max_attempts or settings.RETRY_MAX_ATTEMPTS
+    deadline = deadline or Deadline(None)
+    if budget is not None:
+        budget.record_attempt()
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline.expired:
+            raise DeadlineExceeded(f"{integration} deadline exceeded after {attempt - 1} attempt(s)")
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{integration} circuit breaker is open")
+
+        try:
+            result = func(deadline.timeout(timeout))
+        except Exception as e:
+            if not is_failure(e):
+                if breaker is not None:
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            error = e
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+        if attempt >= max_attempts:
+            raise error
+        if budget is not None and not budget.try_spend():
+            RETRIES.labels(integration, "budget_exhausted").inc()
+            raise error
+
+        delay = max(
+            backoff_delay(attempt, settings.RETRY_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS),
+            retry_after(error) or 0.0,
+        )
+        if delay >= deadline.remaining():
+            RETRIES.labels(integration, "deadline").inc()
+            raise error
+
+        RETRIES.labels(integration, "scheduled").inc()
+        logger.info(f"Retrying {integration} call in {delay:.2f}s (attempt {attempt + 1}): {error}")
+        time.sleep(delay)
@@ -50,15 +50,14 @@ const Analytics = () => {
 
   const fetchAnalyticsData = async () => {
     try {
-      const [metricsRes, revenueRes, segmentsRes] = await Promise.all([
-        fetch("http://localhost:8000/api/analytics/dashboard"),
-        fetch("http://localhost:8000/api/analytics/revenue-trends"),
-        fetch("http://localhost:8000/api/analytics/customer-segments"),
-      ]);
+      const overviewRes = await fetch(
+        "http://localhost:8000/api/analytics/overview?sections=dashboard,revenue_trends,customer_segments"
+      );
+      const overview = await overviewRes.json();
 
-      const metricsRaw = await metricsRes.json();
-      const revenueRaw = await revenueRes.json();
-      const segmentsRaw = await segmentsRes.json();
+      const metricsRaw = overview?.dashboard;
+      const revenueRaw = overview?.revenue_trends;
+      const segmentsRaw = overview?.customer_segments;
 
       setDashboardMetrics({
         total_customers: metricsRaw?.total_customers || 0,
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import {
   MegaphoneIcon,
   CheckCircleIcon,
@@ -15,6 +15,7 @@ import {
   getCampaignStatus,
   getCampaignHistory,
   launchRetentionCampaign,
+  subscribeToCampaign,
   testSmsCampaign,
 } from "../services/campaignService";
 
@@ -25,10 +26,13 @@ const Campaigns = () => {
   const [churnRisk, setChurnRisk] = useState("High");
   const [campaignHistory, setCampaignHistory] = useState([]);
   const [campaignStatus, setCampaignStatus] = useState(null);
+  const [progress, setProgress] = useState(null);
+  const closeStream = useRef(null);
 
   useEffect(() => {
     loadStatus();
     loadHistory();
+    return () => closeStream.current?.();
   }, []);
 
   const loadStatus = async () => {
@@ -52,14 +56,27 @@ const Campaigns = () => {
   const launchCampaign = async () => {
     setLoading(true);
     setResult(null);
+    setProgress(null);
     try {
-      const data = await launchRetentionCampaign(customerLimit, churnRisk);
-      setResult(data);
-      loadHistory();
+      const { campaign_id } = await launchRetentionCampaign(customerLimit, churnRisk, true);
+      closeStream.current = subscribeToCampaign(
+        campaign_id,
+        (event) => setProgress(event),
+        (event) => {
+          setProgress(event);
+          setResult(
+            event.status === "completed"
+              ? { campaign_results: event.summary }
+              : { error: event.summary?.error || "Campaign failed" }
+          );
+          setLoading(false);
+          loadHistory();
+        }
+      );
     } catch (e) {
       setResult({ error: "Campaign launch failed" });
+      setLoading(false);
     }
-    setLoading(false);
   };
 
   const testCampaign = async () => {
@@ -181,6 +198,26 @@ const Campaigns = () => {
         </div>
       </div>
 
+      {/* Live progress */}
+      {progress && !result && (
+        <div className="bg-white rounded-2xl shadow-lg p-6 mb-6 border-2 border-emerald-100">
+          <div className="flex items-center justify-between mb-3">
+            <h3 className="text-lg font-bold text-gray-900">Sending Campaign</h3>
+            <span className="text-sm font-semibold text-gray-600 capitalize">{progress.status}</span>
+          </div>
+          <div className="w-full bg-emerald-50 rounded-full h-3 mb-3">
+            <div
+              className="bg-gradient-to-r from-emerald-500 to-teal-500 h-3 rounded-full transition-all"
+              style={{ width: `${progress.total ? (progress.processed / progress.total) * 100 : 0}%` }}
+            />
+          </div>
+          <p className="text-sm text-gray-700 font-medium">
+            {progress.processed} / {progress.total ?? "?"} processed · {progress.successful} delivered ·{" "}
+            {progress.failed} failed · {progress.throughput_per_second} msg/s
+          </p>
+        </div>
+      )}
+
       {/* Results */}
       {result && (
         <div className={`rounded-2xl shadow-lg p-6 mb-6 border-2 ${result.error ? 'bg-red-50 border-red-200' : 'bg-green-50 border-green-200'}`}>
@@ -10,16 +10,32 @@ export const getCampaignHistory = async () => {
   return res.data;
 };
 
-export const launchRetentionCampaign = async (customerLimit, churnRisk) => {
+export const launchRetentionCampaign = async (customerLimit, churnRisk, background = false) => {
   const res = await api.post("/sms/retention", null, {
     params: {
       customer_limit: customerLimit,
       churn_risk: churnRisk,
+      background,
     },
   });
   return res.data;
 };
 
+// Live progress over Server-Sent Events; returns a function that closes the stream
+export const subscribeToCampaign = (campaignId, onProgress, onDone) => {
+  const source = new EventSource(
+    `${api.defaults.baseURL}/api/campaigns/live/${campaignId}/events`
+  );
+
+  source.addEventListener("progress", (e) => onProgress(JSON.parse(e.data)));
+  source.addEventListener("done", (e) => {
+    source.close();
+    onDone(JSON.parse(e.data));
+  });
+
+  return () => source.close();
+};
+
 export const testSmsCampaign = async () => {
   const res = await api.get("/sms/test");
   return res.data;